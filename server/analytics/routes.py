@@ -5,11 +5,12 @@ Provides statistics and analysis endpoints for entry methods, time patterns, and
 
 from fastapi import APIRouter, Depends, Query, HTTPException, Body
 from sqlalchemy.orm import Session
-from sqlalchemy import func, case, and_, or_
+from sqlalchemy import func, case, and_, or_, select
 from typing import Optional, List, Dict, Any
 from datetime import datetime, time, timezone
-from db.session import get_db
-from db.models import Trade, EntryMethod, Setup
+from db.session import get_async_db, run_db
+from db.models import Trade, EntryMethod, Setup, TradeStat
+from db.trading_sessions import session_bucket
 # Local import keeps this module working whether loaded as "analytics" or "server.analytics"
 from .advisor import evaluate_setup  # type: ignore
 
@@ -27,35 +28,8 @@ def detect_trading_session(entry_time: datetime) -> Optional[str]:
     - London: 2 AM - 11 AM (2:00 - 11:00)
     - NY: 8 AM - 4 PM (8:00 - 16:00)
     """
-    if not entry_time:
-        return None
-    
-    # Assume entry_time is already in EST/EDT (local time)
-    # If timezone-aware, convert to naive datetime (assume it's already EST/EDT)
-    if entry_time.tzinfo:
-        # Remove timezone info, assume it's already in EST/EDT
-        entry_time_local = entry_time.replace(tzinfo=None)
-    else:
-        # Already timezone-naive, assume it's in EST/EDT
-        entry_time_local = entry_time
-    
-    hour = entry_time_local.hour
-    
-    # Asia session: 5 PM - 2 AM (17:00 - 23:59 and 0:00 - 2:00)
-    # London session: 2 AM - 11 AM (2:00 - 11:00)
-    # NY session: 8 AM - 4 PM (8:00 - 16:00)
-    # Note: 8 AM - 11 AM overlaps between London and NY, NY takes priority
-    
-    if hour >= 17 or hour < 2:
-        return "asian"
-    elif 2 <= hour < 8:
-        return "london"  # London session (2 AM - 8 AM)
-    elif 8 <= hour < 16:
-        return "ny"  # NY session (8 AM - 4 PM) - takes priority over London
-    elif 16 <= hour < 17:
-        return "asian"  # 4 PM - 5 PM, transition to Asian
-    else:
-        return "london"  # Default fallback
+    # Same bucketing as the trade_stats summary table (db/trade_stats.py)
+    return session_bucket(entry_time)
 
 
 def calculate_entry_method_stats(trades: List[Trade]) -> Dict[str, Any]:
@@ -99,34 +73,122 @@ def calculate_entry_method_stats(trades: List[Trade]) -> Dict[str, Any]:
     }
 
 
+# --- Summary-table aggregation ---
+# The dashboard routes compute the same numbers as calculate_entry_method_stats
+# from the trade_stats summary (db/trade_stats.py, kept current on every Trade
+# write), summing O(#groups) rows in one GROUP BY instead of scanning trades.
+
+
+def _stat_columns() -> list:
+    """Aggregate columns feeding stats_from_aggregate (all 0 for an outer-join miss)"""
+    def total(column):
+        return func.coalesce(func.sum(column), 0)
+
+    return [
+        total(TradeStat.trade_count).label("total_trades"),
+        total(TradeStat.wins).label("wins"),
+        total(TradeStat.losses).label("losses"),
+        total(TradeStat.breakevens).label("breakevens"),
+        total(TradeStat.pnl_count).label("pnl_count"),
+        total(TradeStat.pnl_sum).label("pnl_sum"),
+        total(TradeStat.r_count).label("r_count"),
+        total(TradeStat.r_sum).label("r_sum"),
+    ]
+
+
+def stats_from_aggregate(row: Any) -> Dict[str, Any]:
+    """Build the calculate_entry_method_stats response shape from a _stat_columns row."""
+    if row is None or not row.total_trades:
+        return calculate_entry_method_stats([])
+
+    completed_trades = row.wins + row.losses + row.breakevens
+    win_rate = (row.wins / completed_trades * 100) if completed_trades > 0 else None
+    avg_pnl = row.pnl_sum / row.pnl_count if row.pnl_count else None
+    total_pnl = row.pnl_sum if row.pnl_count else None
+    avg_r_multiple = row.r_sum / row.r_count if row.r_count else None
+
+    return {
+        "total_trades": row.total_trades,
+        "win_rate": round(win_rate, 2) if win_rate is not None else None,
+        "avg_pnl": round(avg_pnl, 2) if avg_pnl is not None else None,
+        "avg_r_multiple": round(avg_r_multiple, 2) if avg_r_multiple is not None else None,
+        "wins": row.wins,
+        "losses": row.losses,
+        "breakevens": row.breakevens,
+        "total_pnl": round(total_pnl, 2) if total_pnl is not None else None
+    }
+
+
+def _grouped_stats(db: Session, *group_by, stat_filter=None) -> list:
+    """
+    One statement: every entry method LEFT JOINed to its trade_stats rows,
+    grouped by entry method plus any extra columns (session, direction).
+    Rows are (entry_method_id, name, description, *group_by values, *stat columns).
+    """
+    join_on = TradeStat.entry_method_id == EntryMethod.id
+    if stat_filter is not None:
+        join_on = and_(join_on, stat_filter)
+    labelled = [expr.label(f"group_{i}") for i, expr in enumerate(group_by)]
+    stmt = (
+        select(EntryMethod.id, EntryMethod.name, EntryMethod.description, *labelled, *_stat_columns())
+        .outerjoin(TradeStat, join_on)
+        .group_by(EntryMethod.id, *labelled)
+        .order_by(EntryMethod.id)
+    )
+    return db.execute(stmt).all()
+
+
+def _stats_by_method(db: Session, group_expr, keys: Dict[str, Any], stat_filter=None) -> list:
+    """Per entry method: {response key: stats} for each group value in keys (missing groups get empty stats)"""
+    methods: Dict[int, Dict[str, Any]] = {}
+    for row in _grouped_stats(db, group_expr, stat_filter=stat_filter):
+        entry = methods.setdefault(row.id, {"entry_method_id": row.id, "entry_method_name": row.name, "groups": {}})
+        if row.group_0 is not None:
+            entry["groups"][row.group_0] = row
+    result = []
+    for entry in methods.values():
+        groups = entry.pop("groups")
+        for key, value in keys.items():
+            entry[key] = stats_from_aggregate(groups.get(value))
+        result.append(entry)
+    return result
+
+
+# Read routes are async; the query bodies below are plain sync ORM code run through
+# run_db (on the aiosqlite engine when ASYNC_DB=true, otherwise in a worker thread)
+# so long aggregations never block the event loop.
+
 @router.get("/entry-methods")
-def get_entry_method_stats(
-    db: Session = Depends(get_db)
+async def get_entry_method_stats(
+    db=Depends(get_async_db)
 ):
     """Get statistics for all entry methods."""
-    entry_methods = db.query(EntryMethod).all()
-    
-    result = []
-    for em in entry_methods:
-        trades = db.query(Trade).filter(Trade.entry_method_id == em.id).all()
-        stats = calculate_entry_method_stats(trades)
-        
-        result.append({
-            "entry_method_id": em.id,
-            "entry_method_name": em.name,
-            "description": em.description,
-            **stats
-        })
-    
+    return await run_db(db, _entry_method_stats)
+
+
+def _entry_method_stats(db: Session) -> Dict[str, Any]:
+    result = [
+        {
+            "entry_method_id": row.id,
+            "entry_method_name": row.name,
+            "description": row.description,
+            **stats_from_aggregate(row)
+        }
+        for row in _grouped_stats(db)
+    ]
     return {"entry_methods": result}
 
 
 @router.get("/entry-methods/{entry_method_id}")
-def get_entry_method_detail(
+async def get_entry_method_detail(
     entry_method_id: int,
-    db: Session = Depends(get_db)
+    db=Depends(get_async_db)
 ):
     """Get detailed statistics for a specific entry method."""
+    return await run_db(db, _entry_method_detail, entry_method_id)
+
+
+def _entry_method_detail(db: Session, entry_method_id: int) -> Dict[str, Any]:
     entry_method = db.query(EntryMethod).filter(EntryMethod.id == entry_method_id).first()
     if not entry_method:
         raise HTTPException(status_code=404, detail="Entry method not found")
@@ -154,71 +216,50 @@ def get_entry_method_detail(
 
 
 @router.get("/comparison")
-def compare_entry_methods(
+async def compare_entry_methods(
     entry_method_ids: Optional[str] = Query(None, description="Comma-separated entry method IDs"),
-    db: Session = Depends(get_db)
+    db=Depends(get_async_db)
 ):
     """Compare entry methods side-by-side."""
+    return await run_db(db, _compare_entry_methods, entry_method_ids)
+
+
+def _compare_entry_methods(db: Session, entry_method_ids: Optional[str]) -> Dict[str, Any]:
+    rows = {row.id: row for row in _grouped_stats(db)}
     if not entry_method_ids:
         # Compare all entry methods
-        entry_methods = db.query(EntryMethod).all()
-        ids = [em.id for em in entry_methods]
+        ids = list(rows)
     else:
         ids = [int(id.strip()) for id in entry_method_ids.split(",")]
     
     comparison = []
     for em_id in ids:
-        entry_method = db.query(EntryMethod).filter(EntryMethod.id == em_id).first()
-        if not entry_method:
+        row = rows.get(em_id)
+        if row is None:
             continue
-        
-        trades = db.query(Trade).filter(Trade.entry_method_id == em_id).all()
-        stats = calculate_entry_method_stats(trades)
-        
         comparison.append({
             "entry_method_id": em_id,
-            "entry_method_name": entry_method.name,
-            **stats
+            "entry_method_name": row.name,
+            **stats_from_aggregate(row)
         })
     
     return {"comparison": comparison}
 
 
 @router.get("/time-patterns")
-def get_time_patterns(
-    db: Session = Depends(get_db)
+async def get_time_patterns(
+    db=Depends(get_async_db)
 ):
     """Get entry method performance by trading session (London, NY, Asian)."""
-    entry_methods = db.query(EntryMethod).all()
-    
-    result = []
-    for em in entry_methods:
-        trades = db.query(Trade).filter(Trade.entry_method_id == em.id).all()
-        
-        # Group by session
-        london_trades = []
-        ny_trades = []
-        asian_trades = []
-        
-        for trade in trades:
-            if not trade.entry_time:
-                continue
-            session = detect_trading_session(trade.entry_time)
-            if session == "london":
-                london_trades.append(trade)
-            elif session == "ny":
-                ny_trades.append(trade)
-            elif session == "asian":
-                asian_trades.append(trade)
-        
-        result.append({
-            "entry_method_id": em.id,
-            "entry_method_name": em.name,
-            "london": calculate_entry_method_stats(london_trades),
-            "ny": calculate_entry_method_stats(ny_trades),
-            "asian": calculate_entry_method_stats(asian_trades)
-        })
-    
+    return await run_db(db, _time_patterns)
+
+
+def _time_patterns(db: Session) -> Dict[str, Any]:
+    result = _stats_by_method(
+        db, TradeStat.session,
+        {"london": "london", "ny": "ny", "asian": "asian"},
+        stat_filter=TradeStat.session.isnot(None),
+    )
     return {"time_patterns": result}
 
 
@@ -244,56 +285,50 @@ def evaluate_advisor_setup(
 
 
 @router.get("/direction-patterns")
-def get_direction_patterns(
-    db: Session = Depends(get_db)
+async def get_direction_patterns(
+    db=Depends(get_async_db)
 ):
     """Get entry method performance by direction (bullish/bearish)."""
-    entry_methods = db.query(EntryMethod).all()
-    
-    result = []
-    for em in entry_methods:
-        trades = db.query(Trade).filter(Trade.entry_method_id == em.id).all()
-        
-        bullish_trades = [t for t in trades if t.direction == "long"]
-        bearish_trades = [t for t in trades if t.direction == "short"]
-        
-        result.append({
-            "entry_method_id": em.id,
-            "entry_method_name": em.name,
-            "bullish": calculate_entry_method_stats(bullish_trades),
-            "bearish": calculate_entry_method_stats(bearish_trades)
-        })
-    
+    return await run_db(db, _direction_patterns)
+
+
+def _direction_patterns(db: Session) -> Dict[str, Any]:
+    result = _stats_by_method(db, TradeStat.direction, {"bullish": "long", "bearish": "short"})
     return {"direction_patterns": result}
 
 
 @router.get("/overview")
-def get_analytics_overview(
-    db: Session = Depends(get_db)
+async def get_analytics_overview(
+    db=Depends(get_async_db)
 ):
     """Get overview statistics for the analytics dashboard."""
-    all_trades = db.query(Trade).all()
-    
-    # Overall stats
-    overall_stats = calculate_entry_method_stats(all_trades)
+    return await run_db(db, _analytics_overview)
+
+
+def _analytics_overview(db: Session) -> Dict[str, Any]:
+    # Overall stats and linked-trade count from the summary rows
+    with_entry_method = func.coalesce(func.sum(
+        case((TradeStat.entry_method_id.isnot(None), TradeStat.trade_count), else_=0)
+    ), 0)
+    overall = db.execute(
+        select(*_stat_columns(), with_entry_method.label("with_entry_method")).select_from(TradeStat)
+    ).one()
+    overall_stats = stats_from_aggregate(overall)
     
     # Trades with entry methods linked
-    trades_with_entry_method = db.query(Trade).filter(Trade.entry_method_id.isnot(None)).count()
-    trades_without_entry_method = len(all_trades) - trades_with_entry_method
-    
-    # Entry method count
-    entry_method_count = db.query(EntryMethod).count()
+    trades_with_entry_method = overall.with_entry_method
+    trades_without_entry_method = overall.total_trades - trades_with_entry_method
     
-    # Best/worst performing entry methods
-    entry_methods = db.query(EntryMethod).all()
+    # Best/worst performing entry methods (one grouped statement)
+    per_method = _grouped_stats(db)
+    entry_method_count = len(per_method)
     method_performance = []
-    for em in entry_methods:
-        trades = db.query(Trade).filter(Trade.entry_method_id == em.id).all()
-        stats = calculate_entry_method_stats(trades)
+    for row in per_method:
+        stats = stats_from_aggregate(row)
         if stats["total_trades"] > 0:
             method_performance.append({
-                "entry_method_id": em.id,
-                "entry_method_name": em.name,
+                "entry_method_id": row.id,
+                "entry_method_name": row.name,
                 "win_rate": stats["win_rate"],
                 "avg_r_multiple": stats["avg_r_multiple"],
                 "total_trades": stats["total_trades"]
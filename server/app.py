@@ -1,27 +1,33 @@
+# Time every import below (see /startup/profile); must run first
+from utils import startup_profile
+startup_profile.install()
+
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from fastapi.responses import StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict
-import base64
-import io
 import json
 import os
 from dotenv import load_dotenv
 from db import Base
-from db.session import engine, SessionLocal
-from db.maintenance import backfill_trades
+from db.session import engine, SessionLocal, dispose_async_engine
+from db.trade_stats import ensure_trade_stats
+from migrations.runner import run_pending_migrations
 from db.migrate_from_json import migrate_performance_logs
 from db.enrich_from_logs import enrich_trades_from_logs
-from db.import_from_csv import import_from_csv
+from db.import_from_csv import bulk_import_csv
 # decision.py no longer provides vision analysis; removed legacy import
-from openai_client import get_client, get_budget_status, resolve_model, list_available_models, sync_model_aliases
+from openai_client import get_client, get_budget_status, resolve_model, list_available_models, refresh_model_aliases_forever, close_client
 from memory.routes import memory_router
 from memory.utils import initialize_default_files, get_memory_status
 from chart_reconstruction.routes import router as chart_reconstruction_router
 from analytics.routes import router as analytics_router
 from chat.routes import router as chat_router
 from vision.routes import router as vision_router
+from utils.image_preprocess import preprocess_image
+from utils import deadline, metrics
 # Minimal set of active routers; archived modules removed from imports
 # Keep extension/analytics/chat functionality focused.
 # LATv2 removed - logging system no longer needed
@@ -83,12 +89,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def stage_metrics_middleware(request: Request, call_next):
+    """Label stage timings recorded during the request with its route template"""
+    token = metrics.begin_request()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        route = request.scope.get("route")
+        metrics.end_request(token, getattr(route, "path", None), time.perf_counter() - start)
+    return response
+
+@app.middleware("http")
+async def request_deadline_middleware(request: Request, call_next):
+    """Give the request a time budget (X-Request-Timeout header or REQUEST_DEADLINE_S) for upstream calls"""
+    token = deadline.set_deadline(deadline.parse_timeout(request.headers.get(deadline.DEADLINE_HEADER)))
+    try:
+        return await call_next(request)
+    finally:
+        deadline.reset_deadline(token)
+
 app.include_router(memory_router)
 app.include_router(chart_reconstruction_router)
 app.include_router(analytics_router)
 app.include_router(chat_router)
 app.include_router(vision_router)
 
+# Background model alias refresh (started on startup, cancelled on shutdown)
+_alias_refresh_task: Optional[asyncio.Task] = None
+
 # Phase 4C.1: Startup initialization with persistent memory
 @app.on_event("startup")
 async def startup_event():
@@ -97,63 +127,68 @@ async def startup_event():
     print("[BOOT] Visual Trade Copilot v4.6.0")
     print("=" * 60)
     # Initialize database
-    try:
-        from pathlib import Path as _Path
-        print("[DB] Initializing database and creating tables if missing...")
-        Base.metadata.create_all(bind=engine)
-        with SessionLocal() as _db:
-            # simple check if any trades exist
-            from db.models import Trade as _Trade
-            existing = _db.query(_Trade).count()
-        if existing == 0:
-            csv_path = (_Path(__file__).parent / "data" / "Trading-Images" / "trades_export.csv").resolve()
-            print(f"[DB] Empty database detected. Importing from CSV {csv_path.name}...")
-            with SessionLocal() as _db_csv:
-                cr = import_from_csv(_db_csv, csv_path)
-                print(f"[DB] CSV import: updated={cr['updated']}, skipped={cr['skipped']}")
-        else:
-            print(f"[DB] Existing records detected: {existing} trades")
-        # Backfill derived fields for all cases
-        with SessionLocal() as _db2:
-            bf = backfill_trades(_db2)
-            print(f"[DB] Backfill: outcome={bf['outcome']}, entry_time={bf['entry_time']}")
-        # JSON enrichment removed (DB is source of truth)
-
-        # Import/align from CSV if present
+    with startup_profile.phase("database init"):
         try:
-            csv_path = (_Path(__file__).parent / "data" / "Trading-Images" / "trades_export.csv").resolve()
-            with SessionLocal() as _db4:
-                cr = import_from_csv(_db4, csv_path)
-                print(f"[DB] CSV import: updated={cr['updated']}, skipped={cr['skipped']}")
-        except Exception as _csv_err:
-            print(f"[DB] CSV import warning: {_csv_err}")
-    except Exception as e:
-        print(f"[DB] Warning: Database initialization failed: {e}")
+            from pathlib import Path as _Path
+            print("[DB] Initializing database and creating tables if missing...")
+            Base.metadata.create_all(bind=engine)
+            # Schema changes to existing tables and one-time data backfills
+            # (create_all only creates missing tables); no-op once recorded
+            applied = run_pending_migrations()
+            if applied:
+                print(f"[DB] Migrations applied: {', '.join(applied)}")
+            with SessionLocal() as _db:
+                # simple check if any trades exist
+                from db.models import Trade as _Trade
+                existing = _db.query(_Trade).count()
+            if existing == 0:
+                print("[DB] Empty database detected. Importing from CSV...")
+            else:
+                print(f"[DB] Existing records detected: {existing} trades")
+
+            # Import/align from CSV if present (skipped when unchanged since the last import)
+            try:
+                csv_path = (_Path(__file__).parent / "data" / "Trading-Images" / "trades_export.csv").resolve()
+                with SessionLocal() as _db4:
+                    cr = bulk_import_csv(_db4, csv_path, force=(existing == 0))
+                if cr.get("unchanged"):
+                    print(f"[DB] CSV import: {csv_path.name} unchanged since last import, skipped")
+                else:
+                    print(f"[DB] CSV import: updated={cr['updated']}, skipped={cr['skipped']}")
+            except Exception as _csv_err:
+                print(f"[DB] CSV import warning: {_csv_err}")
+
+            # JSON enrichment removed (DB is source of truth)
+
+            # Analytics summary table (built once for databases that predate it)
+            with SessionLocal() as _db5:
+                if ensure_trade_stats(_db5):
+                    print("[DB] trade_stats summary built from trades")
+        except Exception as e:
+            print(f"[DB] Warning: Database initialization failed: {e}")
     
     # Initialize memory system
-    try:
-        print("[MEMORY] Checking data directory...")
-        initialize_default_files()
+    with startup_profile.phase("memory load"):
+        try:
+            print("[MEMORY] Checking data directory...")
+            initialize_default_files()
         
-        status = get_memory_status()
-        print(f"[MEMORY] Loaded persistent memory:")
-        print(f"         - {status['total_trades']} trades")
-        print(f"         - {status['active_sessions']} sessions")
-        print(f"         - {status['conversation_messages']} conversation messages")
+            status = get_memory_status()
+            print(f"[MEMORY] Loaded persistent memory:")
+            print(f"         - {status['total_trades']} trades")
+            print(f"         - {status['active_sessions']} sessions")
+            print(f"         - {status['conversation_messages']} conversation messages")
         
-        if status['total_trades'] > 0:
-            print(f"         - Win rate: {status['win_rate']*100:.1f}%")
-            print(f"         - Avg R: {status['avg_rr']:+.2f}")
-    except Exception as e:
-        print(f"[MEMORY] Warning: Could not load memory: {e}")
+            if status['total_trades'] > 0:
+                print(f"         - Win rate: {status['win_rate']*100:.1f}%")
+                print(f"         - Avg R: {status['avg_rr']:+.2f}")
+        except Exception as e:
+            print(f"[MEMORY] Warning: Could not load memory: {e}")
     
-    # Sync model aliases
-    try:
-        print("[SYSTEM] Syncing model aliases with OpenAI API...")
-        sync_model_aliases()
-    except Exception as e:
-        print(f"[SYSTEM] Warning: Could not sync model aliases: {e}")
-        print("[SYSTEM] Continuing with default aliases...")
+    # Sync model aliases in the background (cached aliases are already loaded)
+    global _alias_refresh_task
+    print("[SYSTEM] Syncing model aliases with OpenAI API in the background...")
+    _alias_refresh_task = asyncio.create_task(refresh_model_aliases_forever())
     
     # Initialize awareness layer
     try:
@@ -166,12 +201,28 @@ async def startup_event():
     
     # LATv2 cleanup removed - no longer needed
     
+    startup_profile.finish()
     print("=" * 60)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background alias sync and release pooled upstream and DB connections"""
+    if _alias_refresh_task is not None:
+        _alias_refresh_task.cancel()
+    try:
+        await close_client()
+    except Exception as e:
+        print(f"[SYSTEM] Warning: Could not close OpenAI client: {e}")
+    try:
+        await dispose_async_engine()
+    except Exception as e:
+        print(f"[DB] Warning: Could not dispose async engine: {e}")
+
 # Pydantic models
 class AskResponse(BaseModel):
     model: str
     answer: str
+    actual_model: Optional[str] = None  # Model that answered (differs from model when a hedge won)
     commands_executed: List[Dict] = []  # Commands extracted and executed from AI response
     summary: Optional[str] = None  # Phase 5D: Human-readable command execution summary
 
@@ -203,83 +254,10 @@ async def analyze_chart(
         # Read and process the image
         image_data = await file.read()
         
-        if PIL_AVAILABLE:
-            # Full image processing with PIL
-            image = Image.open(io.BytesIO(image_data))
-            
-            # Convert to RGB if necessary (for PNG with transparency)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            
-            # Resize if too large (OpenAI has size limits)
-            max_size = 2048
-            if image.width > max_size or image.height > max_size:
-                image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-            
-            # Convert to base64 for OpenAI API
-            buffer = io.BytesIO()
-            image.save(buffer, format='JPEG', quality=85)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        elif PYPNG_AVAILABLE:
-            # Basic processing with pypng - limited but functional
-            try:
-                # Try to read PNG data with pypng
-                reader = png.Reader(bytes=image_data)
-                width, height, pixels, metadata = reader.read()
-                
-                # Convert to RGB if needed
-                if metadata.get('alpha'):
-                    # Handle RGBA -> RGB conversion
-                    rgb_pixels = []
-                    for row in pixels:
-                        rgb_row = []
-                        for i in range(0, len(row), 4):
-                            r, g, b, a = row[i:i+4]
-                            # Simple alpha blending with white background
-                            alpha = a / 255.0
-                            rgb_row.extend([
-                                int(r * alpha + 255 * (1 - alpha)),
-                                int(g * alpha + 255 * (1 - alpha)),
-                                int(b * alpha + 255 * (1 - alpha))
-                            ])
-                        rgb_pixels.append(rgb_row)
-                    pixels = rgb_pixels
-                
-                # Basic resize if too large (simple downsampling)
-                max_size = 2048
-                if width > max_size or height > max_size:
-                    scale = min(max_size / width, max_size / height)
-                    new_width = int(width * scale)
-                    new_height = int(height * scale)
-                    
-                    # Simple downsampling
-                    new_pixels = []
-                    for y in range(0, height, int(1/scale)):
-                        if len(new_pixels) >= new_height:
-                            break
-                        row = []
-                        for x in range(0, width, int(1/scale)):
-                            if len(row) >= new_width * 3:
-                                break
-                            pixel_idx = int(x * 3)
-                            if pixel_idx < len(pixels[int(y)]):
-                                row.extend(pixels[int(y)][pixel_idx:pixel_idx+3])
-                        new_pixels.append(row)
-                    pixels = new_pixels
-                    width, height = new_width, new_height
-                
-                # Convert back to PNG bytes
-                buffer = io.BytesIO()
-                writer = png.Writer(width=width, height=height, **{k: v for k, v in metadata.items() if k != 'alpha'})
-                writer.write(buffer, pixels)
-                image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-            except Exception as e:
-                print(f"pypng processing failed: {e}, falling back to raw data")
-                # Fallback to raw data
-                image_base64 = base64.b64encode(image_data).decode('utf-8')
-        else:
-            # Basic processing without any image library - just convert to base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
+        # PIL when available, else the pypng + NumPy fallback, else raw bytes
+        # (worker pool, cached by upload hash)
+        processed = await preprocess_image(image_data)
+        image_base64 = processed["base64"]
         
         # Check if OpenAI API key is configured
         api_key = os.getenv('OPENAI_API_KEY')
@@ -301,27 +279,12 @@ async def analyze_chart(
             "analysis": analysis_result
         }
         
-        if PIL_AVAILABLE:
-            response["image_info"] = {
-                "width": image.width,
-                "height": image.height,
-                "format": "JPEG",
-                "processor": "PIL/Pillow"
-            }
-        elif PYPNG_AVAILABLE:
-            response["image_info"] = {
-                "width": width if 'width' in locals() else "unknown",
-                "height": height if 'height' in locals() else "unknown",
-                "format": "PNG",
-                "processor": "pypng"
-            }
-        else:
-            response["image_info"] = {
-                "width": "unknown",
-                "height": "unknown", 
-                "format": "raw",
-                "processor": "none"
-            }
+        response["image_info"] = {
+            "width": processed["width"] or "unknown",
+            "height": processed["height"] or "unknown",
+            "format": processed["format"],
+            "processor": processed["processor"]
+        }
         
         return response
         
@@ -335,6 +298,52 @@ async def get_prompt():
     """Get the current analysis prompt for debugging"""
     return {"prompt": get_base_prompt()}
 
+def _parse_ask_form(messages: Optional[str], context: Optional[str]):
+    """Parse the JSON-encoded history (last 50 messages) and session context form fields"""
+    conversation_history = []
+    if messages:
+        try:
+            parsed_messages = json.loads(messages)
+            conversation_history = parsed_messages[-50:]
+        except json.JSONDecodeError:
+            pass
+    session_context = {}
+    if context:
+        try:
+            session_context = json.loads(context)
+        except json.JSONDecodeError:
+            pass
+    return conversation_history, session_context
+
+async def _read_chat_image(image: Optional[UploadFile]) -> Optional[str]:
+    """Read an optional chat image upload and return it as base64 JPEG"""
+    if not image:
+        return None
+    try:
+        image_data = await image.read()
+        return (await preprocess_image(image_data))["base64"]
+    except Exception as e:
+        print(f"[ASK] Failed to process image: {e}")
+        # Continue without image if processing fails
+        return None
+
+def _sse(event: str, data: Dict) -> str:
+    """Format one server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def _sse_stream(events):
+    """Turn an async iterator of client events into SSE frames, reporting failures as an error event"""
+    try:
+        async for event in events:
+            kind = event.get("type", "token")
+            payload = {k: v for k, v in event.items() if k != "type"}
+            yield _sse(kind, payload)
+    except Exception as e:
+        print(f"[STREAM] Stream failed: {e}")
+        yield _sse("error", {"detail": str(e)})
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 @app.post("/ask", response_model=AskResponse)
 async def ask_about_chart(
     question: str = Form(...),
@@ -342,6 +351,7 @@ async def ask_about_chart(
     messages: str = Form(None),
     context: str = Form(None),
     image: UploadFile = File(None),
+    bypass_cache: bool = Form(False),
 ):
     """
     Pure AI chat (natural language only).
@@ -349,43 +359,12 @@ async def ask_about_chart(
     - No auto-chart loading
     - Optional conversation history and lightweight context only
     - Optional image support for chart analysis
+    - bypass_cache=true skips the response cache
     """
     try:
         selected_model = resolve_model(model)
-        conversation_history = []
-        if messages:
-            try:
-                parsed_messages = json.loads(messages)
-                conversation_history = parsed_messages[-50:]
-            except json.JSONDecodeError:
-                pass
-        session_context = {}
-        if context:
-            try:
-                session_context = json.loads(context)
-            except json.JSONDecodeError:
-                pass
-
-        # Handle image if provided
-        image_base64 = None
-        if image:
-            try:
-                image_data = await image.read()
-                if PIL_AVAILABLE:
-                    img = Image.open(io.BytesIO(image_data))
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    max_size = 2048
-                    if img.width > max_size or img.height > max_size:
-                        img.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-                    buffer = io.BytesIO()
-                    img.save(buffer, format='JPEG', quality=85)
-                    image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-                else:
-                    image_base64 = base64.b64encode(image_data).decode('utf-8')
-            except Exception as e:
-                print(f"[ASK] Failed to process image: {e}")
-                # Continue without image if processing fails
+        conversation_history, session_context = _parse_ask_form(messages, context)
+        image_base64 = await _read_chat_image(image)
 
         client = get_client()
         response = await client.create_response(
@@ -394,18 +373,66 @@ async def ask_about_chart(
             model=selected_model,
             conversation_history=conversation_history,
             session_context=session_context,
+            use_cache=not bypass_cache,
         )
-        return AskResponse(model=response.get("model", selected_model), answer=response.get("answer", ""), commands_executed=[], summary=None)
+        return AskResponse(model=response.get("model", selected_model), answer=response.get("answer", ""),
+                           actual_model=response.get("actual_model"), commands_executed=[], summary=None)
     except HTTPException:
         raise
+    except deadline.DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Ask timed out: {str(e)}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ask failed: {str(e)}")
+
+@app.post("/ask/stream")
+async def ask_about_chart_stream(
+    question: str = Form(...),
+    model: str = Form(None),
+    messages: str = Form(None),
+    context: str = Form(None),
+    image: UploadFile = File(None),
+    bypass_cache: bool = Form(False),
+):
+    """
+    Streaming variant of /ask (Server-Sent Events).
+    
+    Emits `token` events with incremental text as the model produces it, then a
+    single `done` event with model, token usage and cache-hit metadata. Upstream
+    failures are reported as an `error` event.
+    """
+    selected_model = resolve_model(model)
+    conversation_history, session_context = _parse_ask_form(messages, context)
+    # Read the upload before streaming starts; the request body is gone afterwards
+    image_base64 = await _read_chat_image(image)
+    try:
+        client = get_client()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ask failed: {str(e)}")
+    events = client.stream_response(
+        question=question,
+        image_base64=image_base64,
+        model=selected_model,
+        conversation_history=conversation_history,
+        session_context=session_context,
+        use_cache=not bypass_cache,
+    )
+    return StreamingResponse(_sse_stream(events), media_type="text/event-stream", headers=SSE_HEADERS)
 
 @app.get("/budget")
 async def get_budget():
     """Get current budget status"""
     return get_budget_status()
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Per-stage latency histograms in Prometheus text format"""
+    return PlainTextResponse(metrics.render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/startup/profile")
+async def get_startup_profile(top: int = 25):
+    """Slowest module imports (lazy ones too with STARTUP_PROFILE_LAZY=true) and startup phase timings"""
+    return startup_profile.report(top)
+
 @app.get("/models")
 async def get_models():
     """
@@ -583,7 +610,7 @@ async def update_session_memory(session_id: str, context: dict):
 
 # ========== Phase 3C: Hybrid Reasoning System ==========
 
-from hybrid_pipeline import hybrid_reasoning, clear_session_cache
+from hybrid_pipeline import hybrid_reasoning, hybrid_reasoning_stream, clear_session_cache
 
 class HybridResponse(BaseModel):
     model: str
@@ -655,6 +682,8 @@ async def hybrid_endpoint(
         
     except HTTPException:
         raise
+    except deadline.DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=f"Hybrid reasoning timed out: {str(e)}")
     except Exception as e:
         import traceback
         error_details = traceback.format_exc()
@@ -662,6 +691,39 @@ async def hybrid_endpoint(
         print(error_details)
         raise HTTPException(status_code=500, detail=f"Hybrid reasoning failed: {str(e)}")
 
+@app.post("/hybrid/stream")
+async def hybrid_stream_endpoint(
+    image: UploadFile = File(...),
+    question: str = Form(...),
+    model: str = Form("gpt-5-mini"),
+    session_id: str = Form("default"),
+    messages: str = Form(None),
+    force_refresh: bool = Form(False)
+):
+    """
+    Streaming variant of /hybrid (Server-Sent Events).
+    
+    The vision summary is resolved (or served from cache) first; the reasoning
+    model's tokens are then streamed as `token` events. The final `done` event
+    carries model, token usage, vision/reasoning models and cache_hit.
+    """
+    conversation_history = []
+    if messages:
+        try:
+            conversation_history = json.loads(messages)[-10:]
+        except json.JSONDecodeError as e:
+            print(f"[WARNING] Failed to parse messages: {e}")
+    image_data = await image.read()
+    events = hybrid_reasoning_stream(
+        image_data=image_data,
+        question=question,
+        reasoning_model=model,
+        session_id=session_id,
+        conversation_history=conversation_history,
+        force_refresh=force_refresh
+    )
+    return StreamingResponse(_sse_stream(events), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.delete("/hybrid/cache/{session_id}")
 async def clear_hybrid_cache(session_id: str):
     """
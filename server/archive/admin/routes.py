@@ -4,7 +4,7 @@ from fastapi import APIRouter
 from pathlib import Path
 
 from db.session import SessionLocal
-from db.import_from_csv import import_from_csv
+from db.import_from_csv import bulk_import_csv
 from db.models import Trade
 
 
@@ -15,7 +15,7 @@ router = APIRouter(prefix="/admin", tags=["admin"])
 def reimport_csv():
     csv_path = Path(__file__).resolve().parent.parent / "data" / "Trading-Images" / "trades_export.csv"
     with SessionLocal() as db:
-        result = import_from_csv(db, csv_path)
+        result = bulk_import_csv(db, csv_path, force=True)
     return {"csv": str(csv_path), **result}
 
 
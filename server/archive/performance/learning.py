@@ -11,6 +11,8 @@ from pathlib import Path
 import statistics
 from typing import Dict, Any, List
 
+from utils.data_versions import bump
+
 # Phase 4D.3: Unify paths to server/data and reuse normalized logs from performance.utils
 DATA_DIR = Path(__file__).parent.parent / "data"
 LOG_PATH = str(DATA_DIR / "performance_logs.json")
@@ -35,6 +37,7 @@ def _save_json(path: str, data: Dict[str, Any]):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
+    bump("profile")
 
 
 def generate_learning_profile() -> Dict[str, Any]:
@@ -43,9 +46,11 @@ def generate_learning_profile() -> Dict[str, Any]:
     This profile is injected into the AI's system prompt to personalize advice.
     """
     # Use the normalized reader from performance.utils to ensure outcomes/R are present
+    snapshot = None
     try:
-        from .utils import read_logs
-        logs = read_logs()
+        from .utils import get_trade_snapshot
+        snapshot = get_trade_snapshot()
+        logs = snapshot.trades
     except Exception:
         logs = _load_json(LOG_PATH)
     total = len(logs)
@@ -68,8 +73,11 @@ def generate_learning_profile() -> Dict[str, Any]:
         return profile
     
     # Calculate win rate
-    wins = [t for t in logs if t.get("outcome") == "win"]
-    losses = [t for t in logs if t.get("outcome") == "loss"]
+    if snapshot is not None:
+        wins, losses = snapshot.by_outcome["win"], snapshot.by_outcome["loss"]
+    else:
+        wins = [t for t in logs if t.get("outcome") == "win"]
+        losses = [t for t in logs if t.get("outcome") == "loss"]
     completed = len(wins) + len(losses)
     win_rate = (len(wins) / completed) if completed > 0 else 0.0
     
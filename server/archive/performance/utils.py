@@ -9,19 +9,106 @@ from typing import List, Optional, Dict, Any
 from .models import TradeRecord
 from db.session import SessionLocal
 from db.models import Trade
-import time
 import threading
 
+from utils.data_versions import bump, get_version
+
 # === 5F.2 FIX ===
 # Phase 4D.3: Use absolute path anchored to this module to avoid CWD issues
 DATA_DIR = Path(__file__).parent.parent / "data"
 LOG_FILE = str(DATA_DIR / "performance_logs.json")  # deprecated (DB is source of truth)
 
-# TTL cache for read_logs() [5F.2 FIX F1]
-_logs_cache = None
-_logs_cache_timestamp = 0
-_logs_cache_lock = threading.Lock()
-LOGS_CACHE_TTL = 10  # seconds
+# Versioned trade snapshot for read_logs(): rebuilt only when the "trades" data
+# version moves (DB commits touching trades, bulk imports, invalidate_logs_cache),
+# instead of on a TTL. Readers share one immutable-by-convention snapshot per version.
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+OUTCOMES = ("win", "loss", "breakeven")
+
+
+def chronological_key(trade: Dict[str, Any]) -> str:
+    """Sort key used for trade navigation (oldest first)"""
+    return trade.get('timestamp') or trade.get('entry_time') or ''
+
+
+class TradeSnapshot:
+    """
+    All trades (normalized) as of one data version, with the orderings and
+    lookups callers used to recompute on every call.
+
+    Attributes:
+        version: "trades" data version this snapshot reflects
+        trades: Trades in DB id order (what read_logs() returns)
+        chronological: Oldest first by chronological_key (stable)
+        newest_first: Newest first by chronological_key (stable)
+        index_by_id: trade_id -> index into chronological
+        by_outcome: 'win' | 'loss' | 'breakeven' -> trades (id order)
+    """
+
+    __slots__ = ("version", "trades", "chronological", "newest_first", "index_by_id", "by_outcome")
+
+    def __init__(self, version: int, trades: List[Dict[str, Any]]):
+        self.version = version
+        self.trades = trades
+        self.chronological = sorted(trades, key=chronological_key)
+        self.newest_first = sorted(trades, key=chronological_key, reverse=True)
+        self.index_by_id = {}
+        for i, t in enumerate(self.chronological):
+            self.index_by_id.setdefault(t.get("trade_id"), i)
+        self.by_outcome = {outcome: [] for outcome in OUTCOMES}
+        for t in trades:
+            if t.get("outcome") in self.by_outcome:
+                self.by_outcome[t["outcome"]].append(t)
+
+
+def _load_trades() -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    with SessionLocal() as db:
+        for t in db.query(Trade).order_by(Trade.id.asc()).all():
+            rows.append({
+                "id": t.trade_id,
+                "trade_id": t.trade_id,
+                "symbol": t.symbol,
+                "entry_time": t.entry_time.isoformat() if t.entry_time else None,
+                "exit_time": t.exit_time.isoformat() if t.exit_time else None,
+                "entry_price": t.entry_price,
+                "exit_price": t.exit_price,
+                "direction": t.direction,
+                "outcome": t.outcome,
+                "pnl": t.pnl,
+                "r_multiple": t.r_multiple,
+                "chart_url": t.chart_url,
+                "session_id": t.session_id,
+            })
+    return [normalize_trade(tr) for tr in rows]
+
+
+def get_trade_snapshot() -> TradeSnapshot:
+    """Current snapshot, rebuilt from the DB only if the trades version moved"""
+    global _snapshot
+    version = get_version("trades")
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _snapshot_lock:
+        version = get_version("trades")
+        if _snapshot is None or _snapshot.version != version:
+            # A write landing mid-build bumps the version again, so the next call rebuilds
+            _snapshot = TradeSnapshot(version, _load_trades())
+        return _snapshot
+
+
+def sort_chronological(trades: List[Dict[str, Any]], reverse: bool = False) -> List[Dict[str, Any]]:
+    """
+    Trades sorted by chronological_key; the precomputed ordering when `trades`
+    is the current snapshot's list (what read_logs() returned), else a sort.
+    Do not mutate the returned list.
+    """
+    snapshot = _snapshot
+    if snapshot is not None and trades is snapshot.trades:
+        return snapshot.newest_first if reverse else snapshot.chronological
+    return sorted(trades, key=chronological_key, reverse=reverse)
 
 
 def ensure_data_dir():
@@ -33,42 +120,19 @@ def ensure_data_dir():
 
 
 def read_logs() -> List[Dict[str, Any]]:
-    """Read all trades from the database (DB is source of truth)."""
-    global _logs_cache, _logs_cache_timestamp
-    current_time = time.time()
-    with _logs_cache_lock:
-        if _logs_cache is not None and (current_time - _logs_cache_timestamp) < LOGS_CACHE_TTL:
-            return _logs_cache
-        rows: List[Dict[str, Any]] = []
-        with SessionLocal() as db:
-            for t in db.query(Trade).order_by(Trade.id.asc()).all():
-                rows.append({
-                    "id": t.trade_id,
-                    "trade_id": t.trade_id,
-                    "symbol": t.symbol,
-                    "entry_time": t.entry_time.isoformat() if t.entry_time else None,
-                    "exit_time": t.exit_time.isoformat() if t.exit_time else None,
-                    "entry_price": t.entry_price,
-                    "exit_price": t.exit_price,
-                    "direction": t.direction,
-                    "outcome": t.outcome,
-                    "pnl": t.pnl,
-                    "r_multiple": t.r_multiple,
-                    "chart_url": t.chart_url,
-                    "session_id": t.session_id,
-                })
-        _logs_cache = [normalize_trade(tr) for tr in rows]
-        _logs_cache_timestamp = current_time
-        return _logs_cache
+    """
+    Read all trades from the database (DB is source of truth).
+
+    Returns the shared list of the current snapshot (DB id order); treat it
+    and its dicts as read-only, copy before changing anything.
+    """
+    return get_trade_snapshot().trades
 
 
 def invalidate_logs_cache():
-    """Invalidate the logs cache (call after write operations) [5F.2 FIX F1]"""
-    global _logs_cache, _logs_cache_timestamp
-    with _logs_cache_lock:
-        _logs_cache = None
-        _logs_cache_timestamp = 0
-        print("[PERFORMANCE] Logs cache invalidated")
+    """Force the next read_logs() to rebuild (call after writes that bypass the DB hooks)"""
+    bump("trades")
+    print("[PERFORMANCE] Logs cache invalidated")
 
 
 def write_logs(logs: List[Dict[str, Any]]):
@@ -138,7 +202,7 @@ def save_trade(trade: TradeRecord) -> Dict[str, Any]:
     Save a new trade record
     Returns the saved trade with added metadata
     """
-    logs = read_logs()
+    logs = list(read_logs())  # never append to the shared snapshot
     trade_dict = trade.dict()
     
     # Add metadata
@@ -157,10 +221,12 @@ def update_trade(session_id: str, outcome: str, r_multiple: float, comments: str
     Update an existing trade's outcome
     Returns the updated trade or None if not found
     """
-    logs = read_logs()
+    logs = list(read_logs())  # never edit the shared snapshot in place
     
-    for trade in logs:
+    for i, trade in enumerate(logs):
         if trade["session_id"] == session_id:
+            trade = dict(trade)
+            logs[i] = trade
             trade["outcome"] = outcome
             trade["r_multiple"] = r_multiple
             if comments:
@@ -186,12 +252,10 @@ def get_trade_by_session(session_id: str) -> Optional[Dict[str, Any]]:
 
 def get_trade_by_id(trade_id: int) -> Optional[Dict[str, Any]]:
     """Get a specific trade by numeric ID"""
-    logs = read_logs()
-    for trade in logs:
-        # Check both 'id' and 'trade_id' fields
-        if trade.get('id') == trade_id or trade.get('trade_id') == trade_id:
-            return trade
-    return None
+    snapshot = get_trade_snapshot()
+    # 'id' and 'trade_id' hold the same value in the snapshot
+    idx = snapshot.index_by_id.get(trade_id)
+    return snapshot.chronological[idx] if idx is not None else None
 
 
 def calculate_stats(symbol: Optional[str] = None, timeframe: Optional[str] = None) -> Dict[str, Any]:
@@ -199,7 +263,8 @@ def calculate_stats(symbol: Optional[str] = None, timeframe: Optional[str] = Non
     Calculate aggregated performance statistics
     Optional filters: symbol, timeframe
     """
-    logs = read_logs()
+    snapshot = get_trade_snapshot()
+    logs = snapshot.trades
     
     # Apply filters
     if symbol:
@@ -221,10 +286,13 @@ def calculate_stats(symbol: Optional[str] = None, timeframe: Optional[str] = Non
             "breakevens": 0
         }
     
-    # Categorize trades
-    wins = [t for t in logs if t.get("outcome") == "win"]
-    losses = [t for t in logs if t.get("outcome") == "loss"]
-    breakevens = [t for t in logs if t.get("outcome") == "breakeven"]
+    # Categorize trades (precomputed per snapshot when unfiltered)
+    if logs is snapshot.trades:
+        wins, losses, breakevens = (snapshot.by_outcome[o] for o in OUTCOMES)
+    else:
+        wins = [t for t in logs if t.get("outcome") == "win"]
+        losses = [t for t in logs if t.get("outcome") == "loss"]
+        breakevens = [t for t in logs if t.get("outcome") == "breakeven"]
     
     # Establish baseline risk from median absolute loss (if explicit R not provided)
     def baseline_risk(trades):
@@ -295,10 +363,8 @@ def get_all_trades(limit: Optional[int] = None, offset: int = 0) -> List[Dict[st
     """
     Get all trades with optional pagination
     """
-    logs = read_logs()
-    
-    # Sort by timestamp (newest first)
-    logs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+    # Newest first (precomputed per snapshot)
+    logs = get_trade_snapshot().newest_first
     
     if limit:
         return logs[offset:offset + limit]
@@ -1,18 +1,25 @@
 from __future__ import annotations
 
-from typing import List, Optional
+import base64
+import json
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timezone
 
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, and_
+from sqlalchemy import DateTime, func, or_, and_, tuple_
 
 from db.session import get_db
-from db.models import Trade
+from db.models import Trade, TradeStat
+from db.trading_sessions import session_bucket
+from utils.data_versions import get_version
 
 
 router = APIRouter(prefix="/trades", tags=["trades"])
 
+# (trades data version, median absolute loss) for estimate_r
+_loss_baseline: Optional[tuple] = None
+
 
 def detect_trading_session(entry_time: datetime) -> Optional[str]:
     """
@@ -25,35 +32,7 @@ def detect_trading_session(entry_time: datetime) -> Optional[str]:
     - London: 2 AM - 11 AM (2:00 - 11:00)
     - NY: 8 AM - 4 PM (8:00 - 16:00)
     """
-    if not entry_time:
-        return None
-    
-    # Assume entry_time is already in EST/EDT (local time)
-    # If timezone-aware, convert to naive datetime (assume it's already EST/EDT)
-    if entry_time.tzinfo:
-        # Remove timezone info, assume it's already in EST/EDT
-        entry_time_local = entry_time.replace(tzinfo=None)
-    else:
-        # Already timezone-naive, assume it's in EST/EDT
-        entry_time_local = entry_time
-    
-    hour = entry_time_local.hour
-    
-    # Asia session: 5 PM - 2 AM (17:00 - 23:59 and 0:00 - 2:00)
-    # London session: 2 AM - 11 AM (2:00 - 11:00)
-    # NY session: 8 AM - 4 PM (8:00 - 16:00)
-    # Note: 8 AM - 11 AM overlaps between London and NY, NY takes priority
-    
-    if hour >= 17 or hour < 2:
-        return "asian"
-    elif 2 <= hour < 8:
-        return "london"  # London session (2 AM - 8 AM)
-    elif 8 <= hour < 16:
-        return "ny"  # NY session (8 AM - 4 PM) - takes priority over London
-    elif 16 <= hour < 17:
-        return "asian"  # 4 PM - 5 PM, transition to Asian
-    else:
-        return "london"  # Default fallback
+    return session_bucket(entry_time)
 
 
 def _parse_dt(val: Optional[str]) -> Optional[datetime]:
@@ -67,6 +46,110 @@ def _parse_dt(val: Optional[str]) -> Optional[datetime]:
     return None
 
 
+def _encode_cursor(sort_key: str, descending: bool, row: Trade, sort_col) -> str:
+    """Opaque token for the position just after `row` in (sort column, id) order"""
+    value = getattr(row, sort_col.key)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = {"s": sort_key, "d": "desc" if descending else "asc", "v": value, "i": row.id}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort_key: str, descending: bool, sort_col) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value, last_id = payload["v"], int(payload["i"])
+        if payload["s"] != sort_key or payload["d"] != ("desc" if descending else "asc"):
+            raise ValueError("cursor was issued for a different sort order")
+        if value is not None and isinstance(sort_col.type, DateTime):
+            value = datetime.fromisoformat(value)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+    return {"value": value, "id": last_id}
+
+
+def _keyset_rows(q, sort_col, descending: bool, after: Optional[Dict[str, Any]], n: int) -> List[Trade]:
+    """
+    Up to n rows after the cursor position, ordered by sort_col (NULLs last)
+    then id. Scans the non-NULL keys and the NULL keys as two separate
+    range queries so each one can walk the index instead of sorting; the cost
+    per page does not grow with how deep the cursor is.
+    """
+    id_order = Trade.id.desc() if descending else Trade.id.asc()
+    rows: List[Trade] = []
+    if after is None or after["value"] is not None:
+        part = q.filter(sort_col.isnot(None))
+        if after is not None:
+            if sort_col is Trade.id:
+                part = part.filter(Trade.id < after["id"] if descending else Trade.id > after["id"])
+            else:
+                key, bound = tuple_(sort_col, Trade.id), (after["value"], after["id"])
+                part = part.filter(key < bound if descending else key > bound)
+        order = (sort_col.desc() if descending else sort_col.asc(), id_order)
+        rows = part.order_by(*order).limit(n).all()
+    if len(rows) < n and sort_col is not Trade.id:
+        part = q.filter(sort_col.is_(None))
+        if after is not None and after["value"] is None:
+            part = part.filter(Trade.id < after["id"] if descending else Trade.id > after["id"])
+        rows += part.order_by(id_order).limit(n - len(rows)).all()
+    return rows
+
+
+def _median_abs_loss(db: Session) -> Optional[float]:
+    """
+    Median absolute loss over all trades: the 1R unit /performance/all uses to
+    approximate r_multiple when a trade has none. Two indexed queries, cached
+    until the "trades" data version moves.
+    """
+    global _loss_baseline
+    version = get_version("trades")
+    if _loss_baseline is not None and _loss_baseline[0] == version:
+        return _loss_baseline[1]
+    losses = db.query(func.count(Trade.id)).filter(Trade.pnl < 0).scalar() or 0
+    base = None
+    if losses:
+        # Smallest absolute loss first; one middle row when odd, two when even
+        middle = (db.query(Trade.pnl).filter(Trade.pnl < 0).order_by(Trade.pnl.desc())
+                  .offset((losses - 1) // 2).limit(2 - losses % 2).all())
+        base = abs(sum(p for (p,) in middle) / len(middle))
+    _loss_baseline = (version, base)
+    return base
+
+
+def _estimate_total(
+    db: Session,
+    outcome: Optional[str],
+    symbol: Optional[str],
+    direction: Optional[str],
+    session: Optional[str],
+    entry_method_id: Optional[int],
+    has_entry_method: Optional[bool],
+) -> int:
+    """
+    Trade count from the trade_stats summary (O(#groups)), applying the
+    filters it can express. Filters it cannot (time range, pnl/R bounds,
+    setup, session_id) are ignored, so the figure is an upper bound then.
+    """
+    o = (outcome or "").lower()
+    measure = {"win": TradeStat.wins, "loss": TradeStat.losses, "breakeven": TradeStat.breakevens}.get(o, TradeStat.trade_count)
+    q = db.query(func.coalesce(func.sum(measure), 0))
+    if symbol:
+        q = q.filter(TradeStat.symbol.ilike(f"%{symbol}%"))
+    if direction:
+        q = q.filter(TradeStat.direction == direction)
+    session_lower = (session or "").lower()
+    if session_lower == "london":
+        q = q.filter(or_(TradeStat.session == "london", TradeStat.session.is_(None)))
+    elif session_lower in ("ny", "asian"):
+        q = q.filter(TradeStat.session == session_lower)
+    if entry_method_id is not None:
+        q = q.filter(TradeStat.entry_method_id == entry_method_id)
+    if has_entry_method is not None:
+        q = q.filter(TradeStat.entry_method_id.isnot(None) if has_entry_method else TradeStat.entry_method_id.is_(None))
+    return int(q.scalar() or 0)
+
+
 @router.get("")
 def list_trades(
     db: Session = Depends(get_db),
@@ -88,7 +171,17 @@ def list_trades(
     has_entry_method: Optional[bool] = Query(None, description="Filter trades with/without entry method"),
     sort_by: Optional[str] = Query("entry_time", description="id|entry_time|exit_time|pnl|r_multiple"),
     sort_dir: Optional[str] = Query("asc", description="asc|desc"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (keyset pagination; offset is ignored)"),
+    count: str = Query("exact", description="exact|estimate|none - how to compute total"),
+    estimate_r: bool = Query(False, description="Approximate missing r_multiple from the median loss (as /performance/all does)"),
 ):
+    """
+    List trades with filters. Pages either by opaque cursor (keyset on the
+    sort column + id; pass next_cursor back to continue) or, for older
+    clients, by offset. Deep offsets rescan every skipped row, so scrolling
+    UIs should follow next_cursor and ask for count=estimate or count=none
+    after the first page.
+    """
     q = db.query(Trade)
     if outcome:
         o = (outcome or '').lower()
@@ -129,12 +222,14 @@ def list_trades(
         else:
             q = q.filter(Trade.entry_method_id.is_(None))
     if session:
-        # Filter by trading session (London, NY, Asian)
+        # Filter by trading session (London, NY, Asian) on the persisted column
         session_lower = session.lower()
         if session_lower in ['london', 'ny', 'asian']:
-            # Filter trades based on entry_time hour
-            # We'll apply this filter after fetching results
-            pass  # Will filter after query
+            if session_lower == 'london':
+                # Trades without an entry_time have always been listed under London
+                q = q.filter(or_(Trade.trading_session == 'london', Trade.entry_time.is_(None)))
+            else:
+                q = q.filter(Trade.trading_session == session_lower)
     # Sorting
     sort_map = {
         "id": Trade.id,
@@ -143,48 +238,64 @@ def list_trades(
         "pnl": Trade.pnl,
         "r_multiple": Trade.r_multiple,
     }
-    sort_col = sort_map.get((sort_by or "entry_time").lower(), Trade.entry_time)
-    if (sort_dir or "asc").lower() == "desc":
-        # Put rows with null sort keys last
-        q = q.order_by((sort_col.is_(None)).asc(), sort_col.desc())
+    sort_key = (sort_by or "entry_time").lower()
+    if sort_key not in sort_map:
+        sort_key = "entry_time"
+    sort_col = sort_map[sort_key]
+    descending = (sort_dir or "asc").lower() == "desc"
+
+    mode = (count or "exact").lower()
+    if mode == "exact":
+        total = q.count()
+    elif mode == "estimate":
+        total = _estimate_total(db, outcome, symbol, direction, session, entry_method_id, has_entry_method)
     else:
-        q = q.order_by((sort_col.is_(None)).asc(), sort_col.asc())
-    total = q.count()
-    rows = q.offset(offset).limit(limit * 2 if session else limit).all()  # Fetch more if session filtering needed
-    
-    # Filter by session if requested (post-query filtering)
-    if session:
-        session_lower = session.lower()
-        if session_lower in ['london', 'ny', 'asian']:
-            filtered_rows = []
-            for trade in rows:
-                if trade.entry_time:
-                    trade_session = detect_trading_session(trade.entry_time)
-                    if trade_session == session_lower:
-                        filtered_rows.append(trade)
-                else:
-                    # If no entry_time, skip session filtering for this trade
-                    if session_lower == 'london':  # Default behavior
-                        filtered_rows.append(trade)
-            rows = filtered_rows[:limit]  # Apply limit after filtering
-            total = len(filtered_rows)  # Update total count
-    
+        total = None
+
+    # One extra row tells whether another page exists
+    if cursor or not offset:
+        after = _decode_cursor(cursor, sort_key, descending, sort_col) if cursor else None
+        rows = _keyset_rows(q, sort_col, descending, after, limit + 1)
+        offset = 0
+    else:
+        # Legacy offset paging; rows with null sort keys last, id breaks ties
+        id_order = Trade.id.desc() if descending else Trade.id.asc()
+        q = q.order_by((sort_col.is_(None)).asc(), sort_col.desc() if descending else sort_col.asc(), id_order)
+        rows = q.offset(offset).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = _encode_cursor(sort_key, descending, rows[-1], sort_col) if has_more else None
+    base = _median_abs_loss(db) if estimate_r else None
+
+    def r_multiple(r: Trade) -> Optional[float]:
+        if r.r_multiple is None and base and r.pnl is not None:
+            return round(r.pnl / base, 2)
+        return r.r_multiple
+
     return {
         "total": total,
+        "total_estimated": mode == "estimate",
         "limit": limit,
         "offset": offset,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
         "items": [
             {
                 "trade_id": r.trade_id,
                 "symbol": r.symbol,
                 "entry_time": r.entry_time,
                 "exit_time": r.exit_time,
+                "entry_price": r.entry_price,
+                "exit_price": r.exit_price,
                 "direction": r.direction,
                 "outcome": r.outcome,
                 "pnl": r.pnl,
-                "r_multiple": r.r_multiple,
+                "r_multiple": r_multiple(r),
+                "r_estimated": r.r_multiple is None and r_multiple(r) is not None,
+                "session_id": r.session_id,
                 "setup_id": r.setup_id,
                 "entry_method_id": r.entry_method_id,
+                "trading_session": r.trading_session,
             }
             for r in rows
         ],
@@ -1,129 +1,702 @@
 """
-Session Cache for Visual Trade Copilot
+Caches for Visual Trade Copilot
 Phase 3C: Hybrid Vision → Reasoning Bridge
 
-In-memory cache for GPT-4o vision summaries.
-Persists while server runs, cleared per session or on new chart uploads.
+VisionSummaryCache holds GPT-4o vision summaries keyed by image content hash,
+shared across sessions, bounded in memory and optionally persisted to SQLite.
+
+Also hosts the content-addressed ResponseCache that sits in front of
+OpenAIClient.create_response (memory LRU + on-disk tier).
 """
 
-from collections import defaultdict
-from typing import Any, Optional
+from collections import defaultdict, OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import threading
 import time
 
 
-class SessionCache:
+VISION_CACHE_MAX_BYTES = int(float(os.getenv("VISION_CACHE_MAX_MB", "16")) * 1024 * 1024)
+VISION_CACHE_TTL = float(os.getenv("VISION_CACHE_TTL", str(7 * 24 * 3600)))  # seconds, 0 = no expiry
+VISION_CACHE_MAX_SESSIONS = int(os.getenv("VISION_CACHE_MAX_SESSIONS", "2048"))
+VISION_CACHE_PERSIST = os.getenv("VISION_CACHE_PERSIST", "1").strip().lower() not in ("0", "false", "no")
+VISION_CACHE_DB = Path(os.getenv(
+    "VISION_CACHE_DB",
+    str(Path(__file__).parent / "data" / "vision_cache.sqlite3")
+))
+
+
+class VisionSummaryCache:
     """
-    Simple in-memory cache for session data.
-    Stores GPT-4o vision summaries to avoid re-analyzing the same chart.
+    Vision summaries keyed by image content hash, shared across sessions.
+    
+    - Memory tier: LRU ordered by last use, capped by total summary bytes, with TTL
+    - Persistence tier (optional): SQLite table so summaries survive restarts
+    - Sessions only hold a pointer (session_id -> image_hash), capped by count
     """
     
-    def __init__(self):
-        self.data = defaultdict(dict)
-        self.timestamps = defaultdict(dict)
-        
-    def get(self, session_id: str, key: str) -> Optional[Any]:
+    def __init__(self,
+                 max_bytes: int = VISION_CACHE_MAX_BYTES,
+                 ttl: float = VISION_CACHE_TTL,
+                 max_sessions: int = VISION_CACHE_MAX_SESSIONS,
+                 db_path: Optional[Path] = VISION_CACHE_DB if VISION_CACHE_PERSIST else None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.db_path = Path(db_path) if db_path else None
+        self._summaries: "OrderedDict[str, Tuple[str, float, int]]" = OrderedDict()  # hash -> (summary, stored_at, bytes)
+        self._bytes = 0
+        self._sessions: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self.counters = {"hits": 0, "persisted_hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+    
+    # --- summaries ---
+    
+    def get_summary(self, image_hash: str) -> Optional[str]:
         """
-        Get cached value for a session.
+        Get the cached summary for an image (blocking; use aget_summary() on the event loop).
         
         Args:
-            session_id: Session identifier
-            key: Cache key (e.g., "vision_summary")
+            image_hash: Content hash of the raw image bytes
             
         Returns:
-            Cached value or None if not found
+            Summary text or None if not cached / expired
         """
-        return self.data[session_id].get(key)
+        found, summary = self._get_memory(image_hash)
+        return summary if found else self._get_persisted(image_hash)
+    
+    async def aget_summary(self, image_hash: str) -> Optional[str]:
+        """get_summary() with the SQLite tier read in a worker thread"""
+        found, summary = self._get_memory(image_hash)
+        return summary if found else await asyncio.to_thread(self._get_persisted, image_hash)
     
-    def set(self, session_id: str, key: str, value: Any) -> None:
+    def set_summary(self, image_hash: str, summary: str) -> None:
         """
-        Set cached value for a session.
+        Store a summary for an image in the memory and persistence tiers
+        (blocking; use aset_summary() on the event loop).
         
         Args:
-            session_id: Session identifier
-            key: Cache key
-            value: Value to cache
+            image_hash: Content hash of the raw image bytes
+            summary: Vision summary text
         """
-        self.data[session_id][key] = value
-        self.timestamps[session_id][key] = time.time()
-        print(f"[CACHE] Set {key} for session {session_id}")
+        self._db_put(image_hash, summary, self._set_memory(image_hash, summary))
+    
+    async def aset_summary(self, image_hash: str, summary: str) -> None:
+        """set_summary() with the SQLite tier written in a worker thread"""
+        stored_at = self._set_memory(image_hash, summary)
+        await asyncio.to_thread(self._db_put, image_hash, summary, stored_at)
+    
+    # --- session pointers ---
+    
+    def bind_session(self, session_id: str, image_hash: str) -> None:
+        """Point a session at the image it is currently discussing"""
+        with self._lock:
+            self._sessions[session_id] = image_hash
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+    
+    def get_session_image(self, session_id: str) -> Optional[str]:
+        """Image hash the session last used, if any"""
+        with self._lock:
+            return self._sessions.get(session_id)
     
     def clear(self, session_id: str) -> None:
         """
-        Clear all cached data for a session.
+        Forget a session's image pointer. The summary itself stays cached for
+        other sessions showing the same chart.
         
         Args:
             session_id: Session identifier
         """
-        if session_id in self.data:
-            del self.data[session_id]
-        if session_id in self.timestamps:
-            del self.timestamps[session_id]
+        with self._lock:
+            self._sessions.pop(session_id, None)
         print(f"[CACHE] Cleared session {session_id}")
     
-    def clear_key(self, session_id: str, key: str) -> None:
+    def evict(self, image_hash: str) -> None:
+        """Remove one summary from every tier"""
+        with self._lock:
+            self._drop(image_hash)
+        self._db_delete(image_hash)
+    
+    def stats(self) -> dict:
         """
-        Clear specific cached key for a session.
+        Get cache statistics.
         
-        Args:
-            session_id: Session identifier
-            key: Cache key to clear
+        Returns:
+            Dictionary with cache stats
         """
-        if session_id in self.data and key in self.data[session_id]:
-            del self.data[session_id][key]
-        if session_id in self.timestamps and key in self.timestamps[session_id]:
-            del self.timestamps[session_id][key]
-        print(f"[CACHE] Cleared {key} for session {session_id}")
+        with self._lock:
+            return {
+                **self.counters,
+                "summaries": len(self._summaries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "sessions": len(self._sessions),
+                "persistent": self.db_path is not None,
+            }
+    
+    # --- internals ---
+    # _lock guards the memory tier and counters; _db_lock guards the SQLite
+    # connection, so a slow or locked database never holds up memory hits.
+    
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl > 0 and (time.time() - stored_at) > self.ttl
+    
+    def _get_memory(self, image_hash: str) -> Tuple[bool, Optional[str]]:
+        with self._lock:
+            entry = self._summaries.get(image_hash)
+            if entry is not None:
+                if self._expired(entry[1]):
+                    self._drop(image_hash)
+                    self.counters["expired"] += 1
+                else:
+                    self._summaries.move_to_end(image_hash)
+                    self.counters["hits"] += 1
+                    return True, entry[0]
+            return False, None
+    
+    def _get_persisted(self, image_hash: str) -> Optional[str]:
+        row = self._db_get(image_hash)
+        with self._lock:
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            summary, stored_at = row
+            self._remember(image_hash, summary, stored_at)
+            self.counters["hits"] += 1
+            self.counters["persisted_hits"] += 1
+            return summary
+    
+    def _set_memory(self, image_hash: str, summary: str) -> float:
+        stored_at = time.time()
+        with self._lock:
+            self._remember(image_hash, summary, stored_at)
+        print(f"[CACHE] Stored vision summary {image_hash[:8]}... ({len(summary)} chars)")
+        return stored_at
+    
+    def _remember(self, image_hash: str, summary: str, stored_at: float) -> None:
+        # Call with self._lock held
+        self._drop(image_hash)
+        size = len(summary.encode("utf-8"))
+        self._summaries[image_hash] = (summary, stored_at, size)
+        self._bytes += size
+        while self._bytes > self.max_bytes and len(self._summaries) > 1:
+            old_hash, _ = next(iter(self._summaries.items()))
+            self._drop(old_hash)
+            self.counters["evictions"] += 1
+    
+    def _drop(self, image_hash: str) -> None:
+        entry = self._summaries.pop(image_hash, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+    
+    def _connect(self):
+        # Call with self._db_lock held
+        if self.db_path is None:
+            return None
+        if self._db is None:
+            try:
+                import sqlite3
+                self.db_path.parent.mkdir(parents=True, exist_ok=True)
+                self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS vision_summaries ("
+                    "image_hash TEXT PRIMARY KEY, summary TEXT NOT NULL, stored_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except Exception as e:
+                print(f"[CACHE] Vision cache persistence disabled: {e}")
+                self.db_path = None
+                self._db = None
+        return self._db
     
-    def get_age(self, session_id: str, key: str) -> Optional[float]:
+    def _db_get(self, image_hash: str) -> Optional[Tuple[str, float]]:
+        with self._db_lock:
+            if self._connect() is None:
+                return None
+            try:
+                row = self._db.execute(
+                    "SELECT summary, stored_at FROM vision_summaries WHERE image_hash = ?", (image_hash,)
+                ).fetchone()
+            except Exception as e:
+                print(f"[CACHE] Vision cache read failed: {e}")
+                return None
+        if row is None:
+            return None
+        if self._expired(row[1]):
+            self._db_delete(image_hash)
+            with self._lock:
+                self.counters["expired"] += 1
+            return None
+        return row[0], row[1]
+    
+    def _db_put(self, image_hash: str, summary: str, stored_at: float) -> None:
+        with self._db_lock:
+            if self._connect() is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO vision_summaries (image_hash, summary, stored_at) VALUES (?, ?, ?)",
+                    (image_hash, summary, stored_at),
+                )
+                if self.ttl > 0:
+                    self._db.execute("DELETE FROM vision_summaries WHERE stored_at < ?", (time.time() - self.ttl,))
+                self._db.commit()
+            except Exception as e:
+                print(f"[CACHE] Vision cache write failed: {e}")
+    
+    def _db_delete(self, image_hash: str) -> None:
+        with self._db_lock:
+            if self._connect() is None:
+                return
+            try:
+                self._db.execute("DELETE FROM vision_summaries WHERE image_hash = ?", (image_hash,))
+                self._db.commit()
+            except Exception as e:
+                print(f"[CACHE] Vision cache delete failed: {e}")
+
+
+# Global cache instance
+_cache = VisionSummaryCache()
+
+
+def get_cache() -> VisionSummaryCache:
+    """Get the global vision summary cache instance"""
+    return _cache
+
+
+# ========== Single-flight request coalescing ==========
+
+class SingleFlight:
+    """
+    Coalesce concurrent async calls that share a key into one execution.
+    
+    The first caller (leader) starts the work as its own task; callers arriving
+    while it runs await the same task. Awaiting is shielded, so a caller that
+    disconnects does not cancel the work for everyone else.
+    """
+    
+    def __init__(self):
+        self._calls: Dict[str, "asyncio.Task"] = {}
+        self.counters = {"leaders": 0, "followers": 0}
+    
+    async def do(self, key: str, fn) -> Tuple[Any, bool]:
         """
-        Get age of cached value in seconds.
+        Run fn() once per key at a time.
         
         Args:
-            session_id: Session identifier
-            key: Cache key
+            key: Coalescing key (e.g., image hash)
+            fn: Zero-argument callable returning an awaitable
             
         Returns:
-            Age in seconds or None if not found
+            Tuple of (result, shared) where shared is True for callers that
+            joined an in-flight call
         """
-        if session_id in self.timestamps and key in self.timestamps[session_id]:
-            return time.time() - self.timestamps[session_id][key]
-        return None
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+            self.counters["leaders"] += 1
+        else:
+            self.counters["followers"] += 1
+        return await asyncio.shield(task), shared
+    
+    def _finish(self, key: str, task: "asyncio.Task") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when nobody is left awaiting
+    
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+# ========== Response cache (content-addressed) ==========
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1").strip().lower() not in ("0", "false", "no")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # seconds
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))  # memory tier
+RESPONSE_CACHE_MAX_DISK_MB = float(os.getenv("RESPONSE_CACHE_MAX_DISK_MB", "64"))  # disk tier
+RESPONSE_CACHE_DIR = Path(os.getenv(
+    "RESPONSE_CACHE_DIR",
+    str(Path(__file__).parent / "data" / "response_cache")
+))
+
+
+def _sha256(value: Any) -> str:
+    if isinstance(value, bytes):
+        data = value
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+    else:
+        data = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def response_cache_key(model: str,
+                       system_prompt: str,
+                       question: str,
+                       conversation_history: Optional[list] = None,
+                       image_base64: Optional[str] = None) -> str:
+    """
+    Build the content address for one create_response call.
     
-    def has(self, session_id: str, key: str) -> bool:
+    Args:
+        model: Resolved model name
+        system_prompt: Fully assembled system prompt
+        question: User question (verbatim)
+        conversation_history: Messages sent ahead of the question
+        image_base64: Encoded image sent with the question, if any
+        
+    Returns:
+        Hex SHA-256 key
+    """
+    parts = {
+        "model": model,
+        "system": _sha256(system_prompt or ""),
+        "question": question,
+        "history": _sha256(conversation_history or []),
+        "image": _sha256(image_base64) if image_base64 else None,
+    }
+    return _sha256(parts)
+
+
+class ResponseCache:
+    """
+    LRU + on-disk cache for model answers, keyed by response_cache_key().
+    
+    Memory tier is an OrderedDict capped by entry count; the disk tier stores one
+    JSON file per key (sharded by prefix) and is capped by total bytes, evicting
+    the oldest files first. Both tiers honour the TTL.
+    """
+    
+    def __init__(self,
+                 ttl: float = RESPONSE_CACHE_TTL,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_disk_bytes: int = int(RESPONSE_CACHE_MAX_DISK_MB * 1024 * 1024),
+                 cache_dir: Optional[Path] = RESPONSE_CACHE_DIR,
+                 enabled: bool = RESPONSE_CACHE_ENABLED):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.enabled = enabled
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._disk_bytes: Optional[int] = None  # computed lazily on first disk access
+        self.counters = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "bypassed": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+    
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+    
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl > 0 and (time.time() - entry.get("stored_at", 0)) > self.ttl
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
         """
-        Check if cache has a value.
+        Look up a cached response (blocking; use aget() on the event loop).
         
         Args:
-            session_id: Session identifier
-            key: Cache key
+            key: Key from response_cache_key()
             
         Returns:
-            True if cached value exists
+            Cached value dict or None on miss/expiry
         """
-        return session_id in self.data and key in self.data[session_id]
+        if not self.enabled:
+            return None
+        found, value = self._get_memory(key)
+        return value if found else self._get_disk(key)
     
-    def stats(self) -> dict:
+    async def aget(self, key: str) -> Optional[Dict[str, Any]]:
+        """get() with the disk tier read in a worker thread"""
+        if not self.enabled:
+            return None
+        found, value = self._get_memory(key)
+        return value if found else await asyncio.to_thread(self._get_disk, key)
+    
+    def set(self, key: str, value: Dict[str, Any]) -> None:
         """
-        Get cache statistics.
+        Store a response in both tiers (blocking; use aset() on the event loop).
+        
+        Args:
+            key: Key from response_cache_key()
+            value: JSON-serialisable response dict
+        """
+        if not self.enabled:
+            return
+        self._write_disk(key, self._set_memory(key, value))
+    
+    async def aset(self, key: str, value: Dict[str, Any]) -> None:
+        """set() with the disk tier written in a worker thread"""
+        if not self.enabled:
+            return
+        entry = self._set_memory(key, value)
+        await asyncio.to_thread(self._write_disk, key, entry)
+    
+    def record_bypass(self) -> None:
+        with self._lock:
+            self.counters["bypassed"] += 1
+    
+    def clear(self) -> None:
+        """Drop every cached response (memory and disk)"""
+        with self._lock:
+            self._memory.clear()
+        with self._disk_lock:
+            if self.cache_dir and self.cache_dir.exists():
+                for path in self.cache_dir.glob("*/*.json"):
+                    try:
+                        path.unlink()
+                    except OSError:
+                        pass
+            self._disk_bytes = 0
+        print("[CACHE] Response cache cleared")
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                "enabled": self.enabled,
+                **self.counters,
+                "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "ttl_s": self.ttl,
+            }
+    
+    # --- internals ---
+    # _lock guards the memory tier and counters; _disk_lock guards the files
+    # and _disk_bytes. Disk work never holds _lock, so memory hits are not
+    # stuck behind a read or an eviction scan. Order: _disk_lock, then _lock.
+    
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[name] += n
+    
+    def _get_memory(self, key: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if self._expired(entry):
+                    del self._memory[key]
+                    self.counters["expired"] += 1
+                else:
+                    self._memory.move_to_end(key)
+                    self.counters["hits"] += 1
+                    self.counters["memory_hits"] += 1
+                    return True, entry["value"]
+            return False, None
+    
+    def _get_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+            self._remember(key, entry)
+            self.counters["hits"] += 1
+            self.counters["disk_hits"] += 1
+            return entry["value"]
+    
+    def _set_memory(self, key: str, value: Dict[str, Any]) -> Dict[str, Any]:
+        entry = {"stored_at": time.time(), "value": value}
+        with self._lock:
+            self._remember(key, entry)
+            self.counters["stores"] += 1
+        return entry
+    
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        # Call with self._lock held
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.counters["evictions"] += 1
+    
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+        if self._expired(entry):
+            with self._disk_lock:
+                size = path.stat().st_size if path.exists() else 0
+                if self._unlink(path) and self._disk_bytes is not None:
+                    self._disk_bytes -= size
+            self._count("expired")
+            return None
+        return entry
+    
+    def _write_disk(self, key: str, entry: Dict[str, Any]) -> None:
+        if not self.cache_dir or self.max_disk_bytes <= 0:
+            return
+        path = self._path(key)
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        with self._disk_lock:
+            tmp = None
+            try:
+                self._ensure_disk_size()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                previous = path.stat().st_size if path.exists() else 0
+                # Write aside and rename so a reader never sees a half-written file
+                fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+                tmp = None
+                self._disk_bytes += len(data) - previous
+                if self._disk_bytes > self.max_disk_bytes:
+                    self._evict_disk()
+            except OSError as e:
+                print(f"[CACHE] Response cache write failed: {e}")
+            finally:
+                if tmp is not None:
+                    self._unlink(Path(tmp))
+    
+    def _ensure_disk_size(self) -> None:
+        # Call with self._disk_lock held
+        if self._disk_bytes is None:
+            total = 0
+            if self.cache_dir.exists():
+                for path in self.cache_dir.glob("*/*.json"):
+                    try:
+                        total += path.stat().st_size
+                    except OSError:
+                        pass
+            self._disk_bytes = total
+    
+    def _evict_disk(self) -> None:
+        """Remove oldest files until the disk tier is back under 90% of its cap (call with self._disk_lock held)"""
+        files = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                st = path.stat()
+                files.append((st.st_mtime, st.st_size, path))
+            except OSError:
+                pass
+        files.sort()
+        target = int(self.max_disk_bytes * 0.9)
+        evicted = 0
+        for _, size, path in files:
+            if self._disk_bytes <= target:
+                break
+            if self._unlink(path):
+                self._disk_bytes -= size
+                evicted += 1
+        if evicted:
+            self._count("evictions", evicted)
+    
+    @staticmethod
+    def _unlink(path: Path) -> bool:
+        try:
+            path.unlink()
+            return True
+        except OSError:
+            return False
+
+
+_response_cache = ResponseCache()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the global response cache instance"""
+    return _response_cache
+
+
+
+# ========== Prompt segment cache ==========
+
+class PromptSegmentCache:
+    """
+    Rendered system-prompt segments (awareness block, learning profile, trade summary).
+    
+    Each segment is stored under a version key built from utils.data_versions
+    (plus a content fingerprint where the source arrives with the request) and is
+    re-rendered only when that key changes. A few variants per segment are kept
+    so alternating callers do not thrash each other.
+    """
+    
+    def __init__(self, max_variants: int = 8):
+        self.max_variants = max_variants
+        self._segments: Dict[str, "OrderedDict[Any, str]"] = defaultdict(OrderedDict)
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "rebuilds": 0}
+    
+    def get(self, name: str, key: Any, render) -> str:
+        """
+        Return the rendered segment for a version key, rendering it on first use.
         
+        Args:
+            name: Segment name (e.g., "awareness")
+            key: Hashable version key for the segment's source data
+            render: Zero-argument callable producing the segment text
+            
         Returns:
-            Dictionary with cache stats
+            Segment text
         """
-        total_sessions = len(self.data)
-        total_keys = sum(len(keys) for keys in self.data.values())
+        with self._lock:
+            variants = self._segments[name]
+            if key in variants:
+                variants.move_to_end(key)
+                self.counters["hits"] += 1
+                return variants[key]
         
-        return {
-            "total_sessions": total_sessions,
-            "total_keys": total_keys,
-            "sessions": list(self.data.keys())
-        }
-
+        text = render() or ""
+        
+        with self._lock:
+            variants = self._segments[name]
+            variants[key] = text
+            variants.move_to_end(key)
+            while len(variants) > self.max_variants:
+                variants.popitem(last=False)
+            self.counters["rebuilds"] += 1
+        return text
+    
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drop one segment (or all) so it is rebuilt on next use"""
+        with self._lock:
+            if name is None:
+                self._segments.clear()
+            else:
+                self._segments.pop(name, None)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "segments": {name: len(v) for name, v in self._segments.items()},
+            }
 
-# Global cache instance
-_cache = SessionCache()
 
+_segment_cache = PromptSegmentCache()
 
-def get_cache() -> SessionCache:
-    """Get the global cache instance"""
-    return _cache
 
+def get_segment_cache() -> PromptSegmentCache:
+    """Get the global prompt segment cache instance"""
+    return _segment_cache
@@ -124,10 +124,9 @@ Always extract chart_min_price and chart_max_price from the price scale/labels v
     
     # Use vision model to analyze chart
     try:
-        import asyncio
-        # Use the client's chat completion method
-        response = await asyncio.to_thread(
-            lambda: client.client.chat.completions.create(
+        # Use the client's pooled chat completion transport
+        response = await client.complete_chat(
+            dict(
                 model=model,
                 messages=[
                     {
@@ -9,7 +9,7 @@ from pydantic import BaseModel
 from sqlalchemy.orm import Session
 import json
 
-from db.session import get_db
+from db.session import get_async_db, get_db, run_db
 from db.models import ChatSession
 from chat.state_manager import (
     get_or_create_session,
@@ -31,9 +31,9 @@ class ChatStateResponse(BaseModel):
 
 
 @router.get("/session/{session_id}/state", response_model=ChatStateResponse)
-def get_chat_state(session_id: str, db: Session = Depends(get_db)):
+async def get_chat_state(session_id: str, db=Depends(get_async_db)):
     """Get current chat session state"""
-    state = get_session_state(db, session_id)
+    state = await run_db(db, get_session_state, session_id)
     if state is None:
         state = {}
     
@@ -1,4 +1,5 @@
 from .session import engine, SessionLocal, get_db
-from .models import Base, Trade, Chart, Setup, Annotation, TeachingSession
-
-
+from .models import Base, Trade, Chart, Setup, Annotation, TeachingSession, TradeStat, CsvImport
+from . import events  # noqa: F401  (registers trade write listeners)
+from . import trade_stats  # noqa: F401  (keeps the trade_stats summary in step with trade writes)
+from . import trading_sessions  # noqa: F401  (stamps trading_session/entry_hour on trade writes)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import time
+from itertools import chain
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from utils import metrics
+from utils.data_versions import bump
+
+from .models import Trade
+
+
+# Bump the "trades" data version once per committed transaction that touched
+# the trades table, so cached prompt segments and snapshots can tell when to rebuild.
+
+_FLAG = "trades_dirty"
+
+
+@event.listens_for(Session, "after_flush")
+def _track_trade_flush(session: Session, flush_context) -> None:
+    if any(isinstance(obj, Trade) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info[_FLAG] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_trade_bulk(orm_execute_state) -> None:
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is Trade:
+        orm_execute_state.session.info[_FLAG] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_trade_version(session: Session) -> None:
+    if session.info.pop(_FLAG, False):
+        bump("trades")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_trade_flag(session: Session) -> None:
+    session.info.pop(_FLAG, None)
+
+
+# Per-statement timing for the db_query stage of /metrics.
+
+_QUERY_START = "metrics_query_start"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault(_QUERY_START, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query_time(conn, cursor, statement, parameters, context, executemany) -> None:
+    starts = conn.info.get(_QUERY_START)
+    if starts:
+        metrics.observe("db_query", time.perf_counter() - starts.pop())
@@ -1,13 +1,23 @@
 from __future__ import annotations
 
 import csv
+import hashlib
+import importlib.util
+import os
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional
 
+from sqlalchemy import func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
-from .models import Trade
+from utils.data_versions import bump
+
+from .maintenance import backfill_trade_columns
+from .models import CsvImport, Trade
+from .trade_stats import rebuild_trade_stats
+from .trading_sessions import refresh_session_columns
 
 
 def _parse_dt(value: Optional[str]) -> Optional[datetime]:
@@ -97,3 +107,169 @@ def import_from_csv(db: Session, csv_path: Path) -> dict:
     return {"updated": updated, "skipped": skipped}
 
 
+
+
+# --- bulk import (startup path) ---
+
+CSV_IMPORT_CHUNK_ROWS = int(os.getenv("CSV_IMPORT_CHUNK_ROWS", "5000"))
+PANDAS_AVAILABLE = importlib.util.find_spec("pandas") is not None
+
+# CSV column -> Trade column (CSV headers are matched case-insensitively)
+_COLUMNS = {
+    "enteredat": "entry_time",
+    "exitedat": "exit_time",
+    "entryprice": "entry_price",
+    "exitprice": "exit_price",
+    "pnl": "pnl",
+    "type": "direction",
+}
+_FIELDS = ("entry_time", "exit_time", "entry_price", "exit_price", "pnl", "direction")
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _iter_chunks_pandas(csv_path: Path) -> Iterator[List[Dict[str, Any]]]:
+    """CSV rows as upsert records, parsed a chunk at a time with vectorized pandas ops"""
+    import pandas as pd
+
+    reader = pd.read_csv(
+        csv_path, dtype=str, keep_default_na=False, encoding="utf-8-sig", chunksize=CSV_IMPORT_CHUNK_ROWS
+    )
+    for chunk in reader:
+        chunk.columns = [str(c).strip().lstrip("\ufeff").lower() for c in chunk.columns]
+        out = pd.DataFrame({"trade_id": chunk.get("id", pd.Series("", index=chunk.index)).str.strip()})
+        for source, field in _COLUMNS.items():
+            col = chunk[source] if source in chunk else pd.Series("", index=chunk.index)
+            if field in ("entry_time", "exit_time"):
+                # "10/29/2025 02:34:55 -05:00": drop the offset (times are kept as exported)
+                text = col.str.strip().str.replace(r"\s[+-]\d{2}:\d{2}$", "", regex=True)
+                parsed = pd.to_datetime(text, format="%m/%d/%Y %H:%M:%S", errors="coerce")
+                parsed = parsed.fillna(pd.to_datetime(text, format="%m/%d/%Y", errors="coerce"))
+                out[field] = parsed.astype(object).where(parsed.notna(), None)
+            elif field == "direction":
+                lowered = col.str.strip().str.lower()
+                out[field] = lowered.where(lowered.isin(["long", "short"]), None)
+            else:
+                numbers = pd.to_numeric(col.str.strip(), errors="coerce")
+                out[field] = numbers.astype(object).where(numbers.notna(), None)
+        records = out.to_dict("records")
+        for row in records:
+            for field in ("entry_time", "exit_time"):
+                if row[field] is not None:
+                    row[field] = row[field].to_pydatetime()
+        yield records
+
+
+def _iter_chunks_csv(csv_path: Path) -> Iterator[List[Dict[str, Any]]]:
+    """Fallback without pandas: csv module, row-by-row parsing, same record shape"""
+
+    def _safe_float(v: Optional[str]) -> Optional[float]:
+        try:
+            return float(v) if v not in (None, "") else None
+        except Exception:
+            return None
+
+    with csv_path.open("r", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        chunk: List[Dict[str, Any]] = []
+        for row in reader:
+            row_norm = {(k or "").strip().lstrip("\ufeff").lower(): v for k, v in row.items()}
+            direction = (row_norm.get("type") or "").strip().lower()
+            chunk.append({
+                "trade_id": (row_norm.get("id") or "").strip(),
+                "entry_time": _parse_dt(row_norm.get("enteredat")),
+                "exit_time": _parse_dt(row_norm.get("exitedat")),
+                "entry_price": _safe_float(row_norm.get("entryprice")),
+                "exit_price": _safe_float(row_norm.get("exitprice")),
+                "pnl": _safe_float(row_norm.get("pnl")),
+                "direction": direction if direction in ("long", "short") else None,
+            })
+            if len(chunk) >= CSV_IMPORT_CHUNK_ROWS:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def bulk_import_csv(db: Session, csv_path: Path, force: bool = False) -> dict:
+    """
+    Upsert trades from a broker CSV export in batches.
+
+    Same field semantics as import_from_csv (match Id -> trade_id, CSV values
+    overwrite when present, blanks keep what is stored, unknown ids are
+    created) but streamed in chunks with one INSERT ... ON CONFLICT(trade_id)
+    DO UPDATE per chunk. The file's size/mtime and SHA-256 are recorded in
+    csv_imports; an unchanged file is skipped without being parsed. Missing
+    outcome/entry_time on the imported rows are derived in the same
+    transaction (see db/maintenance.py).
+
+    Args:
+        db: Session (committed on success)
+        csv_path: CSV export to import
+        force: Import even if the manifest says the file is unchanged
+
+    Returns:
+        {"updated": rows upserted, "skipped": rows without an Id,
+         "unchanged": True when the import was skipped}
+    """
+    if not csv_path.exists():
+        return {"updated": 0, "skipped": 0, "reason": "file_not_found"}
+
+    source = str(csv_path.resolve())
+    stat = csv_path.stat()
+    manifest = db.query(CsvImport).filter(CsvImport.source == source).first()
+    if manifest and not force:
+        if manifest.size == stat.st_size and manifest.mtime == stat.st_mtime:
+            return {"updated": 0, "skipped": 0, "unchanged": True}
+    sha256 = _file_sha256(csv_path)
+    if manifest and not force and manifest.sha256 == sha256:
+        manifest.mtime = stat.st_mtime  # touched but identical
+        db.commit()
+        return {"updated": 0, "skipped": 0, "unchanged": True}
+
+    stmt = sqlite_insert(Trade.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Trade.__table__.c.trade_id],
+        set_={field: func.coalesce(getattr(stmt.excluded, field), Trade.__table__.c[field]) for field in _FIELDS},
+    )
+
+    updated = 0
+    skipped = 0
+    now = datetime.utcnow()
+    conn = db.connection()
+    chunks = _iter_chunks_pandas(csv_path) if PANDAS_AVAILABLE else _iter_chunks_csv(csv_path)
+    for records in chunks:
+        batch = []
+        for record in records:
+            if not record["trade_id"]:
+                skipped += 1
+                continue
+            if any(record[field] is not None for field in _FIELDS):
+                updated += 1
+            batch.append({**record, "created_at": now})
+        if batch:
+            conn.execute(stmt, batch)
+
+    # Derive outcome/entry_time where the export left them empty, then (Core
+    # statements skip the ORM hooks) refresh derived columns/summary once
+    backfill_trade_columns(conn)
+    refresh_session_columns(conn)
+    rebuild_trade_stats(db)
+
+    if manifest is None:
+        manifest = CsvImport(source=source)
+        db.add(manifest)
+    manifest.sha256 = sha256
+    manifest.size = stat.st_size
+    manifest.mtime = stat.st_mtime
+    manifest.rows = updated + skipped
+    manifest.imported_at = now
+    db.commit()
+    bump("trades")
+    return {"updated": updated, "skipped": skipped, "unchanged": False}
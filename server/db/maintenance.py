@@ -1,40 +1,50 @@
 from __future__ import annotations
 
+from sqlalchemy import case, update
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+
+from utils.data_versions import bump
 
 from .models import Trade
+from .trade_stats import rebuild_trade_stats
+from .trading_sessions import refresh_session_columns
 
 
-def backfill_trades(db: Session) -> dict:
-    """Backfill missing outcome and entry_time for existing trades.
+def backfill_trade_columns(conn) -> dict:
+    """Set-based backfill statements (no commit, no derived-table refresh).
     - outcome: derive from pnl if missing (win/loss/breakeven)
     - entry_time: set to created_at if missing
+    Both WHERE clauses hit an index (outcome, entry_time), so this costs
+    nothing when there is nothing to fill.
     """
-    updated_outcome = 0
-    updated_entry_time = 0
+    trades = Trade.__table__
+    outcome = conn.execute(
+        update(trades)
+        .where(trades.c.outcome.is_(None), trades.c.pnl.isnot(None))
+        .values(outcome=case((trades.c.pnl > 0, "win"), (trades.c.pnl < 0, "loss"), else_="breakeven"))
+    ).rowcount
+    entry_time = conn.execute(
+        update(trades)
+        .where(trades.c.entry_time.is_(None), trades.c.created_at.isnot(None))
+        .values(entry_time=trades.c.created_at)
+    ).rowcount
+    return {"outcome": outcome, "entry_time": entry_time}
 
-    for t in db.query(Trade).all():
-        changed = False
-        if t.outcome is None and t.pnl is not None:
-            if t.pnl > 0:
-                t.outcome = "win"
-            elif t.pnl < 0:
-                t.outcome = "loss"
-            else:
-                t.outcome = "breakeven"
-            updated_outcome += 1
-            changed = True
-
-        if t.entry_time is None and t.created_at is not None:
-            t.entry_time = t.created_at
-            updated_entry_time += 1
-            changed = True
-
-        if changed:
-            db.add(t)
 
+def backfill_trades(db: Session) -> dict:
+    """Backfill missing outcome and entry_time for existing trades.
+    - outcome: derive from pnl if missing (win/loss/breakeven)
+    - entry_time: set to created_at if missing
+    Runs as two UPDATE statements; the Core statements bypass the ORM write
+    hooks, so session columns and trade_stats are refreshed here when rows changed.
+    """
+    conn = db.connection()
+    result = backfill_trade_columns(conn)
+    if result["entry_time"]:
+        refresh_session_columns(conn)
+    if result["outcome"] or result["entry_time"]:
+        rebuild_trade_stats(db)
     db.commit()
-    return {"outcome": updated_outcome, "entry_time": updated_entry_time}
-
-
+    if result["outcome"] or result["entry_time"]:
+        bump("trades")
+    return result
@@ -12,6 +12,7 @@ from sqlalchemy import (
     Boolean,
     JSON,
     ForeignKey,
+    Index,
 )
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
@@ -26,7 +27,10 @@ class Trade(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     trade_id = Column(String, unique=True, index=True, nullable=False)
     symbol = Column(String, index=True, nullable=True)
-    entry_time = Column(DateTime, nullable=True)
+    entry_time = Column(DateTime, index=True, nullable=True)  # default sort / keyset pagination key
+    # Derived from entry_time on write (db/trading_sessions.py); filterable in SQL
+    trading_session = Column(String, index=True, nullable=True)  # 'asian' | 'london' | 'ny'
+    entry_hour = Column(Integer, nullable=True)
     exit_time = Column(DateTime, nullable=True)
     entry_price = Column(Float, nullable=True)
     exit_price = Column(Float, nullable=True)
@@ -100,6 +104,53 @@ class EntryMethod(Base):
     setup = relationship("Setup")
 
 
+class TradeStat(Base):
+    """
+    Materialized analytics summary: one row per (entry method, trading session,
+    direction, symbol) group, maintained incrementally from Trade writes
+    (db/trade_stats.py). NULL key columns mean "not set" on the trades.
+    """
+    __tablename__ = "trade_stats"
+    __table_args__ = (
+        Index("ix_trade_stats_group", "entry_method_id", "session", "direction", "symbol"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entry_method_id = Column(Integer, nullable=True)
+    session = Column(String, nullable=True)  # 'london' | 'ny' | 'asian' | NULL (no entry_time)
+    direction = Column(String, nullable=True)
+    symbol = Column(String, nullable=True)
+    trade_count = Column(Integer, default=0, nullable=False)
+    wins = Column(Integer, default=0, nullable=False)
+    losses = Column(Integer, default=0, nullable=False)
+    breakevens = Column(Integer, default=0, nullable=False)
+    pnl_count = Column(Integer, default=0, nullable=False)  # trades with pnl set
+    pnl_sum = Column(Float, default=0.0, nullable=False)
+    r_count = Column(Integer, default=0, nullable=False)  # trades with r_multiple set
+    r_sum = Column(Float, default=0.0, nullable=False)
+
+
+class CsvImport(Base):
+    """Manifest of the last bulk CSV import per file (db/import_from_csv.py)"""
+    __tablename__ = "csv_imports"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    source = Column(String, unique=True, nullable=False)  # resolved file path
+    sha256 = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    mtime = Column(Float, nullable=False)
+    rows = Column(Integer, default=0, nullable=False)
+    imported_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class SchemaMigration(Base):
+    """Migrations (schema and data) already applied to this database (migrations/runner.py)"""
+    __tablename__ = "schema_migrations"
+
+    version = Column(String, primary_key=True)  # e.g. "012_add_trade_sessions"
+    applied_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class TeachingSession(Base):
     __tablename__ = "teaching_sessions"
 
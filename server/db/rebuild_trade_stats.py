@@ -0,0 +1,21 @@
+"""
+Script to rebuild the trade_stats analytics summary from the trades table.
+Run after editing trades with raw SQL (anything that bypasses the ORM).
+"""
+
+from db import Base
+from db.session import SessionLocal, engine
+from db.trade_stats import rebuild_trade_stats
+
+
+def main():
+    """Recompute trade_stats from scratch."""
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        groups = rebuild_trade_stats(db)
+        db.commit()
+    print(f"[DB] trade_stats rebuilt: {groups} groups")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+import importlib.util
 import os
 from pathlib import Path
+from typing import Any, Callable, TypeVar
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
 
 
 # SQLite database path inside the container-mounted data directory
@@ -14,13 +17,51 @@ DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 DB_PATH = DATA_DIR / "vtc.db"
 DATABASE_URL = f"sqlite:///{DB_PATH.as_posix()}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH.as_posix()}"
+
+# Connection profile. WAL lets readers run while a writer (CSV import, chat-state
+# update) holds the write lock; synchronous=NORMAL is durable in WAL mode except
+# for the last transactions on power loss, which is fine for this local store.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))  # per connection
+SQLITE_MMAP_SIZE_MB = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+
+# Optional async engine (aiosqlite) for read-heavy routes; see get_async_db
+ASYNC_DB_ENABLED = os.getenv("ASYNC_DB", "false").lower() == "true"
+AIOSQLITE_AVAILABLE = (
+    importlib.util.find_spec("aiosqlite") is not None
+    and importlib.util.find_spec("greenlet") is not None
+)
+if ASYNC_DB_ENABLED and not AIOSQLITE_AVAILABLE:
+    print("[DB] ASYNC_DB=true but aiosqlite/greenlet are not installed; using the sync engine")
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Set the tuned pragmas on every new pool connection (sync and aiosqlite)"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE_MB * 1024 * 1024}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
 
 # Create SQLAlchemy engine and session factory
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False},  # Needed for SQLite + FastAPI threaded server
+    connect_args={
+        "check_same_thread": False,  # Needed for SQLite + FastAPI threaded server
+        "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+    },
     future=True,
 )
+event.listen(engine, "connect", _apply_sqlite_pragmas)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
@@ -33,3 +74,71 @@ def get_db():
         db.close()
 
 
+# --- async engine (optional) ---
+
+_async_engine = None
+_async_session_factory = None
+
+T = TypeVar("T")
+
+
+def async_db_active() -> bool:
+    """True when ASYNC_DB is on and aiosqlite + greenlet are installed"""
+    return ASYNC_DB_ENABLED and AIOSQLITE_AVAILABLE
+
+
+def get_async_engine():
+    """Create (once) the aiosqlite engine with the same connection profile"""
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            connect_args={"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        )
+        event.listen(_async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+        _async_session_factory = async_sessionmaker(
+            _async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+
+async def get_async_db():
+    """
+    Session dependency for read-heavy async routes.
+
+    Yields an AsyncSession on the aiosqlite engine when ASYNC_DB=true (and the
+    driver is installed), otherwise a regular Session. Either way, run queries
+    through run_db so route code does not depend on which one it got.
+    """
+    if async_db_active():
+        get_async_engine()
+        async with _async_session_factory() as session:
+            yield session
+        return
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def run_db(db: Any, fn: Callable[..., T], *args: Any) -> T:
+    """
+    Run fn(session, *args) - plain synchronous ORM code - without blocking the
+    event loop: via AsyncSession.run_sync on the async engine, or in a worker
+    thread for a sync Session.
+    """
+    if isinstance(db, Session):
+        return await asyncio.to_thread(fn, db, *args)
+    return await db.run_sync(fn, *args)
+
+
+async def dispose_async_engine() -> None:
+    """Close pooled aiosqlite connections (server shutdown)"""
+    global _async_engine, _async_session_factory
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _async_session_factory = None
@@ -0,0 +1,191 @@
+"""
+Incremental trade_stats maintenance.
+
+Every ORM flush that inserts, updates or deletes Trade rows turns into
+per-group deltas (remove the trade's old contribution, add its new one) that
+are applied to trade_stats in the same transaction, so /analytics/* can read
+O(#groups) summary rows instead of scanning trades.
+
+ORM bulk statements against Trade (session.execute(update(Trade)...),
+query.update/delete) carry no per-row state; they trigger a full rebuild in
+the same transaction instead. Raw SQL that bypasses the ORM is not seen at
+all; recover with:
+
+    python -m db.rebuild_trade_stats
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import and_, delete, event, func, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from .models import Trade, TradeStat
+from .trading_sessions import session_bucket
+
+# Trade attributes that feed trade_stats (group keys + aggregated values)
+TRACKED = ("entry_method_id", "entry_time", "direction", "symbol", "outcome", "pnl", "r_multiple")
+STAT_FIELDS = ("trade_count", "wins", "losses", "breakevens", "pnl_count", "pnl_sum", "r_count", "r_sum")
+
+GroupKey = Tuple[Optional[int], Optional[str], Optional[str], Optional[str]]
+
+_DELTAS = "trade_stats_deltas"
+
+
+def _group_key(values: Dict[str, Any]) -> GroupKey:
+    return (values["entry_method_id"], session_bucket(values["entry_time"]), values["direction"], values["symbol"])
+
+
+def _contribution(values: Dict[str, Any], sign: int) -> Dict[str, float]:
+    outcome = values["outcome"]
+    pnl = values["pnl"]
+    r_multiple = values["r_multiple"]
+    return {
+        "trade_count": sign,
+        "wins": sign if outcome == "win" else 0,
+        "losses": sign if outcome == "loss" else 0,
+        "breakevens": sign if outcome == "breakeven" else 0,
+        "pnl_count": sign if pnl is not None else 0,
+        "pnl_sum": sign * pnl if pnl is not None else 0.0,
+        "r_count": sign if r_multiple is not None else 0,
+        "r_sum": sign * r_multiple if r_multiple is not None else 0.0,
+    }
+
+
+def _add(deltas: Dict[GroupKey, Dict[str, float]], values: Dict[str, Any], sign: int) -> None:
+    bucket = deltas[_group_key(values)]
+    for field, amount in _contribution(values, sign).items():
+        bucket[field] = bucket.get(field, 0) + amount
+
+
+def _stored_values(session: Session, ids) -> Dict[int, Dict[str, Any]]:
+    """Tracked columns as currently stored (i.e. before this flush), by Trade.id"""
+    if not ids:
+        return {}
+    columns = [getattr(Trade, name) for name in TRACKED]
+    rows = session.connection().execute(select(Trade.id, *columns).where(Trade.id.in_(ids)))
+    return {row[0]: dict(zip(TRACKED, row[1:])) for row in rows}
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_trade_deltas(session: Session, flush_context, instances) -> None:
+    changed = []
+    for obj in session.dirty:
+        if isinstance(obj, Trade):
+            state = inspect(obj)
+            if any(name in state.committed_state for name in TRACKED):
+                changed.append(obj)
+    deleted = [obj for obj in session.deleted if isinstance(obj, Trade)]
+    new = [obj for obj in session.new if isinstance(obj, Trade)]
+    if not (changed or deleted or new):
+        return
+
+    deltas = session.info.setdefault(_DELTAS, defaultdict(dict))
+    stored = _stored_values(session, [obj.id for obj in changed + deleted if obj.id is not None])
+    for obj in new:
+        _add(deltas, {name: getattr(obj, name) for name in TRACKED}, +1)
+    for obj in deleted:
+        if obj.id in stored:
+            _add(deltas, stored[obj.id], -1)
+    for obj in changed:
+        old = stored.get(obj.id)
+        if old is None:
+            continue
+        state = inspect(obj)
+        current = {name: (getattr(obj, name) if name in state.committed_state else old[name]) for name in TRACKED}
+        _add(deltas, old, -1)
+        _add(deltas, current, +1)
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_trade_deltas(session: Session, flush_context) -> None:
+    deltas = session.info.pop(_DELTAS, None)
+    if deltas:
+        apply_deltas(session, deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_trade_deltas(session: Session) -> None:
+    session.info.pop(_DELTAS, None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _rebuild_after_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Trade:
+        return None
+    result = orm_execute_state.invoke_statement()
+    rebuild_trade_stats(orm_execute_state.session)
+    return result
+
+
+def _group_filter(key: GroupKey):
+    entry_method_id, session, direction, symbol = key
+    return and_(
+        TradeStat.entry_method_id.is_not_distinct_from(entry_method_id),
+        TradeStat.session.is_not_distinct_from(session),
+        TradeStat.direction.is_not_distinct_from(direction),
+        TradeStat.symbol.is_not_distinct_from(symbol),
+    )
+
+
+def apply_deltas(session: Session, deltas: Dict[GroupKey, Dict[str, float]]) -> None:
+    """Add per-group deltas to trade_stats (update the group's row, or insert it)"""
+    conn = session.connection()
+    for key, delta in deltas.items():
+        if not any(delta.values()):
+            continue
+        result = conn.execute(
+            update(TradeStat)
+            .where(_group_filter(key))
+            .values({field: getattr(TradeStat, field) + amount for field, amount in delta.items()})
+        )
+        if result.rowcount == 0:
+            entry_method_id, trading_session, direction, symbol = key
+            conn.execute(insert(TradeStat).values(
+                entry_method_id=entry_method_id, session=trading_session, direction=direction, symbol=symbol,
+                **{field: delta.get(field, 0) for field in STAT_FIELDS},
+            ))
+    # Groups whose last trade went away
+    conn.execute(delete(TradeStat).where(TradeStat.trade_count <= 0))
+
+
+def rebuild_trade_stats(session: Session) -> int:
+    """
+    Recompute trade_stats from the trades table (within the caller's transaction).
+
+    Returns:
+        Number of groups written
+    """
+    conn = session.connection()
+    columns = [getattr(Trade, name) for name in TRACKED]
+    deltas: Dict[GroupKey, Dict[str, float]] = defaultdict(dict)
+    for row in conn.execute(select(*columns)).yield_per(1000):
+        _add(deltas, dict(zip(TRACKED, row)), +1)
+    conn.execute(delete(TradeStat))
+    if deltas:
+        conn.execute(insert(TradeStat), [
+            {"entry_method_id": key[0], "session": key[1], "direction": key[2], "symbol": key[3],
+             **{field: delta.get(field, 0) for field in STAT_FIELDS}}
+            for key, delta in deltas.items()
+        ])
+    return len(deltas)
+
+
+def ensure_trade_stats(session: Session) -> bool:
+    """
+    Rebuild trade_stats when it is empty but trades exist (first start after
+    the table was added). Returns True if a rebuild ran.
+    """
+    has_stats = session.execute(select(func.count()).select_from(TradeStat)).scalar()
+    if has_stats:
+        return False
+    has_trades = session.execute(select(func.count()).select_from(Trade)).scalar()
+    if not has_trades:
+        return False
+    rebuild_trade_stats(session)
+    session.commit()
+    return True
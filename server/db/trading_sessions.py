@@ -0,0 +1,95 @@
+"""
+Persisted trading-session columns on trades.
+
+Trade.trading_session ('asian' | 'london' | 'ny') and Trade.entry_hour are
+derived from entry_time so /trades can filter, count and paginate by session
+in SQL. ORM flushes stamp them per row; ORM bulk statements against Trade
+(which carry no per-row state) are followed by a set-based refresh.
+"""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from .models import Trade
+
+# SQL twin of session_bucket() over an integer hour expression (SQLite)
+_HOUR_SQL = "CAST(strftime('%H', entry_time) AS INTEGER)"
+SESSION_CASE_SQL = (
+    f"CASE WHEN entry_time IS NULL THEN NULL "
+    f"WHEN {_HOUR_SQL} >= 17 OR {_HOUR_SQL} < 2 THEN 'asian' "
+    f"WHEN {_HOUR_SQL} < 8 THEN 'london' "
+    f"WHEN {_HOUR_SQL} < 16 THEN 'ny' "
+    f"ELSE 'asian' END"
+)
+
+
+def _as_datetime(entry_time: Any) -> Optional[datetime]:
+    if isinstance(entry_time, str):
+        try:
+            return datetime.fromisoformat(entry_time)
+        except ValueError:
+            return None
+    return entry_time
+
+
+def entry_hour(entry_time: Any) -> Optional[int]:
+    """Hour of day (0-23) of an entry time, None without one"""
+    entry_time = _as_datetime(entry_time)
+    return entry_time.hour if entry_time is not None else None
+
+
+def session_bucket(entry_time: Any) -> Optional[str]:
+    """
+    Trading session for an entry time (EST/EDT, naive or aware).
+
+    Asia 17:00-02:00, London 02:00-08:00, NY 08:00-16:00 (takes the London/NY
+    overlap), 16:00-17:00 counts as Asian. None without an entry time.
+    """
+    hour = entry_hour(entry_time)
+    if hour is None:
+        return None
+    if hour >= 17 or hour < 2:
+        return "asian"
+    if hour < 8:
+        return "london"
+    if hour < 16:
+        return "ny"
+    return "asian"
+
+
+@event.listens_for(Trade, "before_insert")
+@event.listens_for(Trade, "before_update")
+def _stamp_session_columns(mapper, connection, target: Trade) -> None:
+    target.entry_hour = entry_hour(target.entry_time)
+    target.trading_session = session_bucket(target.entry_time)
+
+
+def refresh_session_columns(conn) -> int:
+    """
+    Recompute trading_session/entry_hour in SQL for rows where they are stale
+    (after bulk DML, raw SQL edits, or on upgrade).
+
+    Returns:
+        Number of rows updated
+    """
+    result = conn.execute(text(
+        f"UPDATE trades SET entry_hour = {_HOUR_SQL}, trading_session = {SESSION_CASE_SQL} "
+        f"WHERE entry_hour IS NOT {_HOUR_SQL} OR trading_session IS NOT {SESSION_CASE_SQL}"
+    ))
+    return result.rowcount
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _refresh_after_bulk(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update):
+        return None
+    mapper = orm_execute_state.bind_mapper
+    if mapper is None or mapper.class_ is not Trade:
+        return None
+    result = orm_execute_state.invoke_statement()
+    refresh_session_columns(orm_execute_state.session.connection())
+    return result
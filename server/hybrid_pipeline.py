@@ -6,17 +6,132 @@ Flow:
 1. GPT-4o analyzes chart → structured JSON summary (cached)
 2. GPT-5 Mini/Search reasons about summary + user question
 3. Follow-up questions reuse cached summary (zero extra cost)
+
+Summaries are cached by image content hash (see cache.VisionSummaryCache),
+so the same chart is only analysed once across sessions and restarts.
 """
 
-import io
-import base64
 import hashlib
-from PIL import Image
 from fastapi import UploadFile
-from typing import Dict, Any
+from typing import Dict, Any, Tuple, AsyncIterator
 
-from cache import get_cache
+from cache import get_cache, SingleFlight
 from openai_client import get_client, resolve_model
+from utils.image_preprocess import preprocess_image
+from utils import metrics
+
+
+# GPT-4o vision analysis (structured output)
+VISION_PROMPT = """Analyze this trading chart and provide a concise JSON summary with these keys:
+- symbol: Trading symbol/pair shown
+- timeframe: Detected timeframe (e.g., "5m", "1h")
+- current_price: Current price level visible
+- bias: Market bias (bullish/bearish/neutral)
+- key_levels: Array of significant price levels
+- poi_zones: Points of interest (support/resistance zones)
+- structure: Market structure description (CHOCH, BOS, trend, range)
+- liquidity: Liquidity sweep notes or resting liquidity
+- volume_profile: Volume characteristics if visible
+- indicators: Any visible indicators (MACD, RSI, etc.)
+- notes: Brief observations about chart patterns
+
+Keep the response under 300 tokens. Be precise and factual."""
+
+# In-flight vision summaries keyed by image hash
+_vision_flight = SingleFlight()
+
+
+async def _get_vision_summary(
+    client,
+    image_data: bytes,
+    session_id: str,
+    force_refresh: bool = False
+) -> Tuple[str, bool]:
+    """
+    Return the GPT-4o vision summary for an image, reusing cached summaries
+    for the same image content from any session.
+    
+    Args:
+        client: OpenAIClient instance
+        image_data: Raw uploaded image bytes
+        session_id: Session identifier (pointer to the image it is discussing)
+        force_refresh: Force new vision analysis (ignore cache)
+        
+    Returns:
+        Tuple of (vision_summary, cache_hit)
+    """
+    cache = get_cache()
+    
+    # Summaries are content-addressed, so the same chart in two sessions is analysed once
+    image_hash = hashlib.sha256(image_data).hexdigest()
+    previous_hash = cache.get_session_image(session_id)
+    if previous_hash and previous_hash != image_hash:
+        print(f"[HYBRID] Image changed ({previous_hash[:8]}... -> {image_hash[:8]}...) for session {session_id}")
+    
+    if not force_refresh:
+        with metrics.timed("cache_lookup"):
+            cached_summary = await cache.aget_summary(image_hash)
+        if cached_summary:
+            print(f"[HYBRID] Image hash matches ({image_hash[:8]}...) - using cached summary")
+            cache.bind_session(session_id, image_hash)
+            return cached_summary, True
+    
+    print(f"[HYBRID] New image detected ({image_hash[:8]}...)")
+    
+    # Single-flight: concurrent requests for the same image share one vision call
+    vision_summary, shared = await _vision_flight.do(
+        image_hash,
+        lambda: _generate_vision_summary(client, image_data, image_hash, force_refresh)
+    )
+    
+    if shared:
+        print(f"[HYBRID] Joined in-flight vision summary for {image_hash[:8]}...")
+    cache.bind_session(session_id, image_hash)
+    # A joined summary was paid for by another request; report it as a cache hit
+    return vision_summary, shared
+
+
+async def _generate_vision_summary(client, image_data: bytes, image_hash: str, force_refresh: bool) -> str:
+    """
+    Run the GPT-4o vision call for one image (the single-flight leader's work)
+    and cache the summary. Caching happens here, inside the shielded flight
+    task, so a paid call is kept even if every waiting request was cancelled.
+    """
+    print(f"[HYBRID] Generating new vision summary with GPT-4o")
+    
+    # Shared preprocessing (worker pool; reuses the encode if /ask saw the same upload)
+    image_base64 = (await preprocess_image(image_data))["base64"]
+    
+    vision_response = await client.create_response(
+        question=VISION_PROMPT,
+        image_base64=image_base64,
+        model="gpt-4o",  # Use GPT-4o for vision
+        conversation_history=None,
+        use_cache=not force_refresh
+    )
+    
+    vision_summary = vision_response["answer"]
+    print(f"[HYBRID] Vision summary generated ({len(vision_summary)} chars)")
+    await get_cache().aset_summary(image_hash, vision_summary)
+    return vision_summary
+
+
+def _build_reasoning_prompt(vision_summary: str, question: str) -> str:
+    """Build the reasoning prompt that carries the chart summary"""
+    return f"""You are a professional trading analyst using Smart Money Concepts (SMC).
+
+**Chart Analysis Data:**
+{vision_summary}
+
+**Trading Context:**
+- You have access to structured chart data extracted from the image
+- Use this data to provide precise, actionable trading advice
+- Focus on SMC principles: market structure, POIs, liquidity, and order flow
+
+**User Question:**
+{question}
+
+Provide a clear, concise answer based on the chart data above."""
 
 
 async def hybrid_reasoning(
@@ -41,82 +156,11 @@ async def hybrid_reasoning(
     Returns:
         Dict with response, model info, and cache status
     """
-    cache = get_cache()
     client = get_client()
     
-    # Read and hash the image first (for smart cache invalidation)
-    image_data = await image.read()
-    image_hash = hashlib.md5(image_data).hexdigest()
-    
     # Step 1: Get or generate vision summary with smart cache
-    cache_key = "vision_summary"
-    cached_image_hash = cache.get(session_id, "image_hash")
-    cached_summary = None
-    
-    # Only use cache if image hasn't changed and not forcing refresh
-    if not force_refresh and cached_image_hash == image_hash:
-        cached_summary = cache.get(session_id, cache_key)
-        print(f"[HYBRID] Image hash matches ({image_hash[:8]}...) - using cached summary")
-    elif cached_image_hash and cached_image_hash != image_hash:
-        print(f"[HYBRID] Image changed ({cached_image_hash[:8]}... -> {image_hash[:8]}...) - refreshing vision analysis")
-        cache.clear(session_id)  # Clear all cache for this session
-    else:
-        print(f"[HYBRID] New image detected ({image_hash[:8]}...)")
-    
-    if cached_summary:
-        vision_summary = cached_summary
-        cache_hit = True
-    else:
-        print(f"[HYBRID] Generating new vision summary with GPT-4o")
-        
-        # Process image (we already read it for hashing)
-        image_obj = Image.open(io.BytesIO(image_data))
-        
-        # Convert to RGB if necessary
-        if image_obj.mode != 'RGB':
-            image_obj = image_obj.convert('RGB')
-        
-        # Resize if too large
-        max_size = 2048
-        if image_obj.width > max_size or image_obj.height > max_size:
-            image_obj.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-        
-        # Convert to base64
-        buffer = io.BytesIO()
-        image_obj.save(buffer, format='JPEG', quality=85)
-        image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        
-        # GPT-4o vision analysis (structured output)
-        vision_prompt = """Analyze this trading chart and provide a concise JSON summary with these keys:
-- symbol: Trading symbol/pair shown
-- timeframe: Detected timeframe (e.g., "5m", "1h")
-- current_price: Current price level visible
-- bias: Market bias (bullish/bearish/neutral)
-- key_levels: Array of significant price levels
-- poi_zones: Points of interest (support/resistance zones)
-- structure: Market structure description (CHOCH, BOS, trend, range)
-- liquidity: Liquidity sweep notes or resting liquidity
-- volume_profile: Volume characteristics if visible
-- indicators: Any visible indicators (MACD, RSI, etc.)
-- notes: Brief observations about chart patterns
-
-Keep the response under 300 tokens. Be precise and factual."""
-        
-        vision_response = await client.create_response(
-            question=vision_prompt,
-            image_base64=image_base64,
-            model="gpt-4o",  # Use GPT-4o for vision
-            conversation_history=None
-        )
-        
-        vision_summary = vision_response["answer"]
-        
-        # Cache the summary AND image hash
-        cache.set(session_id, cache_key, vision_summary)
-        cache.set(session_id, "image_hash", image_hash)
-        cache_hit = False
-        
-        print(f"[HYBRID] Vision summary generated ({len(vision_summary)} chars)")
+    image_data = await image.read()
+    vision_summary, cache_hit = await _get_vision_summary(client, image_data, session_id, force_refresh)
     
     # Step 2: GPT-5 reasoning with the summary
     # Resolve model alias to actual model name
@@ -124,20 +168,7 @@ Keep the response under 300 tokens. Be precise and factual."""
     print(f"[HYBRID] Reasoning with {reasoning_model} -> {resolved_model}")
     
     # Build reasoning prompt with chart data
-    reasoning_prompt = f"""You are a professional trading analyst using Smart Money Concepts (SMC).
-
-**Chart Analysis Data:**
-{vision_summary}
-
-**Trading Context:**
-- You have access to structured chart data extracted from the image
-- Use this data to provide precise, actionable trading advice
-- Focus on SMC principles: market structure, POIs, liquidity, and order flow
-
-**User Question:**
-{question}
-
-Provide a clear, concise answer based on the chart data above."""
+    reasoning_prompt = _build_reasoning_prompt(vision_summary, question)
     
     # Add conversation history if provided
     history_for_reasoning = []
@@ -170,6 +201,7 @@ Provide a clear, concise answer based on the chart data above."""
     
     return {
         "model": reasoning_response["model"],
+        "actual_model": reasoning_response.get("actual_model"),
         "answer": reasoning_response["answer"],
         "hybrid_mode": True,
         "vision_model": "gpt-4o",
@@ -180,10 +212,60 @@ Provide a clear, concise answer based on the chart data above."""
     }
 
 
+async def hybrid_reasoning_stream(
+    image_data: bytes,
+    question: str,
+    reasoning_model: str,
+    session_id: str,
+    conversation_history: list = None,
+    force_refresh: bool = False
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming hybrid pipeline: the vision summary is resolved first, then the
+    reasoning model's tokens are yielded as they arrive.
+    
+    Args:
+        image_data: Raw chart image bytes (read before the response starts streaming)
+        question: User's question
+        reasoning_model: Model for reasoning (e.g., gpt-5-mini)
+        session_id: Session identifier for caching
+        conversation_history: Previous messages for context
+        force_refresh: Force new vision analysis (ignore cache)
+        
+    Yields:
+        {"type": "token", "content": str} events, then one {"type": "done", ...}
+        event that also carries the hybrid metadata
+    """
+    client = get_client()
+    vision_summary, cache_hit = await _get_vision_summary(client, image_data, session_id, force_refresh)
+    
+    resolved_model = resolve_model(reasoning_model)
+    print(f"[HYBRID] Streaming reasoning with {reasoning_model} -> {resolved_model}")
+    
+    history_for_reasoning = conversation_history[-10:] if conversation_history else []
+    
+    async for event in client.stream_response(
+        question=_build_reasoning_prompt(vision_summary, question),
+        image_base64=None,
+        model=resolved_model,
+        conversation_history=history_for_reasoning
+    ):
+        if event["type"] == "done":
+            event = {
+                **event,
+                "hybrid_mode": True,
+                "vision_model": "gpt-4o",
+                "reasoning_model": reasoning_model,
+                "cache_hit": cache_hit,
+            }
+        yield event
+
+
 async def clear_session_cache(session_id: str) -> Dict[str, Any]:
     """
-    Clear cached vision summaries for a session.
-    Call this when user uploads a new chart or changes symbol.
+    Clear a session's vision-summary pointer.
+    Call this when user uploads a new chart or changes symbol. The summary
+    itself stays cached for any session that shows the same chart.
     
     Args:
         session_id: Session identifier
@@ -9,6 +9,7 @@ from urllib.parse import quote
 from pathlib import Path
 from .utils import get_memory_status, load_json, save_json
 from utils.chart_service import get_chart_url, load_chart_base64
+from utils.trade_detector import sort_trades_chronologically, find_chronological_index
 import os
 import logging
 
@@ -927,7 +928,7 @@ def execute_show_chart_command(context: Dict[str, Any] = None) -> Dict[str, Any]
                 all_trades = context.get('all_trades') or read_logs()
                 if all_trades:
                     # CRITICAL: Use same sorting as navigation commands
-                    sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+                    sorted_trades = sort_trades_chronologically(all_trades)
                     if 0 <= current_idx < len(sorted_trades):
                         context_trade = sorted_trades[current_idx]
                         trade_id = context_trade.get('id') or context_trade.get('trade_id')
@@ -1021,7 +1022,7 @@ def execute_show_chart_command(context: Dict[str, Any] = None) -> Dict[str, Any]
                 trade_index = extract_trade_index_from_text(command_text)
                 if trade_index and all_trades:
                     # Sort same way as list_trades (chronological, oldest first)
-                    sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+                    sorted_trades = sort_trades_chronologically(all_trades)
                     detected_trade = get_trade_by_index(trade_index, all_trades, sorted_trades)
                     if detected_trade:
                         print(f"[SHOW_CHART] Found trade by index #{trade_index}: {detected_trade.get('symbol')} (ID: {detected_trade.get('id')})")
@@ -1061,7 +1062,7 @@ def execute_show_chart_command(context: Dict[str, Any] = None) -> Dict[str, Any]
                         all_trades = []
                 
                 if all_trades:
-                    sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=True)
+                    sorted_trades = sort_trades_chronologically(all_trades, reverse=True)
                     if sorted_trades:
                         detected_trade = sorted_trades[0]
                         print(f"[SHOW_CHART] Using most recent trade as fallback: {detected_trade.get('id')} - {detected_trade.get('symbol')}")
@@ -1550,7 +1551,7 @@ def execute_list_trades_command(context: Dict[str, Any] = None) -> Dict[str, Any
             print(f"[LIST_TRADES] Applied filter '{outcome_filter}': {original_count} -> {len(trades)} trades")
         
         # Phase 5F.1: Sort trades chronologically (oldest first)
-        trades = sorted(trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+        trades = sort_trades_chronologically(trades)
         
         # === 5F.2 FIX ===
         # [5F.2 FIX F4] Persist trade list snapshot for index consistency
@@ -1571,8 +1572,8 @@ def execute_list_trades_command(context: Dict[str, Any] = None) -> Dict[str, Any
             print(f"[LIST_TRADES] Warning: Failed to cache trade list: {e}")
         
         # Phase 5F.1: Attach chart_url to each trade (fast - only check direct chart_path)
-        for trade in trades:
-            trade = attach_chart_url(trade)
+        # Copies: the trade dicts are shared with the read_logs() snapshot
+        trades = [attach_chart_url(dict(trade)) for trade in trades]
         
         message = f"📋 Found {len(trades)} trades."
         if len(trades) > 0:
@@ -1684,7 +1685,7 @@ def execute_next_trade_navigation_command(context: Dict[str, Any] = None) -> Dic
                 "status": 200
             }
         
-        sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+        sorted_trades = sort_trades_chronologically(all_trades)
         
         # Ensure repo count is valid
         total = len(sorted_trades)
@@ -1884,7 +1885,7 @@ def execute_previous_trade_navigation_command(context: Dict[str, Any] = None) ->
                 "status": 200
             }
         
-        sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+        sorted_trades = sort_trades_chronologically(all_trades)
         total = len(sorted_trades)
         
         if total <= 0:
@@ -2077,7 +2078,7 @@ def execute_random_winning_trade_command(context: Dict[str, Any] = None) -> Dict
             }
         
         # Pick random winning trade
-        random_trade = random.choice(winning_trades)
+        random_trade = dict(random.choice(winning_trades))  # snapshot dicts are shared
         
         # Ensure trade_id is always set
         random_trade.setdefault("trade_id", random_trade.get("id") or random_trade.get("tradeId"))
@@ -2161,7 +2162,7 @@ def execute_next_trade_teaching_command() -> Dict[str, Any]:
             }
         
         # Sort trades chronologically (oldest first)
-        sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+        sorted_trades = sort_trades_chronologically(all_trades)
         
         # Check if already at last trade
         if current_idx >= len(sorted_trades) - 1:
@@ -2175,7 +2176,7 @@ def execute_next_trade_teaching_command() -> Dict[str, Any]:
         # Move to next trade
         new_idx = increment_trade_index()
         if new_idx < len(sorted_trades):
-            next_trade = sorted_trades[new_idx]
+            next_trade = dict(sorted_trades[new_idx])  # snapshot dicts are shared
             next_trade = attach_chart_url(next_trade)
             
             return {
@@ -2370,7 +2371,7 @@ def execute_view_trade_command(context: Dict[str, Any] = None) -> Dict[str, Any]
             if current_idx is not None:
                 all_trades = context.get('all_trades') or read_logs()
                 if all_trades:
-                    sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+                    sorted_trades = sort_trades_chronologically(all_trades)
                     if 0 <= current_idx < len(sorted_trades):
                         current_trade = sorted_trades[current_idx]
                         trade_id = current_trade.get('id') or current_trade.get('trade_id')
@@ -2464,7 +2465,7 @@ def execute_view_trade_command(context: Dict[str, Any] = None) -> Dict[str, Any]
             all_trades = context.get('all_trades') or read_logs()
             if all_trades:
                 # Sort trades chronologically (oldest first) for index-based lookup
-                sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+                sorted_trades = sort_trades_chronologically(all_trades)
                 if new_idx is not None and new_idx < len(sorted_trades):
                     trade_id = sorted_trades[new_idx].get('id') or sorted_trades[new_idx].get('trade_id')
                     print(f"[VIEW_TRADE] Resolved 'previous' to index {new_idx}, trade ID: {trade_id}")
@@ -2484,7 +2485,7 @@ def execute_view_trade_command(context: Dict[str, Any] = None) -> Dict[str, Any]
             all_trades = context.get('all_trades') or read_logs()
             if all_trades:
                 # Sort trades chronologically (oldest first) for index-based lookup
-                sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+                sorted_trades = sort_trades_chronologically(all_trades)
                 if new_idx < len(sorted_trades):
                     trade_id = sorted_trades[new_idx].get('id') or sorted_trades[new_idx].get('trade_id')
                     print(f"[VIEW_TRADE] Resolved 'next' to index {new_idx}, trade ID: {trade_id}")
@@ -2565,7 +2566,7 @@ def execute_view_trade_command(context: Dict[str, Any] = None) -> Dict[str, Any]
             all_trades = context.get('all_trades') or read_logs()
             if all_trades:
                 # Sort trades chronologically (oldest first) for ordinal lookup
-                sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+                sorted_trades = sort_trades_chronologically(all_trades)
                 if ordinal_index <= len(sorted_trades):
                     trade_id = sorted_trades[ordinal_index - 1].get('id') or sorted_trades[ordinal_index - 1].get('trade_id')
                     print(f"[VIEW_TRADE] Resolved {trade_reference} (index {ordinal_index - 1}) trade: {trade_id}")
@@ -2632,7 +2633,7 @@ def execute_view_trade_command(context: Dict[str, Any] = None) -> Dict[str, Any]
                     
                     if extracted_id <= len(trades_to_use):
                         # Sort trades by timestamp (oldest first for index-based lookup)
-                        sorted_trades = sorted(trades_to_use, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+                        sorted_trades = sort_trades_chronologically(trades_to_use)
                         if extracted_id - 1 < len(sorted_trades):
                             trade_id = sorted_trades[extracted_id - 1].get('id') or sorted_trades[extracted_id - 1].get('trade_id')
                             print(f"[VIEW_TRADE] Interpreting #{extracted_id} as index {extracted_id - 1}, found trade ID: {trade_id}")
@@ -2652,7 +2653,7 @@ def execute_view_trade_command(context: Dict[str, Any] = None) -> Dict[str, Any]
                 from performance.utils import read_logs
                 all_trades = context.get('all_trades') or read_logs()
                 if all_trades:
-                    sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+                    sorted_trades = sort_trades_chronologically(all_trades)
                     if sorted_trades:
                         trade_id = sorted_trades[0].get('id') or sorted_trades[0].get('trade_id')
                         print(f"[VIEW_TRADE] Resolved 'first' from command text: {trade_id}")
@@ -2663,7 +2664,7 @@ def execute_view_trade_command(context: Dict[str, Any] = None) -> Dict[str, Any]
                     # CRITICAL FIX: Use same sorting as navigation commands (oldest first, reverse=False)
                     # Then take the LAST item to get the latest trade
                     # This ensures index consistency with navigation commands
-                    sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+                    sorted_trades = sort_trades_chronologically(all_trades)
                     if sorted_trades:
                         # Take the last item (newest trade) from oldest-first sorted list
                         trade_id = sorted_trades[-1].get('id') or sorted_trades[-1].get('trade_id')
@@ -2729,18 +2730,17 @@ def execute_view_trade_command(context: Dict[str, Any] = None) -> Dict[str, Any]
                 all_trades_for_index = context.get('all_trades') or read_logs()
                 if all_trades_for_index:
                     # CRITICAL: Use same sorting as navigation commands (oldest first, reverse=False)
-                    sorted_trades = sorted(all_trades_for_index, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
-                    for idx, t in enumerate(sorted_trades):
-                        if (t.get('id') == trade_id or t.get('trade_id') == trade_id or
-                            str(t.get('id')) == str(trade_id) or str(t.get('trade_id')) == str(trade_id)):
-                            set_current_trade_index(idx)
-                            print(f"[VIEW_TRADE] CRITICAL: Updated current_trade_index to {idx} (trade #{idx + 1} of {len(sorted_trades)})")
-                            print(f"[VIEW_TRADE] Trade at index {idx}: ID={trade_id}, Symbol={t.get('symbol')}, Date={t.get('timestamp') or t.get('entry_time')}")
-                            # CRITICAL: Also verify the index was set correctly
-                            verify_idx = get_current_trade_index()
-                            if verify_idx != idx:
-                                print(f"[VIEW_TRADE] WARNING: Index mismatch! Set to {idx}, but get_current_trade_index() returns {verify_idx}")
-                            break
+                    sorted_trades = sort_trades_chronologically(all_trades_for_index)
+                    idx = find_chronological_index(all_trades_for_index, trade_id)
+                    if idx is not None:
+                        t = sorted_trades[idx]
+                        set_current_trade_index(idx)
+                        print(f"[VIEW_TRADE] CRITICAL: Updated current_trade_index to {idx} (trade #{idx + 1} of {len(sorted_trades)})")
+                        print(f"[VIEW_TRADE] Trade at index {idx}: ID={trade_id}, Symbol={t.get('symbol')}, Date={t.get('timestamp') or t.get('entry_time')}")
+                        # CRITICAL: Also verify the index was set correctly
+                        verify_idx = get_current_trade_index()
+                        if verify_idx != idx:
+                            print(f"[VIEW_TRADE] WARNING: Index mismatch! Set to {idx}, but get_current_trade_index() returns {verify_idx}")
                     else:
                         # Trade not found in sorted list - log warning
                         print(f"[VIEW_TRADE] WARNING: Trade {trade_id} not found in sorted list to set index")
@@ -9,6 +9,8 @@ from pathlib import Path
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 
+from utils.data_versions import bump_for_path
+
 # Data directory paths - Use unified path like all other modules
 DATA_DIR = Path(__file__).parent.parent / "data"
 PROFILE_PATH = DATA_DIR / "user_profile.json"
@@ -41,6 +43,7 @@ def save_json(path, data: Any):
     path_obj.parent.mkdir(parents=True, exist_ok=True)
     with open(path_obj, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
+    bump_for_path(path_obj)
 
 
 def initialize_default_files():
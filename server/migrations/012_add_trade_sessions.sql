@@ -0,0 +1,17 @@
+-- Persist the trading session (and entry hour) of each trade so /trades can
+-- filter, count and paginate by session in SQL instead of in Python.
+ALTER TABLE trades ADD COLUMN trading_session VARCHAR;
+ALTER TABLE trades ADD COLUMN entry_hour INTEGER;
+CREATE INDEX IF NOT EXISTS ix_trades_trading_session ON trades (trading_session);
+
+-- Backfill from entry_time (EST/EDT): Asia 17-02, London 02-08, NY 08-16, 16-17 Asia
+UPDATE trades
+SET entry_hour = CAST(strftime('%H', entry_time) AS INTEGER),
+    trading_session = CASE
+        WHEN CAST(strftime('%H', entry_time) AS INTEGER) >= 17 THEN 'asian'
+        WHEN CAST(strftime('%H', entry_time) AS INTEGER) < 2 THEN 'asian'
+        WHEN CAST(strftime('%H', entry_time) AS INTEGER) < 8 THEN 'london'
+        WHEN CAST(strftime('%H', entry_time) AS INTEGER) < 16 THEN 'ny'
+        ELSE 'asian'
+    END
+WHERE entry_time IS NOT NULL;
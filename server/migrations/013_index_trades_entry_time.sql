@@ -0,0 +1,4 @@
+-- Index the default /trades sort key so keyset (cursor) pages walk the index
+-- instead of sorting the whole table. SQLite appends the rowid (trades.id) to
+-- every index entry, so this also covers the (entry_time, id) tiebreak order.
+CREATE INDEX IF NOT EXISTS ix_trades_entry_time ON trades (entry_time);
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Apply migration 012: Add trading_session and entry_hour columns to trades (with backfill)."""
+
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent.parent / "data" / "vtc.db"
+MIGRATION_FILE = Path(__file__).parent / "012_add_trade_sessions.sql"
+
+
+def apply_migration(db_path: Path = DB_PATH) -> bool:
+    """Apply the migration. Returns False if it was already applied."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        # Check if column already exists
+        cursor.execute("PRAGMA table_info(trades)")
+        columns = [row[1] for row in cursor.fetchall()]
+
+        if "trading_session" in columns:
+            print("[SKIP] Migration 012 already applied (trading_session column exists)")
+            return False
+
+        # Read and execute migration in one transaction (a failure leaves trades untouched)
+        with open(MIGRATION_FILE, "r") as f:
+            migration_sql = f.read()
+
+        cursor.executescript(f"BEGIN;\n{migration_sql}\nCOMMIT;")
+
+        print("[SUCCESS] Migration 012 applied successfully")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"[ERROR] Migration 012 failed: {e}")
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    apply_migration()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""Apply migration 013: Index trades.entry_time for keyset pagination."""
+
+import sqlite3
+from pathlib import Path
+
+DB_PATH = Path(__file__).parent.parent / "data" / "vtc.db"
+MIGRATION_FILE = Path(__file__).parent / "013_index_trades_entry_time.sql"
+
+
+def apply_migration(db_path: Path = DB_PATH) -> bool:
+    """Apply the migration. Returns False if it was already applied."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        # Check if index already exists
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ix_trades_entry_time'")
+        if cursor.fetchone():
+            print("[SKIP] Migration 013 already applied (ix_trades_entry_time exists)")
+            return False
+
+        with open(MIGRATION_FILE, "r") as f:
+            migration_sql = f.read()
+
+        cursor.executescript(migration_sql)
+        conn.commit()
+
+        print("[SUCCESS] Migration 013 applied successfully")
+        return True
+
+    except Exception as e:
+        conn.rollback()
+        print(f"[ERROR] Migration 013 failed: {e}")
+        raise
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    apply_migration()
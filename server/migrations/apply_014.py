@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""Apply migration 014: Backfill trades.outcome from pnl and trades.entry_time from created_at."""
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from db.session import SessionLocal
+from db.maintenance import backfill_trades
+
+
+def apply_migration() -> bool:
+    """One set-based pass over existing trades. Safe to rerun (only fills NULLs)."""
+    with SessionLocal() as db:
+        result = backfill_trades(db)
+    print(f"[SUCCESS] Migration 014 applied: outcome={result['outcome']}, entry_time={result['entry_time']}")
+    return True
+
+
+if __name__ == '__main__':
+    apply_migration()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Run the migrations this database has not seen yet.
+
+Completed versions are recorded in the schema_migrations table, so startup
+costs one SELECT once everything is applied: finished schema changes and
+data backfills never run again. Each apply_0xx.py script stays runnable on
+its own and is idempotent; running one by hand just means the runner will
+record it (without redoing work) the next time it sees it.
+
+Older scripts (007-011) predate the runner and are applied manually.
+
+Usage:
+    python -m migrations.runner          # apply pending
+    python -m migrations.runner --list   # show applied/pending
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+
+from db.models import SchemaMigration
+from db.session import SessionLocal
+from migrations import apply_012, apply_013, apply_014
+
+# Ordered; versions are never renamed once released
+MIGRATIONS: List[Tuple[str, Callable[[], object]]] = [
+    ("012_add_trade_sessions", apply_012.apply_migration),
+    ("013_index_trades_entry_time", apply_013.apply_migration),
+    ("014_backfill_outcomes_entry_time", apply_014.apply_migration),
+]
+
+
+def applied_versions() -> set:
+    with SessionLocal() as db:
+        return set(db.execute(select(SchemaMigration.version)).scalars())
+
+
+def run_pending_migrations() -> List[str]:
+    """
+    Apply every migration not yet recorded in schema_migrations, in order.
+    Expects the tables to exist (Base.metadata.create_all first).
+
+    Returns:
+        Versions applied by this call
+    """
+    done = applied_versions()
+    applied = []
+    for version, apply in MIGRATIONS:
+        if version in done:
+            continue
+        apply()
+        # Recorded in its own short transaction: apply scripts may use a separate connection
+        with SessionLocal() as db:
+            db.add(SchemaMigration(version=version))
+            db.commit()
+        applied.append(version)
+    return applied
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply pending database migrations")
+    parser.add_argument("--list", action="store_true", help="Show applied/pending migrations and exit")
+    args = parser.parse_args()
+
+    from db import Base, engine
+    Base.metadata.create_all(bind=engine)
+    if args.list:
+        done = applied_versions()
+        for version, _ in MIGRATIONS:
+            print(f"{'[x]' if version in done else '[ ]'} {version}")
+        return
+    applied = run_pending_migrations()
+    print(f"[DB] Applied {len(applied)} migration(s)" + (f": {', '.join(applied)}" if applied else ""))
+
+
+if __name__ == "__main__":
+    main()
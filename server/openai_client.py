@@ -4,20 +4,78 @@ OpenAI Client Wrapper for Visual Trade Copilot
 Handles API calls with budget enforcement and error handling
 """
 import os
-from openai import OpenAI
-from typing import Dict, Any, Optional
+import asyncio
+import hashlib
+import random
+import re
+import time
+import httpx
+import openai
+from collections import deque
+from pathlib import Path
+from openai import OpenAI, AsyncOpenAI
+from typing import Dict, Any, Optional, AsyncIterator, Tuple
 import json
 
+from cache import get_cache, get_response_cache, get_segment_cache, response_cache_key
+from utils.data_versions import snapshot
+from utils.image_preprocess import get_image_cache
+from utils import deadline, metrics
+from standin.recording import LLM_RECORD, recording_async_http_client, recording_http_client
+from utils.context_packer import (
+    ContextBlock,
+    PackedContext,
+    pack_context,
+    PRIORITY_REQUIRED,
+    PRIORITY_COMMAND_RESULT,
+    PRIORITY_SESSION_CONTEXT,
+    PRIORITY_TRADE_SUMMARY,
+    PRIORITY_AWARENESS,
+    PRIORITY_LEARNING_PROFILE,
+    PRIORITY_SYSTEM_SESSIONS,
+)
+
 # Configuration
 DEFAULT_MODEL = "gpt-5-chat-latest"  # Phase 4C.1: Updated default to GPT-5 Chat
 MAX_TOKENS = 1000
 TEMPERATURE = 0.1
 
+# Upstream transport: "async" uses AsyncOpenAI over one shared, pooled HTTP client;
+# "sync" keeps the legacy behaviour of running the sync SDK in the default executor.
+OPENAI_TRANSPORT = os.getenv("OPENAI_TRANSPORT", "async").strip().lower()
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))  # in-flight upstream calls
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_KEEPALIVE_CONNECTIONS", "10"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))  # seconds, per upstream call
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+# Point at an OpenAI-compatible server instead of api.openai.com (e.g. the
+# record/replay stand-in: python -m standin.server -> http://127.0.0.1:8900/v1)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
+# Retries happen here rather than in the SDK (max_retries=0) so that every
+# attempt and backoff is bounded by the request deadline (utils.deadline)
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))  # seconds, doubled per attempt
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Tail-latency hedging: if a call has not answered by the model's observed p95,
+# send one more request (optionally to a fallback alias) and keep the first answer
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "true").lower() == "true"
+LLM_HEDGE_QUANTILE = float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))  # no hedging until the model has this many
+LLM_HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))  # recent latencies kept per model
+LLM_HEDGE_FALLBACK = os.getenv("LLM_HEDGE_FALLBACK", "").strip()  # alias or model name; empty = same model
+
 # Budget tracking (simple in-memory for now)
 _budget_tracker = {
     "total_cost": 0.0,
     "max_budget": float(os.getenv("MAX_BUDGET", "10.0")),  # $10 default
-    "cost_per_1k_tokens": 0.01  # Approximate cost
+    "cost_per_1k_tokens": 0.01,  # Approximate cost
+    # Provider-side prompt caching (usage.prompt_tokens_details.cached_tokens)
+    "prompt_tokens": 0,
+    "cached_prompt_tokens": 0,
+    "calls_with_usage": 0,
 }
 
 def enforce_budget() -> bool:
@@ -29,28 +87,565 @@ def add_cost(tokens_used: int) -> None:
     cost = (tokens_used / 1000) * _budget_tracker["cost_per_1k_tokens"]
     _budget_tracker["total_cost"] += cost
 
+def record_usage(usage: Any) -> Tuple[int, int]:
+    """
+    Track token usage from a completion's usage payload.
+    
+    Returns:
+        (total_tokens, cached_prompt_tokens)
+    """
+    if usage is None:
+        return 0, 0
+    total = getattr(usage, "total_tokens", 0) or 0
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0
+    _budget_tracker["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+    _budget_tracker["cached_prompt_tokens"] += cached
+    _budget_tracker["calls_with_usage"] += 1
+    add_cost(total)
+    return total, cached
+
 def get_budget_status() -> Dict[str, Any]:
     """Get current budget status"""
     return {
         "total_cost": _budget_tracker["total_cost"],
         "max_budget": _budget_tracker["max_budget"],
         "remaining": _budget_tracker["max_budget"] - _budget_tracker["total_cost"],
-        "within_budget": enforce_budget()
+        "within_budget": enforce_budget(),
+        "prompt_cache": {
+            "prompt_tokens": _budget_tracker["prompt_tokens"],
+            "cached_tokens": _budget_tracker["cached_prompt_tokens"],
+            "cached_ratio": round(_budget_tracker["cached_prompt_tokens"] / _budget_tracker["prompt_tokens"], 4)
+                            if _budget_tracker["prompt_tokens"] else 0.0,
+            "calls": _budget_tracker["calls_with_usage"],
+        },
+        "response_cache": get_response_cache().stats(),
+        "prompt_segments": get_segment_cache().stats(),
+        "vision_cache": get_cache().stats(),
+        "image_cache": get_image_cache().stats()
     }
+class UpstreamError(Exception):
+    """Failed upstream model call (status_code is None for transport errors)"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+def _is_retryable(error: BaseException) -> bool:
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    # APITimeoutError is a subclass of APIConnectionError
+    return isinstance(error, (openai.APIConnectionError, httpx.TransportError, asyncio.TimeoutError))
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    """Server-requested delay from a Retry-After header, if any"""
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+def _upstream_error(error: Exception) -> Exception:
+    """Wrap an SDK/transport failure, keeping its status and retryability"""
+    if isinstance(error, (deadline.DeadlineExceeded, UpstreamError)):
+        return error
+    return UpstreamError(f"OpenAI API error: {str(error)}",
+                         status_code=getattr(error, "status_code", None),
+                         retryable=_is_retryable(error))
+
+
+# Keys _chat_params sets per model; everything else in chat_params is caller-owned
+_SAMPLING_PARAMS = ("max_tokens", "temperature")
+
+
+def _served_by(requested: str, actual: Optional[str]) -> bool:
+    """
+    True when the model that answered is the one requested, allowing for the
+    dated snapshot name the API reports (gpt-4o -> gpt-4o-2024-08-06). A hedge
+    won by LLM_HEDGE_FALLBACK does not match.
+    """
+    if not actual:
+        return True
+    return re.fullmatch(re.escape(requested) + r"(-\d{4}(-\d{2}-\d{2})?)?", actual) is not None
+
+
+def _supports_sampling(model: str) -> bool:
+    """Reasoning models (gpt-5, o1, o3) reject max_tokens/temperature"""
+    name = model.lower()
+    return not (('gpt-5' in name) or ('o1' in name) or ('o3' in name))
+
+
+class ModelLatencyTracker:
+    """Rolling window of successful upstream call latencies per model"""
+
+    def __init__(self, window: int = LLM_HEDGE_WINDOW):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+
+    def observe(self, model: str, seconds: float) -> None:
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=self.window)
+        samples.append(seconds)
+
+    def quantile(self, model: str, q: float, min_samples: int = LLM_HEDGE_MIN_SAMPLES) -> Optional[float]:
+        """q-quantile of recent latencies, or None with fewer than min_samples"""
+        samples = self._samples.get(model)
+        if not samples or len(samples) < max(1, min_samples):
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            model: {
+                "samples": len(samples),
+                "p50_s": round(self.quantile(model, 0.5, 1), 3),
+                "p95_s": round(self.quantile(model, 0.95, 1), 3),
+            }
+            for model, samples in self._samples.items() if samples
+        }
+
+
+def _fingerprint(value: Any) -> str:
+    """Cheap content hash for request-supplied prompt sources"""
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _render_learning_profile() -> str:
+    """Render the learning-profile segment (Phase 4C)"""
+    try:
+        from performance.learning import get_learning_context
+        learning_context = get_learning_context()
+        if learning_context:
+            print("[LEARNING] ✅ Rendered performance profile for AI prompt")
+            return learning_context
+    except Exception as e:
+        print(f"[LEARNING] Could not load profile: {e}")
+    return ""
+
+
+def _render_awareness() -> str:
+    """
+    Render the AI system awareness segment (Phase 4A: pure conversational AI).
+    
+    Static text only, so it can sit in the cached prompt prefix; the live
+    counts it refers to are rendered by _render_system_status.
+    """
+    awareness_context = """
+
+[AI SYSTEM AWARENESS - Phase 4A: Pure Conversational AI]
+You are the Visual Trade Copilot, a conversational AI trading assistant.
+You analyze charts using Smart Money Concepts (SMC) and provide trading insights.
+
+Your capabilities:
+- Access to the user's trades with full trade history
+- Their active trading sessions and conversation messages for context
+- Current trade count, session count, win rate and Avg R are given under [SYSTEM STATUS]
+
+You provide:
+- Chart analysis (market structure, POI, BOS, setups)
+- Trade review and feedback
+- Strategy insights based on user's trade history
+- Entry/exit analysis and suggestions
+
+When users ask about their trades, stats, or performance:
+- You have access to ALL trades in the complete dataset (not just last 10)
+- ALL PnL values are in DOLLARS (e.g., $762.50, $-160.00) - ALWAYS show dollar amounts when listing trades
+- When listing winning trades, show PnL in dollars (format: $+XXX.XX or $-XXX.XX), NOT just R-multiples
+- If a user asks about a specific trade by date/symbol, search through ALL trades in the dataset
+- The context shows: (1) ALL winning trades list, (2) Recent 15 trades summary - but you have access to the FULL dataset
+- Chart images are stored at `/charts/{filename}` and are accessible when needed
+
+Respond conversationally, focus on trading analysis and insights.
+Be concise but thorough. Use your SMC expertise to help the trader improve.
+"""
+    print("[SYSTEM] ✅ Rendered pure AI chat awareness context")
+    return awareness_context
+
+
+def _render_system_status() -> str:
+    """Render the live counts behind the awareness block (changes every chat turn)"""
+    try:
+        from memory.utils import get_memory_status
+        
+        status = get_memory_status()
+        return (
+            "\n[SYSTEM STATUS]:\n"
+            "Trades: {} | Active sessions: {} | Conversation messages: {} | "
+            "Win rate: {:.1f}% | Avg R: {:+.2f}\n"
+        ).format(
+            status.get('total_trades', 0),
+            status.get('active_sessions', 0),
+            status.get('conversation_messages', 0),
+            status.get('win_rate', 0) * 100,
+            status.get('avg_rr', 0)
+        )
+    except Exception as e:
+        print(f"[SYSTEM] Could not inject awareness: {e}")
+        return ""
+
+
+def _render_trade_summary(trades_to_use: list) -> str:
+    """Render the [USER TRADE HISTORY] block for the trades sent with a request"""
+    context_str = ""
+    total_trades = len(trades_to_use)
+
+    # Build a compact summary of ALL trades showing PnL in DOLLARS
+    # Group by outcome for quick reference
+    wins = [t for t in trades_to_use if (t.get('outcome') == 'win' or (t.get('pnl', 0) > 0 and t.get('outcome') != 'loss'))]
+    losses = [t for t in trades_to_use if (t.get('outcome') == 'loss' or (t.get('pnl', 0) < 0 and t.get('outcome') != 'win'))]
+    breakevens = [t for t in trades_to_use if t.get('outcome') == 'breakeven' or (isinstance(t.get('pnl'), (int, float)) and t.get('pnl', 0) == 0)]
+
+    context_str += f"\n[USER TRADE HISTORY - COMPLETE DATASET]\n"
+    context_str += f"TOTAL TRADES: {total_trades}\n"
+    context_str += f"Wins: {len(wins)}, Losses: {len(losses)}, Breakevens: {len(breakevens)}\n\n"
+
+    # Show ALL winning trades with PnL in DOLLARS (sorted newest first)
+    if wins:
+        context_str += "WINNING TRADES (PnL in dollars, newest first):\n"
+        for t in wins[:20]:  # Limit to 20 to save tokens, but user can ask for more
+            sym = t.get('symbol', 'UNK')
+            pnl_dollars = t.get('pnl')
+            pnl_str = f"${pnl_dollars:+.2f}" if isinstance(pnl_dollars, (int, float)) else "N/A"
+            rr = t.get('r_multiple') or t.get('rr')
+            rr_str = f" ({rr}R)" if rr is not None else ""
+            date = t.get('timestamp') or t.get('entry_time') or t.get('trade_day')
+            date_str = date[:10] if date and len(date) >= 10 else (date if date else "?")
+            trade_id = t.get('id') or t.get('trade_id')
+            chart_path = t.get('chart_path')
+            chart_marker = " 📊" if chart_path else ""
+            context_str += f"  - {sym} | {pnl_str}{rr_str} | {date_str} | ID:{trade_id}{chart_marker}\n"
+        if len(wins) > 20:
+            context_str += f"  ... and {len(wins) - 20} more wins\n"
+
+    # Show recent trades summary (last 15 for context) WITH EXACT PRICES
+    context_str += f"\nRECENT TRADES (last 15, newest first) WITH EXACT PRICES:\n"
+    for t in trades_to_use[:15]:
+        sym = t.get('symbol', 'UNK')
+        outcome = t.get('outcome') or t.get('label')
+        if outcome is None and isinstance(t.get('pnl'), (int, float)):
+            outcome = 'win' if t['pnl'] > 0 else ('loss' if t['pnl'] < 0 else 'breakeven')
+
+        pnl_dollars = t.get('pnl')
+        pnl_str = f"${pnl_dollars:+.2f}" if isinstance(pnl_dollars, (int, float)) else "N/A"
+
+        rr = t.get('r_multiple') or t.get('rr')
+        rr_str = f" ({rr}R)" if rr is not None else ""
+
+        # Include exact entry/exit/stop/target prices
+        entry = t.get('entry_price')
+        stop = t.get('stop_loss')
+        target = t.get('take_profit')
+        exit_price = t.get('exit_price')  # May not exist, calculate if needed
+
+        price_parts = []
+        if entry: price_parts.append(f"Entry:${entry}")
+        if stop: price_parts.append(f"Stop:${stop}")
+        if target: price_parts.append(f"Target:${target}")
+        if exit_price: price_parts.append(f"Exit:${exit_price}")
+        price_str = f" | {' '.join(price_parts)}" if price_parts else ""
+
+        date = t.get('timestamp') or t.get('entry_time') or t.get('trade_day')
+        date_str = date[:10] if date and len(date) >= 10 else (date[:20] if date else "?")
+
+        trade_id = t.get('id') or t.get('trade_id')
+        chart_path = t.get('chart_path')
+        chart_marker = " 📊" if chart_path else ""
+
+        context_str += f"  {sym} | {outcome or 'pending'} | {pnl_str}{rr_str}{price_str} | {date_str} | ID:{trade_id}{chart_marker}\n"
+
+    context_str += f"\nIMPORTANT:\n"
+    context_str += f"- You have access to ALL {total_trades} trades in the complete dataset.\n"
+    context_str += f"- ALL PnL values shown above are in DOLLARS (e.g., $762.50, $-160.00).\n"
+    context_str += f"- When users ask about specific trades, reference the dollar amounts directly from this data.\n"
+    context_str += f"- When listing wins/losses, show PnL in dollars (${pnl_dollars:+.2f} format), NOT just R-multiples.\n"
+    context_str += f"- If a user asks about a trade by date/symbol, search ALL {total_trades} trades, not just the recent 15 shown.\n"
+    context_str += f"- **CHART IMAGES: Trades marked with 📊 HAVE chart images available!**\n"
+    context_str += "- **CRITICAL: When a trade is mentioned and a chart image is attached to this message, you ARE seeing it!**\n"
+    context_str += "- **ALWAYS confirm with FULL details:** \"✅ I can see the [SYMBOL] trade chart! Entry: $[price], Exit: $[price], Stop: $[price], Target: $[price], P&L: $[amount] ([R]R).\"\n"
+    context_str += "- **AUTOMATICALLY include entry/exit prices from trade logs** - you have access to exact prices, ALWAYS include them!\n"
+    context_str += "- **NEVER say:** \"You can view it in Teach Copilot\" or \"You can see it here\" - if you see the image, you already have it!\n"
+    context_str += "- Each trade's chart image filename follows pattern: `SYMBOL_5m_TRADE_ID.png` (e.g., `6EZ5_5m_1540306142.png`)\n"
+    return context_str
+
+
+async def _close_stale_client(client: AsyncOpenAI) -> None:
+    try:
+        await client.close()
+    except Exception as e:
+        print(f"[OPENAI] Could not close client from previous event loop: {e}")
+
 
 class OpenAIClient:
     """OpenAI API client with budget enforcement"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, transport: Optional[str] = None):
         self.api_key = api_key
-        self.client = OpenAI(api_key=api_key)
+        # LLM_RECORD=1 captures every chat completion for replay by standin.server
+        self.client = OpenAI(
+            api_key=api_key,
+            base_url=OPENAI_BASE_URL,
+            max_retries=0,
+            http_client=recording_http_client(timeout=OPENAI_TIMEOUT) if LLM_RECORD else None,
+        )
+        self.transport = (transport or OPENAI_TRANSPORT).strip().lower()
+        # Created lazily so they bind to the running event loop
+        self._async_client: Optional[AsyncOpenAI] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._upstream_limit: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0  # upstream calls currently holding a slot
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing: set = set()
+        self.latency = ModelLatencyTracker()
+        self.call_counters = {"calls": 0, "retries": 0, "hedges_sent": 0, "hedges_won": 0,
+                              "hedges_skipped": 0, "deadline_exceeded": 0}
+
+    def _check_loop(self) -> None:
+        # Pooled connections and the semaphore belong to one event loop; test
+        # clients that run each request on a fresh loop get fresh ones
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._loop is not loop:
+            old_loop, old_client = self._loop, self._async_client
+            self._loop = loop
+            self._async_client = None
+            self._http_client = None
+            self._upstream_limit = None
+            if old_client is not None:
+                # Close the old pool rather than leak its sockets: on its own loop
+                # if that is still running (another thread), else from this one
+                if old_loop is not None and old_loop.is_running():
+                    asyncio.run_coroutine_threadsafe(_close_stale_client(old_client), old_loop)
+                else:
+                    task = loop.create_task(_close_stale_client(old_client))
+                    self._closing.add(task)
+                    task.add_done_callback(self._closing.discard)
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """Shared AsyncOpenAI client backed by a single pooled HTTP client"""
+        self._check_loop()
+        if self._async_client is None:
+            http_options = dict(
+                limits=httpx.Limits(
+                    max_connections=OPENAI_MAX_CONNECTIONS,
+                    max_keepalive_connections=OPENAI_KEEPALIVE_CONNECTIONS,
+                ),
+                timeout=httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+            )
+            self._http_client = recording_async_http_client(**http_options) if LLM_RECORD else httpx.AsyncClient(**http_options)
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=OPENAI_BASE_URL,
+                                             max_retries=0, http_client=self._http_client)
+        return self._async_client
+
+    def _get_upstream_limit(self) -> asyncio.Semaphore:
+        self._check_loop()
+        if self._upstream_limit is None:
+            self._upstream_limit = asyncio.Semaphore(max(1, OPENAI_MAX_CONCURRENCY))
+        return self._upstream_limit
+
+    async def _acquire_slot(self, timeout: float) -> Tuple[asyncio.Semaphore, float]:
+        """
+        Wait for an upstream slot, but no longer than the request deadline allows.
+        
+        Returns:
+            (semaphore to release, attempt timeout re-clamped to the deadline
+            after the wait)
+            
+        Raises:
+            DeadlineExceeded: If the deadline passes while queued for a slot
+        """
+        limit = self._get_upstream_limit()
+        try:
+            await asyncio.wait_for(limit.acquire(), deadline.remaining())
+        except asyncio.TimeoutError:
+            raise deadline.DeadlineExceeded("Request deadline exceeded waiting for an upstream slot") from None
+        self._in_flight += 1
+        try:
+            return limit, deadline.bound_timeout(timeout)
+        except BaseException:
+            self._release_slot(limit)
+            raise
+
+    def _release_slot(self, limit: asyncio.Semaphore) -> None:
+        self._in_flight -= 1
+        limit.release()
+
+    async def complete_chat(self, chat_params: Dict[str, Any], timeout: Optional[float] = None, hedge: bool = True):
+        """
+        Run one Chat Completions call through the configured transport, with
+        bounded retries on retryable errors and tail-latency hedging.
+        
+        Every attempt is clamped to the request deadline (utils.deadline), and
+        no retry is started that could not finish before it.
+        
+        Args:
+            chat_params: Keyword arguments for chat.completions.create
+            timeout: Per-attempt timeout in seconds (defaults to OPENAI_TIMEOUT)
+            hedge: Allow a hedged second request once the model's p95 has passed
+            
+        Returns:
+            Raw ChatCompletion object from the SDK
+            
+        Raises:
+            DeadlineExceeded: If the request deadline passes first
+        """
+        call_timeout = timeout if timeout is not None else OPENAI_TIMEOUT
+        with metrics.timed("llm_call"):
+            return await self._with_retries(lambda t: self._hedged_call(chat_params, t, hedge), call_timeout)
+
+    async def _with_retries(self, call, timeout: float):
+        """
+        Await call(attempt_timeout), retrying retryable failures with full-jitter
+        backoff (or the server's Retry-After) up to LLM_MAX_RETRIES times.
+        """
+        self.call_counters["calls"] += 1
+        attempt = 0
+        while True:
+            try:
+                return await call(deadline.bound_timeout(timeout))
+            except deadline.DeadlineExceeded:
+                self.call_counters["deadline_exceeded"] += 1
+                raise
+            except Exception as e:
+                left = deadline.remaining()
+                if left is not None and left <= 0:
+                    self.call_counters["deadline_exceeded"] += 1
+                    raise deadline.DeadlineExceeded(f"Request deadline exceeded during upstream call: {e}") from e
+                if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+                if left is not None and delay >= left:
+                    raise
+                attempt += 1
+                self.call_counters["retries"] += 1
+                print(f"[OPENAI] Retryable upstream error ({type(e).__name__}: {e}); "
+                      f"retry {attempt}/{LLM_MAX_RETRIES} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _single_call(self, chat_params: Dict[str, Any], timeout: float):
+        if self.transport == "sync":
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            response = await loop.run_in_executor(
+                None,
+                lambda: self.client.chat.completions.create(timeout=timeout, **chat_params)
+            )
+        else:
+            # Cap concurrent upstream calls so slow models cannot exhaust the pool
+            limit, timeout = await self._acquire_slot(timeout)
+            try:
+                start = time.perf_counter()
+                response = await self.async_client.chat.completions.create(timeout=timeout, **chat_params)
+            finally:
+                self._release_slot(limit)
+        self.latency.observe(chat_params.get("model", ""), time.perf_counter() - start)
+        return response
+
+    def _hedge_params(self, chat_params: Dict[str, Any]) -> Dict[str, Any]:
+        if not LLM_HEDGE_FALLBACK:
+            return chat_params
+        # Token/sampling controls are rebuilt for the fallback model rather than
+        # copied from the primary; caller extras (e.g. response_format) carry over
+        params = self._chat_params(resolve_model(LLM_HEDGE_FALLBACK), chat_params["messages"])
+        for key, value in chat_params.items():
+            if key not in _SAMPLING_PARAMS:
+                params.setdefault(key, value)
+        return params
+
+    async def _hedged_call(self, chat_params: Dict[str, Any], timeout: float, hedge: bool):
+        """
+        One attempt, hedged: if no answer arrives by the model's p95 latency,
+        race a second request against it and cancel whichever loses. The sync
+        transport is never hedged (a thread-pool call cannot be cancelled).
+        """
+        model = chat_params.get("model", "")
+        delay = None
+        if hedge and LLM_HEDGE_ENABLED and self.transport != "sync":
+            delay = self.latency.quantile(model, LLM_HEDGE_QUANTILE)
+        if delay is None or delay >= timeout:
+            return await self._single_call(chat_params, timeout)
+
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self._single_call(chat_params, timeout))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if primary in done:
+                return primary.result()
+            if self._in_flight >= max(1, OPENAI_MAX_CONCURRENCY):
+                # Saturated: the primary is probably queued for a slot, and a hedge
+                # would only queue behind it and add load
+                print(f"[OPENAI] No answer from {model} after {delay:.2f}s but all upstream slots are busy; not hedging")
+                self.call_counters["hedges_skipped"] += 1
+                return await primary
+            hedge_params = self._hedge_params(chat_params)
+            print(f"[OPENAI] No answer from {model} after {delay:.2f}s (p{LLM_HEDGE_QUANTILE * 100:.0f}); "
+                  f"hedging with {hedge_params['model']}")
+            self.call_counters["hedges_sent"] += 1
+            second = asyncio.ensure_future(self._single_call(hedge_params, max(0.001, timeout - delay)))
+            pending.add(second)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.call_counters["hedges_won"] += 1
+                            # The cancelled primary took at least this long; recording it
+                            # keeps the p95 from drifting down as slow calls get hedged away
+                            self.latency.observe(model, time.perf_counter() - started)
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def transport_status(self) -> Dict[str, Any]:
+        """Describe the active transport and its limits"""
+        return {
+            "transport": self.transport,
+            "max_concurrency": OPENAI_MAX_CONCURRENCY,
+            "max_connections": OPENAI_MAX_CONNECTIONS,
+            "timeout_s": OPENAI_TIMEOUT,
+            "in_flight": self._in_flight,
+            "available_slots": max(0, max(1, OPENAI_MAX_CONCURRENCY) - self._in_flight),
+            "max_retries": LLM_MAX_RETRIES,
+            "hedging": {
+                "enabled": LLM_HEDGE_ENABLED,
+                "quantile": LLM_HEDGE_QUANTILE,
+                "fallback": LLM_HEDGE_FALLBACK or None,
+            },
+            "counters": dict(self.call_counters),
+            "latency": self.latency.stats(),
+        }
+
+    async def aclose(self) -> None:
+        """Close the pooled HTTP client (call on server shutdown)"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+            self._http_client = None
     
     async def create_response(self, 
                             question: str, 
                             image_base64: str = None,  # Phase 3B.1: Optional for text-only mode
                             model: str = DEFAULT_MODEL,
                             conversation_history: list = None,
-                            session_context: dict = None) -> Dict[str, Any]:
+                            session_context: dict = None,
+                            timeout: Optional[float] = None,
+                            use_cache: bool = True) -> Dict[str, Any]:
         """
         Create a conversational response about a trading chart (Phase 3B.1: Text-only support)
         
@@ -60,14 +655,218 @@ class OpenAIClient:
             model: OpenAI model to use
             conversation_history: Optional list of previous messages for context
             session_context: Optional session state (price, bias, POIs, etc.)
+            timeout: Optional per-call upstream timeout in seconds
+            use_cache: Serve/store the answer through the response cache (False bypasses it)
             
         Returns:
             Dict with model name and answer
         """
         import time
-        import re
         t0 = time.perf_counter()
         
+        quick = self._quick_reflection(question, model, session_context, t0)
+        if quick:
+            return quick
+        
+        if not enforce_budget():
+            raise Exception("Budget limit exceeded. Please check your spending limits.")
+        
+        try:
+            with metrics.timed("prompt_assembly"):
+                messages, packed = self._build_messages(question, image_base64, conversation_history, session_context, model)
+            cache_key, cached = await self._cache_lookup(model, messages, question, image_base64, use_cache)
+            if cached is not None:
+                print(f"[OPENAI] Response cache hit ({cache_key[:8]}...)")
+                return {**cached, "tokens_used": 0, "cost": 0.0, "cache_hit": True, "context": packed.summary()}
+            
+            chat_params = self._chat_params(model, messages)
+            response = await self.complete_chat(chat_params, timeout=timeout)
+
+            # Extract response
+            choice = response.choices[0]
+            answer = (choice.message.content or "").strip()
+            actual_model = getattr(response, "model", model)
+            
+            # Track cost and provider prompt-cache reuse
+            tokens_used, cached_tokens = record_usage(getattr(response, "usage", None))
+            
+            print(f"[OPENAI] Actual model used: '{actual_model}' | Tokens: {tokens_used} (cached prompt: {cached_tokens})")
+            
+            # A hedged fallback answer is returned but not cached under the primary's key
+            if cache_key and answer and _served_by(model, actual_model):
+                await get_response_cache().aset(cache_key, {"model": model, "actual_model": actual_model, "answer": answer})
+            
+            return {
+                "model": model,
+                "actual_model": actual_model,
+                "answer": answer,
+                "tokens_used": tokens_used,
+                "cost": (tokens_used / 1000) * _budget_tracker["cost_per_1k_tokens"],
+                "cache_hit": False,
+                "cached_tokens": cached_tokens,
+                "context": packed.summary()
+            }
+            
+        except Exception as e:
+            raise _upstream_error(e) from e
+
+    async def stream_response(self,
+                              question: str,
+                              image_base64: str = None,
+                              model: str = DEFAULT_MODEL,
+                              conversation_history: list = None,
+                              session_context: dict = None,
+                              timeout: Optional[float] = None,
+                              use_cache: bool = True) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of create_response.
+        
+        Yields {"type": "token", "content": str} events as the model produces text,
+        then exactly one {"type": "done", ...} event with model, token usage and
+        cache-hit metadata.
+        
+        Args:
+            Same as create_response
+            
+        Yields:
+            Event dicts (token* then done)
+        """
+        import time
+        t0 = time.perf_counter()
+        
+        quick = self._quick_reflection(question, model, session_context, t0)
+        if quick:
+            yield {"type": "token", "content": quick["answer"]}
+            yield {"type": "done", "model": model, "tokens_used": 0, "cost": 0.0, "cache_hit": False,
+                   "duration_ms": quick["duration_ms"]}
+            return
+        
+        if not enforce_budget():
+            raise Exception("Budget limit exceeded. Please check your spending limits.")
+        
+        try:
+            with metrics.timed("prompt_assembly"):
+                messages, packed = self._build_messages(question, image_base64, conversation_history, session_context, model)
+            cache_key, cached = await self._cache_lookup(model, messages, question, image_base64, use_cache)
+            if cached is not None:
+                print(f"[OPENAI] Response cache hit ({cache_key[:8]}...)")
+                yield {"type": "token", "content": cached["answer"]}
+                yield {"type": "done", "model": model, "actual_model": cached.get("actual_model", model),
+                       "tokens_used": 0, "cost": 0.0, "cache_hit": True, "duration_ms": round((time.perf_counter() - t0) * 1000, 2), "context": packed.summary()}
+                return
+            
+            chat_params = self._chat_params(model, messages)
+            call_timeout = timeout if timeout is not None else OPENAI_TIMEOUT
+            usage = None
+            ttft_ms = None
+            actual_model = model
+            parts = []
+            
+            if self.transport == "sync":
+                # Sync SDK cannot stream without pinning a thread; emit the full answer at once
+                response = await self.complete_chat(chat_params, timeout=timeout)
+                answer = (response.choices[0].message.content or "").strip()
+                usage = getattr(response, "usage", None)
+                actual_model = getattr(response, "model", model)
+                if answer:
+                    parts.append(answer)
+                    yield {"type": "token", "content": answer}
+            else:
+                limit = None
+
+                async def open_stream(t: float):
+                    # The upstream slot is taken per attempt, so backoff sleeps between
+                    # retries do not hold it; once open it is held until the stream ends
+                    nonlocal limit
+                    limit, t = await self._acquire_slot(t)
+                    try:
+                        return await self.async_client.chat.completions.create(
+                            stream=True,
+                            stream_options={"include_usage": True},
+                            timeout=t,
+                            **chat_params
+                        )
+                    except BaseException:
+                        self._release_slot(limit)
+                        raise
+
+                with metrics.timed("llm_call"):
+                    call_start = time.perf_counter()
+                    # Retries and the deadline cover opening the stream; once
+                    # tokens have been sent to the caller the call is not retried
+                    stream = await self._with_retries(open_stream, call_timeout)
+                    try:
+                        async for chunk in stream:
+                            if getattr(chunk, "usage", None):
+                                usage = chunk.usage
+                            if getattr(chunk, "model", None):
+                                actual_model = chunk.model
+                            if chunk.choices:
+                                delta = chunk.choices[0].delta.content
+                                if delta:
+                                    if ttft_ms is None:
+                                        ttft = time.perf_counter() - call_start
+                                        ttft_ms = round(ttft * 1000, 2)
+                                        metrics.observe("llm_first_token", ttft)
+                                    parts.append(delta)
+                                    yield {"type": "token", "content": delta}
+                    finally:
+                        try:
+                            await stream.close()
+                        finally:
+                            self._release_slot(limit)
+            
+            tokens_used, cached_tokens = record_usage(usage)
+            print(f"[OPENAI] Streamed model: '{actual_model}' | Tokens: {tokens_used} (cached prompt: {cached_tokens})")
+            
+            answer = "".join(parts).strip()
+            if cache_key and answer and _served_by(model, actual_model):
+                await get_response_cache().aset(cache_key, {"model": model, "actual_model": actual_model, "answer": answer})
+            
+            yield {
+                "type": "done",
+                "model": model,
+                "actual_model": actual_model,
+                "tokens_used": tokens_used,
+                "cost": (tokens_used / 1000) * _budget_tracker["cost_per_1k_tokens"],
+                "cache_hit": False,
+                "cached_tokens": cached_tokens,
+                "ttft_ms": ttft_ms,
+                "duration_ms": round((time.perf_counter() - t0) * 1000, 2),
+                "context": packed.summary(),
+            }
+            
+        except Exception as e:
+            raise _upstream_error(e) from e
+
+    async def _cache_lookup(self,
+                      model: str,
+                      messages: list,
+                      question: str,
+                      image_base64: Optional[str],
+                      use_cache: bool) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """Return (cache_key, cached_value); key is None when the cache is bypassed"""
+        cache = get_response_cache()
+        if not use_cache:
+            cache.record_bypass()
+            return None, None
+        if not cache.enabled:
+            return None, None
+        with metrics.timed("cache_lookup"):
+            key = response_cache_key(
+                model=model,
+                system_prompt=messages[0]["content"],
+                question=question,
+                conversation_history=messages[1:-1],
+                image_base64=image_base64,
+            )
+            return key, await cache.aget(key)
+
+    def _quick_reflection(self, question: str, model: str, session_context: Optional[dict], t0: float) -> Optional[Dict[str, Any]]:
+        """Shortcut reply for "what did I learn from my last loss" style queries"""
+        import time
+        import re
+        
         # OPTIMIZATION: Shortcut for "what did I learn from my last loss" queries
         question_lower = question.lower().strip()
         
@@ -91,305 +890,173 @@ class OpenAIClient:
                             "duration_ms": elapsed_ms,
                             "status": 200
                         }
+        return None
+
+    def _build_messages(self,
+                        question: str,
+                        image_base64: Optional[str],
+                        conversation_history: Optional[list],
+                        session_context: Optional[dict],
+                        model: Optional[str] = None) -> Tuple[list, PackedContext]:
+        """
+        Assemble the system prompt, history and current question into a messages array.
         
-        if not enforce_budget():
-            raise Exception("Budget limit exceeded. Please check your spending limits.")
-        
-        try:
-            # Create the system prompt for SMC trading expertise
-            system_prompt = """You are an expert trader specializing in Smart Money Concepts (SMC), 
+        Prompt blocks and history are packed into the model's token budget
+        (see utils.context_packer); the returned PackedContext records what was dropped.
+        """
+        # Create the system prompt for SMC trading expertise
+        system_prompt = """You are an expert trader specializing in Smart Money Concepts (SMC), 
 volume profile, and market structure. The user trades short-term setups (5m timeframe, SMC bias, 
 POIs, liquidity sweeps, MACD divergence). Answer conversationally, focusing on clarity, reasoning, 
 and actionable advice. Be concise but thorough in your analysis.
 
 When the user references previous messages (e.g., "the setup I showed earlier", "that chart", 
 "as you mentioned"), use the conversation history to provide coherent, contextual responses."""
+        # Prompt layout for provider-side prompt caching: static blocks first (base,
+        # awareness, learning profile, trade summary - these change only when the
+        # underlying data does), then the history, then the per-request blocks
+        # (status counts, session context, sessions, command result) just ahead of
+        # the question. Anything dynamic placed earlier would break prefix reuse.
+        blocks = [ContextBlock("base", system_prompt, PRIORITY_REQUIRED)]
+        
+        # Phase 4A cleanup: Pure AI chat (no command extraction)
+        blocks.append(ContextBlock(
+            "awareness",
+            get_segment_cache().get("awareness", None, _render_awareness),
+            PRIORITY_AWARENESS
+        ))
+        
+        # Phase 4C: Inject learning profile for adaptive advice
+        # (rendered once per profile version; see PromptSegmentCache)
+        blocks.append(ContextBlock(
+            "learning_profile",
+            get_segment_cache().get("learning_profile", snapshot("profile"), _render_learning_profile),
+            PRIORITY_LEARNING_PROFILE
+        ))
+        
+        if session_context:
+            # Phase 4D.3: Include ALL trades if provided by the extension background
+            recent = session_context.get("recent_trades")
+            all_trades = session_context.get("all_trades")  # Full list if available
+            trades_to_use = all_trades if (all_trades and isinstance(all_trades, list)) else (recent if isinstance(recent, list) else [])
             
-            # Phase 3B: Inject session context if available
-            if session_context:
-                context_str = "\n\n[SESSION CONTEXT]:\n"
-                if session_context.get("latest_price"):
-                    context_str += f"Latest Price: {session_context['latest_price']}\n"
-                if session_context.get("bias"):
-                    context_str += f"Current Bias: {session_context['bias']}\n"
-                if session_context.get("last_poi"):
-                    context_str += f"Last POI: {session_context['last_poi']}\n"
-                if session_context.get("timeframe"):
-                    context_str += f"Timeframe: {session_context['timeframe']}\n"
-                if session_context.get("notes"):
-                    notes = session_context["notes"]
-                    if notes:
-                        context_str += f"Notes: {', '.join(notes[:3])}\n"  # Show first 3 notes
-
-                # Phase 4D.3: Include ALL trades if provided by the extension background
-                recent = session_context.get("recent_trades")
-                all_trades = session_context.get("all_trades")  # Full list if available
-                trades_to_use = all_trades if (all_trades and isinstance(all_trades, list)) else (recent if isinstance(recent, list) else [])
-                
-                if isinstance(trades_to_use, list) and trades_to_use:
-                    total_trades = len(trades_to_use)
-                    
-                    # Build a compact summary of ALL trades showing PnL in DOLLARS
-                    # Group by outcome for quick reference
-                    wins = [t for t in trades_to_use if (t.get('outcome') == 'win' or (t.get('pnl', 0) > 0 and t.get('outcome') != 'loss'))]
-                    losses = [t for t in trades_to_use if (t.get('outcome') == 'loss' or (t.get('pnl', 0) < 0 and t.get('outcome') != 'win'))]
-                    breakevens = [t for t in trades_to_use if t.get('outcome') == 'breakeven' or (isinstance(t.get('pnl'), (int, float)) and t.get('pnl', 0) == 0)]
-                    
-                    context_str += f"\n[USER TRADE HISTORY - COMPLETE DATASET]\n"
-                    context_str += f"TOTAL TRADES: {total_trades}\n"
-                    context_str += f"Wins: {len(wins)}, Losses: {len(losses)}, Breakevens: {len(breakevens)}\n\n"
-                    
-                    # Show ALL winning trades with PnL in DOLLARS (sorted newest first)
-                    if wins:
-                        context_str += "WINNING TRADES (PnL in dollars, newest first):\n"
-                        for t in wins[:20]:  # Limit to 20 to save tokens, but user can ask for more
-                            sym = t.get('symbol', 'UNK')
-                            pnl_dollars = t.get('pnl')
-                            pnl_str = f"${pnl_dollars:+.2f}" if isinstance(pnl_dollars, (int, float)) else "N/A"
-                            rr = t.get('r_multiple') or t.get('rr')
-                            rr_str = f" ({rr}R)" if rr is not None else ""
-                            date = t.get('timestamp') or t.get('entry_time') or t.get('trade_day')
-                            date_str = date[:10] if date and len(date) >= 10 else (date if date else "?")
-                            trade_id = t.get('id') or t.get('trade_id')
-                            chart_path = t.get('chart_path')
-                            chart_marker = " 📊" if chart_path else ""
-                            context_str += f"  - {sym} | {pnl_str}{rr_str} | {date_str} | ID:{trade_id}{chart_marker}\n"
-                        if len(wins) > 20:
-                            context_str += f"  ... and {len(wins) - 20} more wins\n"
-                    
-                    # Show recent trades summary (last 15 for context) WITH EXACT PRICES
-                    context_str += f"\nRECENT TRADES (last 15, newest first) WITH EXACT PRICES:\n"
-                    for t in trades_to_use[:15]:
-                        sym = t.get('symbol', 'UNK')
-                        outcome = t.get('outcome') or t.get('label')
-                        if outcome is None and isinstance(t.get('pnl'), (int, float)):
-                            outcome = 'win' if t['pnl'] > 0 else ('loss' if t['pnl'] < 0 else 'breakeven')
-                        
-                        pnl_dollars = t.get('pnl')
-                        pnl_str = f"${pnl_dollars:+.2f}" if isinstance(pnl_dollars, (int, float)) else "N/A"
-                        
-                        rr = t.get('r_multiple') or t.get('rr')
-                        rr_str = f" ({rr}R)" if rr is not None else ""
-                        
-                        # Include exact entry/exit/stop/target prices
-                        entry = t.get('entry_price')
-                        stop = t.get('stop_loss')
-                        target = t.get('take_profit')
-                        exit_price = t.get('exit_price')  # May not exist, calculate if needed
-                        
-                        price_parts = []
-                        if entry: price_parts.append(f"Entry:${entry}")
-                        if stop: price_parts.append(f"Stop:${stop}")
-                        if target: price_parts.append(f"Target:${target}")
-                        if exit_price: price_parts.append(f"Exit:${exit_price}")
-                        price_str = f" | {' '.join(price_parts)}" if price_parts else ""
-                        
-                        date = t.get('timestamp') or t.get('entry_time') or t.get('trade_day')
-                        date_str = date[:10] if date and len(date) >= 10 else (date[:20] if date else "?")
-                        
-                        trade_id = t.get('id') or t.get('trade_id')
-                        chart_path = t.get('chart_path')
-                        chart_marker = " 📊" if chart_path else ""
-                        
-                        context_str += f"  {sym} | {outcome or 'pending'} | {pnl_str}{rr_str}{price_str} | {date_str} | ID:{trade_id}{chart_marker}\n"
-                    
-                    context_str += f"\nIMPORTANT:\n"
-                    context_str += f"- You have access to ALL {total_trades} trades in the complete dataset.\n"
-                    context_str += f"- ALL PnL values shown above are in DOLLARS (e.g., $762.50, $-160.00).\n"
-                    context_str += f"- When users ask about specific trades, reference the dollar amounts directly from this data.\n"
-                    context_str += f"- When listing wins/losses, show PnL in dollars (${pnl_dollars:+.2f} format), NOT just R-multiples.\n"
-                    context_str += f"- If a user asks about a trade by date/symbol, search ALL {total_trades} trades, not just the recent 15 shown.\n"
-                    context_str += f"- **CHART IMAGES: Trades marked with 📊 HAVE chart images available!**\n"
-                    context_str += "- **CRITICAL: When a trade is mentioned and a chart image is attached to this message, you ARE seeing it!**\n"
-                    context_str += "- **ALWAYS confirm with FULL details:** \"✅ I can see the [SYMBOL] trade chart! Entry: $[price], Exit: $[price], Stop: $[price], Target: $[price], P&L: $[amount] ([R]R).\"\n"
-                    context_str += "- **AUTOMATICALLY include entry/exit prices from trade logs** - you have access to exact prices, ALWAYS include them!\n"
-                    context_str += "- **NEVER say:** \"You can view it in Teach Copilot\" or \"You can see it here\" - if you see the image, you already have it!\n"
-                    context_str += "- Each trade's chart image filename follows pattern: `SYMBOL_5m_TRADE_ID.png` (e.g., `6EZ5_5m_1540306142.png`)\n"
-
-                # Phase 4D.3.2: Include command execution result if available
-                cmd_result = session_context.get("last_command_result")
-                if cmd_result and isinstance(cmd_result, dict):
-                    context_str += "\n[COMMAND EXECUTED]:\n"
-                    context_str += f"Command: {cmd_result.get('command', 'unknown')}\n"
-                    context_str += f"Status: {'Success' if cmd_result.get('success') else 'Failed'}\n"
-                    if cmd_result.get('message'):
-                        context_str += f"Result: {cmd_result['message']}\n"
-                    context_str += "\nIMPORTANT: A system command was just executed. Reference this result in your response. Say 'I've done it' or 'Here's what happened' - NOT 'I can't' or 'simulated'.\n"
-
-                # Phase 4D.4: Include actual system sessions from IndexedDB
-                all_sessions = session_context.get("all_sessions")
-                current_session_id = session_context.get("current_session_id")
-                if isinstance(all_sessions, list) and all_sessions:
-                    context_str += "\n[SYSTEM SESSIONS - ACTUAL STATE]:\n"
-                    context_str += f"Total sessions in system: {len(all_sessions)}\n"
-                    context_str += f"Current active session ID: {current_session_id}\n\n"
-                    for i, sess in enumerate(all_sessions[:10], 1):
-                        active_marker = " 🔵 ACTIVE" if sess.get("isActive") or sess.get("sessionId") == current_session_id else ""
-                        title = sess.get("title", sess.get("symbol", "Unknown"))
-                        symbol = sess.get("symbol", "?")
-                        context_str += f"{i}. {title} ({symbol}){active_marker} - ID: {sess.get('sessionId', '?')[:20]}...\n"
-                    if len(all_sessions) > 10:
-                        context_str += f"... and {len(all_sessions) - 10} more sessions\n"
-                    context_str += "\nIMPORTANT: These are the ACTUAL sessions stored in IndexedDB. When users ask about sessions, reference this real data.\n"
-
-                system_prompt += context_str
-            
-            # Phase 4C: Inject learning profile for adaptive advice
-            try:
-                from performance.learning import get_learning_context
-                learning_context = get_learning_context()
-                if learning_context:
-                    system_prompt += learning_context
-                    print("[LEARNING] ✅ Injected performance profile into AI prompt")
-            except Exception as e:
-                print(f"[LEARNING] Could not load profile: {e}")
-            
-            # Phase 4A cleanup: Pure AI chat (no command extraction)
-            # Extension is now pure conversational AI for trading analysis
-            try:
-                from memory.utils import get_memory_status
-                
-                status = get_memory_status()
-                
-                awareness_context = """
-
-[AI SYSTEM AWARENESS - Phase 4A: Pure Conversational AI]
-You are the Visual Trade Copilot, a conversational AI trading assistant.
-You analyze charts using Smart Money Concepts (SMC) and provide trading insights.
-
-Your capabilities:
-- Access to {} trades with full trade history
-- {} active trading sessions
-- {} conversation messages for context
-- Current win rate: {:.1f}%, Avg R: {:+.2f}
+            if isinstance(trades_to_use, list) and trades_to_use:
+                trade_summary = get_segment_cache().get(
+                    "trade_summary",
+                    (snapshot("trades"), _fingerprint(trades_to_use)),
+                    lambda: _render_trade_summary(trades_to_use)
+                )
+                blocks.append(ContextBlock("trade_summary", trade_summary, PRIORITY_TRADE_SUMMARY))
+        
+        # --- dynamic suffix ---
+        blocks.append(ContextBlock(
+            "system_status",
+            get_segment_cache().get("system_status", snapshot("trades", "profile", "memory"), _render_system_status),
+            PRIORITY_AWARENESS,
+            dynamic=True
+        ))
+        
+        # Phase 3B: Inject session context if available
+        if session_context:
+            context_str = "\n\n[SESSION CONTEXT]:\n"
+            if session_context.get("latest_price"):
+                context_str += f"Latest Price: {session_context['latest_price']}\n"
+            if session_context.get("bias"):
+                context_str += f"Current Bias: {session_context['bias']}\n"
+            if session_context.get("last_poi"):
+                context_str += f"Last POI: {session_context['last_poi']}\n"
+            if session_context.get("timeframe"):
+                context_str += f"Timeframe: {session_context['timeframe']}\n"
+            if session_context.get("notes"):
+                notes = session_context["notes"]
+                if notes:
+                    context_str += f"Notes: {', '.join(notes[:3])}\n"  # Show first 3 notes
+            blocks.append(ContextBlock("session_context", context_str, PRIORITY_SESSION_CONTEXT, dynamic=True))
 
-You provide:
-- Chart analysis (market structure, POI, BOS, setups)
-- Trade review and feedback
-- Strategy insights based on user's trade history
-- Entry/exit analysis and suggestions
+            # Phase 4D.4: Include actual system sessions from IndexedDB
+            all_sessions = session_context.get("all_sessions")
+            current_session_id = session_context.get("current_session_id")
+            if isinstance(all_sessions, list) and all_sessions:
+                sessions_str = "\n[SYSTEM SESSIONS - ACTUAL STATE]:\n"
+                sessions_str += f"Total sessions in system: {len(all_sessions)}\n"
+                sessions_str += f"Current active session ID: {current_session_id}\n\n"
+                for i, sess in enumerate(all_sessions[:10], 1):
+                    active_marker = " 🔵 ACTIVE" if sess.get("isActive") or sess.get("sessionId") == current_session_id else ""
+                    title = sess.get("title", sess.get("symbol", "Unknown"))
+                    symbol = sess.get("symbol", "?")
+                    sessions_str += f"{i}. {title} ({symbol}){active_marker} - ID: {sess.get('sessionId', '?')[:20]}...\n"
+                if len(all_sessions) > 10:
+                    sessions_str += f"... and {len(all_sessions) - 10} more sessions\n"
+                sessions_str += "\nIMPORTANT: These are the ACTUAL sessions stored in IndexedDB. When users ask about sessions, reference this real data.\n"
+                blocks.append(ContextBlock("system_sessions", sessions_str, PRIORITY_SYSTEM_SESSIONS, dynamic=True))
 
-When users ask about their trades, stats, or performance:
-- You have access to ALL trades in the complete dataset (not just last 10)
-- ALL PnL values are in DOLLARS (e.g., $762.50, $-160.00) - ALWAYS show dollar amounts when listing trades
-- When listing winning trades, show PnL in dollars (format: $+XXX.XX or $-XXX.XX), NOT just R-multiples
-- If a user asks about a specific trade by date/symbol, search through ALL trades in the dataset
-- The context shows: (1) ALL winning trades list, (2) Recent 15 trades summary - but you have access to the FULL dataset
-- Chart images are stored at `/charts/{filename}` and are accessible when needed
-
-Respond conversationally, focus on trading analysis and insights.
-Be concise but thorough. Use your SMC expertise to help the trader improve.
-""".format(
-                    status.get('total_trades', 0),
-                    status.get('active_sessions', 0),
-                    status.get('conversation_messages', 0),
-                    status.get('win_rate', 0) * 100,
-                    status.get('avg_rr', 0)
-                )
-                
-                system_prompt += awareness_context
-                print("[SYSTEM] ✅ Injected pure AI chat awareness context")
-                
-            except Exception as e:
-                print(f"[SYSTEM] Could not inject awareness: {e}")
-            
-            # Build messages array starting with system prompt
-            messages = [
+            # Phase 4D.3.2: Include command execution result if available
+            cmd_result = session_context.get("last_command_result")
+            if cmd_result and isinstance(cmd_result, dict):
+                cmd_str = "\n[COMMAND EXECUTED]:\n"
+                cmd_str += f"Command: {cmd_result.get('command', 'unknown')}\n"
+                cmd_str += f"Status: {'Success' if cmd_result.get('success') else 'Failed'}\n"
+                if cmd_result.get('message'):
+                    cmd_str += f"Result: {cmd_result['message']}\n"
+                cmd_str += "\nIMPORTANT: A system command was just executed. Reference this result in your response. Say 'I've done it' or 'Here's what happened' - NOT 'I can't' or 'simulated'.\n"
+                blocks.append(ContextBlock("command_result", cmd_str, PRIORITY_COMMAND_RESULT, dynamic=True))
+        blocks = [b for b in blocks if b.text]
+        
+        # Only include text content from history (no images from past messages)
+        history = [
+            {"role": msg["role"], "content": msg["content"]}
+            for msg in (conversation_history or [])
+            if msg.get("role") in ["user", "assistant"]
+        ]
+        
+        # Phase 3B.1: Current question (with or without image)
+        if image_base64:
+            # Vision mode: include image
+            question_content = [
+                {
+                    "type": "text",
+                    "text": question
+                },
                 {
-                    "role": "system",
-                    "content": system_prompt
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:image/jpeg;base64,{image_base64}"
+                    }
                 }
             ]
-            
-            # Phase 3B.1: Token truncation - limit conversation history if needed
-            if conversation_history:
-                # Estimate tokens (rough: 1 token ≈ 4 chars)
-                estimated_tokens = sum(len(str(msg.get('content', ''))) // 4 for msg in conversation_history)
-                
-                if estimated_tokens > 8000:
-                    print(f"[Token Optimization] History has ~{estimated_tokens} tokens, truncating to last 20 messages")
-                    conversation_history = conversation_history[-20:]
-                    estimated_tokens = sum(len(str(msg.get('content', ''))) // 4 for msg in conversation_history)
-                    print(f"[Token Optimization] Reduced to ~{estimated_tokens} tokens")
-                
-                # print(f"[DEBUG] Adding {len(conversation_history)} messages to context")
-                for i, msg in enumerate(conversation_history):
-                    # Only include text content from history (no images from past messages)
-                    if msg.get("role") in ["user", "assistant"]:
-                        # Safe logging without emojis for Windows console
-                        # content_preview = msg['content'][:50] if isinstance(msg['content'], str) else str(type(msg['content']))
-                        # safe_preview = content_preview.encode('ascii', 'ignore').decode('ascii')
-                        # print(f"[DEBUG] Message {i}: role={msg['role']}, content preview={safe_preview}")
-                        messages.append({
-                            "role": msg["role"],
-                            "content": msg["content"]
-                        })
-                    # else:
-                        # print(f"[DEBUG] Skipping message {i} with role: {msg.get('role')}")
-            
-            # Phase 3B.1: Add current question (with or without image)
-            if image_base64:
-                # Vision mode: include image
-                messages.append({
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": question
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                })
-            else:
-                # Text-only mode: no image
-                messages.append({
-                    "role": "user",
-                    "content": question
-                })
-            
-            # Build params for Chat Completions (text-only path for Phase 4A)
-            chat_params = {
-                "model": model,
-                "messages": messages,
-            }
-            # Token and sampling controls where supported
-            if not (('gpt-5' in model.lower()) or ('o1' in model.lower()) or ('o3' in model.lower())):
-                chat_params["max_tokens"] = MAX_TOKENS
-                chat_params["temperature"] = TEMPERATURE
-
-            # Run sync SDK in a thread to preserve async signature
-            import asyncio
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: self.client.chat.completions.create(**chat_params)
+        else:
+            # Text-only mode: no image
+            question_content = question
+        
+        # Fit prompt blocks and history into the model's token budget
+        packed = pack_context(blocks, history, question_content, model=model)
+        if packed.dropped:
+            dropped = ", ".join(
+                f"{d['name']} (~{d['tokens']} tok{', ' + str(d['messages']) + ' msgs' if 'messages' in d else ''})"
+                for d in packed.dropped
             )
+            print(f"[Token Optimization] Budget {packed.budget} tok for {model}: dropped {dropped}")
+        
+        messages = [{"role": "system", "content": packed.static_prompt}]
+        messages.extend(packed.history)
+        if packed.dynamic_prompt:
+            messages.append({"role": "system", "content": packed.dynamic_prompt.lstrip("\n")})
+        messages.append({"role": "user", "content": question_content})
+        return messages, packed
+
+    def _chat_params(self, model: str, messages: list) -> Dict[str, Any]:
+        """Chat Completions params with token/sampling controls where the model supports them"""
+        # Build params for Chat Completions (text-only path for Phase 4A)
+        chat_params = {
+            "model": model,
+            "messages": messages,
+        }
+        # Token and sampling controls where supported
+        if _supports_sampling(model):
+            chat_params["max_tokens"] = MAX_TOKENS
+            chat_params["temperature"] = TEMPERATURE
+        return chat_params
 
-            # Extract response
-            choice = response.choices[0]
-            answer = (choice.message.content or "").strip()
-            tokens_used = (response.usage.total_tokens if getattr(response, "usage", None) else 0)
-            actual_model = getattr(response, "model", model)
-            
-            print(f"[OPENAI] Actual model used: '{actual_model}' | Tokens: {tokens_used}")
-            
-            # Track cost
-            add_cost(tokens_used)
-            
-            return {
-                "model": model,
-                "answer": answer,
-                "tokens_used": tokens_used,
-                "cost": (tokens_used / 1000) * _budget_tracker["cost_per_1k_tokens"]
-            }
-            
-        except Exception as e:
-            raise Exception(f"OpenAI API error: {str(e)}")
 
 # Global client instance
 _client = None
@@ -404,6 +1071,11 @@ def get_client() -> OpenAIClient:
         _client = OpenAIClient(api_key)
     return _client
 
+async def close_client() -> None:
+    """Release the global client's pooled connections"""
+    if _client is not None:
+        await _client.aclose()
+
 def list_available_models() -> Dict[str, Any]:
     """
     List all OpenAI models available to the current API key.
@@ -414,7 +1086,7 @@ def list_available_models() -> Dict[str, Any]:
     """
     try:
         # Use the OpenAI v1 client to list models
-        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+        client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), base_url=OPENAI_BASE_URL)
         response = client.models.list()
         # Extract model IDs
         model_names = [m.id for m in response.data]
@@ -455,6 +1127,37 @@ MODEL_ALIASES = {
     "gpt4o-mini": "gpt-4o-mini"           # GPT-4o-mini (budget option)
 }
 
+# Aliases from the last successful sync, so startup never waits on models.list()
+MODEL_ALIAS_CACHE = Path(os.getenv("MODEL_ALIAS_CACHE", str(Path(__file__).resolve().parent / "data" / "model_aliases.json")))
+MODEL_ALIAS_REFRESH_INTERVAL = float(os.getenv("MODEL_ALIAS_REFRESH_INTERVAL", "21600"))  # seconds; 0 = refresh once at startup
+
+
+def load_cached_model_aliases() -> bool:
+    """Apply aliases saved by the last successful sync; returns True if a cache was loaded"""
+    try:
+        cached = json.loads(MODEL_ALIAS_CACHE.read_text(encoding="utf-8"))
+        aliases = cached.get("aliases") or {}
+        MODEL_ALIASES.update({k: v for k, v in aliases.items() if isinstance(v, str)})
+        return bool(aliases)
+    except FileNotFoundError:
+        return False
+    except Exception as e:
+        print(f"[SYSTEM] Ignoring unreadable model alias cache: {e}")
+        return False
+
+
+def _save_model_alias_cache() -> None:
+    try:
+        MODEL_ALIAS_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = MODEL_ALIAS_CACHE.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"aliases": MODEL_ALIASES, "synced_at": time.time()}, indent=2), encoding="utf-8")
+        os.replace(tmp, MODEL_ALIAS_CACHE)
+    except Exception as e:
+        print(f"[SYSTEM] Could not save model alias cache: {e}")
+
+
+load_cached_model_aliases()
+
 def resolve_model(requested_model: Optional[str]) -> str:
     """
     Resolves model alias or explicit model name.
@@ -520,7 +1223,20 @@ def sync_model_aliases() -> Dict[str, str]:
             print(f"  Balanced: {MODEL_ALIASES['balanced']} (hybrid mode - RECOMMENDED)")
             print(f"  Advanced: {MODEL_ALIASES['advanced']} (GPT-4o vision)")
         
+        _save_model_alias_cache()
         return MODEL_ALIASES.copy()
     except Exception as e:
         print(f"Warning: Could not sync model aliases: {str(e)}")
         return MODEL_ALIASES.copy()
+
+
+async def refresh_model_aliases_forever() -> None:
+    """
+    Background task: sync aliases off the event loop now, then every
+    MODEL_ALIAS_REFRESH_INTERVAL seconds (once only when the interval is 0).
+    """
+    while True:
+        await asyncio.to_thread(sync_model_aliases)
+        if MODEL_ALIAS_REFRESH_INTERVAL <= 0:
+            return
+        await asyncio.sleep(MODEL_ALIAS_REFRESH_INTERVAL)
@@ -212,6 +212,8 @@ def flag_invalid(trade_id: int = Form(...), reason: str = Form("undisciplined"))
     
     if not isinstance(trades, list):
         trades = []
+    # read_logs() returns the shared trade snapshot; edit copies, not its dicts
+    trades = [dict(t) for t in trades]
     
     found = False
     for t in trades:
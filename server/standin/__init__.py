@@ -0,0 +1,2 @@
+# Record/replay stand-in for the OpenAI API (offline end-to-end benchmarks).
+# recording.py captures real calls; server.py replays them with configurable latency.
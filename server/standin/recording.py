@@ -0,0 +1,159 @@
+"""
+LLM Call Recording
+------------------
+httpx transports that pass Chat Completions calls through to the real API and
+append each request/response pair (with its latency) to a JSONL recording.
+standin/server.py replays these recordings as an OpenAI-compatible server.
+
+Enable with LLM_RECORD=1 (OpenAIClient and vision_complete pick it up);
+recordings go to LLM_RECORDINGS_DIR (default server/data/llm_recordings).
+
+Recorded responses are read in full before being handed to the SDK, so
+streaming calls arrive all at once while recording (timing of the stream is
+still captured as ttfb_ms / latency_ms).
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+
+LLM_RECORD = os.getenv("LLM_RECORD", "0").lower() in ("1", "true", "yes")
+LLM_RECORDINGS_DIR = Path(os.getenv(
+    "LLM_RECORDINGS_DIR",
+    str(Path(__file__).resolve().parent.parent / "data" / "llm_recordings"),
+))
+RECORDINGS_FILE = "recordings.jsonl"
+
+# Request fields that do not change the answer and must not affect matching
+_VOLATILE_FIELDS = ("stream", "stream_options", "user", "timeout")
+
+# Response headers that no longer apply once the body has been read and decoded
+_DROP_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Match key for a Chat Completions request body"""
+    material = {k: v for k, v in body.items() if k not in _VOLATILE_FIELDS}
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class RecordingStore:
+    """Append-only JSONL file of recorded calls"""
+
+    def __init__(self, directory: Path = LLM_RECORDINGS_DIR):
+        self.path = Path(directory) / RECORDINGS_FILE
+        self._lock = threading.Lock()
+
+    def append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line)
+
+    def load(self) -> List[Dict[str, Any]]:
+        return list(self.iter_records())
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        if not self.path.exists():
+            return
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def _should_record(request: httpx.Request) -> bool:
+    return request.method == "POST" and request.url.path.endswith("/chat/completions")
+
+
+def _make_record(request: httpx.Request, status: int, headers: httpx.Headers, body: bytes,
+                 ttfb: float, total: float) -> Dict[str, Any]:
+    try:
+        payload = json.loads(request.content or b"{}")
+    except ValueError:
+        payload = {}
+    return {
+        "key": request_key(payload),
+        "model": payload.get("model"),
+        "stream": bool(payload.get("stream")),
+        "status": status,
+        "content_type": headers.get("content-type", "application/json"),
+        "body": body.decode("utf-8", errors="replace"),
+        "ttfb_ms": round(ttfb * 1000, 2),
+        "latency_ms": round(total * 1000, 2),
+        "recorded_at": time.time(),
+    }
+
+
+def _replayable(response: httpx.Response, body: bytes) -> httpx.Response:
+    headers = [(k, v) for k, v in response.headers.items() if k.lower() not in _DROP_HEADERS]
+    return httpx.Response(response.status_code, headers=headers, content=body, request=response.request)
+
+
+class RecordingAsyncTransport(httpx.AsyncBaseTransport):
+    """Async pass-through transport that records Chat Completions calls"""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, store: Optional[RecordingStore] = None):
+        self.inner = inner
+        self.store = store or RecordingStore()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if not _should_record(request):
+            return await self.inner.handle_async_request(request)
+        start = time.perf_counter()
+        response = await self.inner.handle_async_request(request)
+        ttfb = time.perf_counter() - start
+        response.request = request
+        body = await response.aread()
+        await response.aclose()
+        self.store.append(_make_record(request, response.status_code, response.headers, body,
+                                       ttfb, time.perf_counter() - start))
+        return _replayable(response, body)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class RecordingSyncTransport(httpx.BaseTransport):
+    """Sync pass-through transport that records Chat Completions calls"""
+
+    def __init__(self, inner: httpx.BaseTransport, store: Optional[RecordingStore] = None):
+        self.inner = inner
+        self.store = store or RecordingStore()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if not _should_record(request):
+            return self.inner.handle_request(request)
+        start = time.perf_counter()
+        response = self.inner.handle_request(request)
+        ttfb = time.perf_counter() - start
+        response.request = request
+        body = response.read()
+        response.close()
+        self.store.append(_make_record(request, response.status_code, response.headers, body,
+                                       ttfb, time.perf_counter() - start))
+        return _replayable(response, body)
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+def recording_http_client(**client_kwargs) -> httpx.Client:
+    """Sync httpx client for OpenAI(http_client=...) that records Chat Completions calls"""
+    inner = httpx.HTTPTransport(limits=client_kwargs.pop("limits", httpx.Limits()))
+    return httpx.Client(transport=RecordingSyncTransport(inner), **client_kwargs)
+
+
+def recording_async_http_client(**client_kwargs) -> httpx.AsyncClient:
+    """Async httpx client for AsyncOpenAI(http_client=...) that records Chat Completions calls"""
+    inner = httpx.AsyncHTTPTransport(limits=client_kwargs.pop("limits", httpx.Limits()))
+    return httpx.AsyncClient(transport=RecordingAsyncTransport(inner), **client_kwargs)
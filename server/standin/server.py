@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+OpenAI-Compatible Stand-In Server
+---------------------------------
+Replays recorded Chat Completions responses (see standin/recording.py) with a
+configurable latency distribution, so /ask, /hybrid, /vision/extract and the
+entry suggester can be benchmarked end to end without real model calls.
+
+Usage (from server/):
+    python -m standin.server --port 8900 --latency recorded
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=standin uvicorn app:app
+
+Latency specs (--latency / STANDIN_LATENCY), all in milliseconds:
+    recorded              replay each recording's measured latency (default)
+    fixed:800             constant
+    uniform:200,1200      uniform between bounds
+    normal:800,150        mean, stddev (clamped at 0)
+    lognormal:800,0.4     median, sigma (heavy tail, closest to real APIs)
+--speed scales every sampled latency (e.g. 0 for no delay, 0.5 for half).
+
+Requests are matched on their body (minus stream flags); repeated recordings
+of the same request are replayed round-robin. On a miss (--on-miss):
+    model      replay a recording for the same model, else synthetic (default)
+    synthetic  canned assistant reply with plausible usage numbers
+    error      HTTP 404 with an OpenAI-style error body
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+try:
+    from .recording import LLM_RECORDINGS_DIR, RecordingStore, request_key
+except ImportError:  # run as a plain script
+    from recording import LLM_RECORDINGS_DIR, RecordingStore, request_key
+
+SYNTHETIC_TEXT = os.getenv("STANDIN_SYNTHETIC_TEXT", "Stand-in response: no recording matched this request.")
+
+
+class LatencyModel:
+    """Samples (ttfb_s, total_s) for one replayed response"""
+
+    def __init__(self, spec: str = "recorded", speed: float = 1.0):
+        self.spec = spec
+        self.speed = speed
+        kind, _, args = spec.partition(":")
+        self.kind = kind.strip().lower()
+        self.args = [float(a) for a in args.split(",") if a.strip()]
+        expected = {"recorded": 0, "fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if self.kind not in expected or len(self.args) != expected[self.kind]:
+            raise ValueError(f"Invalid latency spec: {spec!r}")
+
+    def sample(self, record: Optional[Dict[str, Any]]) -> Tuple[float, float]:
+        ttfb_share = 1.0
+        if record and record.get("latency_ms"):
+            ttfb_share = min(1.0, (record.get("ttfb_ms") or record["latency_ms"]) / record["latency_ms"])
+        if self.kind == "recorded":
+            total_ms = (record or {}).get("latency_ms", 0.0)
+        elif self.kind == "fixed":
+            total_ms = self.args[0]
+        elif self.kind == "uniform":
+            total_ms = random.uniform(self.args[0], self.args[1])
+        elif self.kind == "normal":
+            total_ms = max(0.0, random.gauss(self.args[0], self.args[1]))
+        else:
+            total_ms = random.lognormvariate(math.log(max(self.args[0], 1e-9)), self.args[1])
+        total = total_ms * self.speed / 1000
+        return total * ttfb_share, total
+
+
+class RecordingLibrary:
+    """Recordings indexed by request key and by model"""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self.by_key: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self.by_model: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for record in records:
+            if record.get("status", 200) != 200:
+                continue
+            self.by_key[record["key"]].append(record)
+            self.by_model[record.get("model") or ""].append(record)
+        self._cursors: Dict[str, Any] = {}
+        self.counters = {"exact": 0, "model": 0, "synthetic": 0, "errors": 0}
+
+    def _next(self, bucket: str, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        cursor = self._cursors.get(bucket)
+        if cursor is None:
+            cursor = self._cursors[bucket] = itertools.cycle(records)
+        return next(cursor)
+
+    def match(self, body: Dict[str, Any], on_miss: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        key = request_key(body)
+        if key in self.by_key:
+            self.counters["exact"] += 1
+            return self._next(key, self.by_key[key]), "exact"
+        model = body.get("model") or ""
+        if on_miss == "model" and model in self.by_model:
+            self.counters["model"] += 1
+            return self._next(f"model:{model}", self.by_model[model]), "model"
+        if on_miss == "error":
+            self.counters["errors"] += 1
+            return None, "error"
+        self.counters["synthetic"] += 1
+        return None, "synthetic"
+
+
+# --- response shaping ---
+
+def _estimate_tokens(value: Any) -> int:
+    return max(1, len(json.dumps(value)) // 4)
+
+
+def _synthetic_completion(body: Dict[str, Any]) -> Dict[str, Any]:
+    fmt = (body.get("response_format") or {}).get("type")
+    content = "{}" if fmt in ("json_object", "json_schema") else SYNTHETIC_TEXT
+    prompt_tokens = _estimate_tokens(body.get("messages", []))
+    completion_tokens = _estimate_tokens(content)
+    return {
+        "id": f"chatcmpl-standin-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model") or "standin",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                  "total_tokens": prompt_tokens + completion_tokens},
+    }
+
+
+def _sse_events(body: str) -> List[str]:
+    """data: payloads of a recorded SSE body (without the [DONE] marker)"""
+    events = []
+    for line in body.splitlines():
+        if line.startswith("data:"):
+            data = line[5:].strip()
+            if data and data != "[DONE]":
+                events.append(data)
+    return events
+
+
+def _completion_from_record(record: Optional[Dict[str, Any]], body: Dict[str, Any]) -> Dict[str, Any]:
+    if record is None:
+        return _synthetic_completion(body)
+    if not record.get("stream"):
+        return json.loads(record["body"])
+    # Recorded as a stream, requested whole: fold the chunks back together
+    chunks = [json.loads(e) for e in _sse_events(record["body"])]
+    content = "".join((c.get("choices") or [{}])[0].get("delta", {}).get("content") or "" for c in chunks if c.get("choices"))
+    usage = next((c["usage"] for c in reversed(chunks) if c.get("usage")), None)
+    first = chunks[0] if chunks else {}
+    return {
+        "id": first.get("id", f"chatcmpl-standin-{uuid.uuid4().hex[:12]}"),
+        "object": "chat.completion",
+        "created": first.get("created", int(time.time())),
+        "model": first.get("model", body.get("model")),
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": usage,
+    }
+
+
+def _chunks_from_record(record: Optional[Dict[str, Any]], body: Dict[str, Any]) -> List[str]:
+    if record is not None and record.get("stream"):
+        return _sse_events(record["body"])
+    # Recorded whole (or synthetic), requested as a stream: split into word chunks
+    completion = _completion_from_record(record, body)
+    content = completion["choices"][0]["message"]["content"] or ""
+    base = {"id": completion["id"], "object": "chat.completion.chunk",
+            "created": completion["created"], "model": completion["model"]}
+    words = content.split(" ")
+    chunks = [json.dumps({**base, "choices": [{"index": 0, "delta": {"content": w if i == 0 else " " + w},
+                                               "finish_reason": None}]})
+              for i, w in enumerate(words)]
+    chunks.append(json.dumps({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}))
+    if (body.get("stream_options") or {}).get("include_usage"):
+        chunks.append(json.dumps({**base, "choices": [], "usage": completion.get("usage")}))
+    return chunks
+
+
+def create_app(recordings_dir: Path = LLM_RECORDINGS_DIR,
+               latency: str = "recorded",
+               speed: float = 1.0,
+               on_miss: str = "model") -> FastAPI:
+    """Build the stand-in app over a recordings directory"""
+    library = RecordingLibrary(RecordingStore(recordings_dir).load())
+    latency_model = LatencyModel(latency, speed)
+    app = FastAPI(title="LLM stand-in")
+    print(f"[STANDIN] Loaded {sum(len(v) for v in library.by_key.values())} recordings "
+          f"({len(library.by_key)} distinct requests) | latency={latency} x{speed} | on_miss={on_miss}")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        record, how = library.match(body, on_miss)
+        if how == "error":
+            return JSONResponse(status_code=404, content={"error": {
+                "message": "No recording matches this request", "type": "invalid_request_error", "code": "standin_miss"}})
+        ttfb, total = latency_model.sample(record)
+
+        if not body.get("stream"):
+            await asyncio.sleep(total)
+            return JSONResponse(_completion_from_record(record, body), headers={"x-standin-match": how})
+
+        chunks = _chunks_from_record(record, body)
+
+        async def events():
+            await asyncio.sleep(ttfb)
+            gap = (total - ttfb) / max(1, len(chunks) - 1)
+            for i, chunk in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(gap)
+                yield f"data: {chunk}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream", headers={"x-standin-match": how})
+
+    @app.get("/v1/models")
+    async def models():
+        names = sorted(m for m in library.by_model if m)
+        return {"object": "list", "data": [{"id": m, "object": "model", "created": 0, "owned_by": "standin"} for m in names]}
+
+    @app.get("/standin/stats")
+    async def stats():
+        return {"latency": latency, "speed": speed, "on_miss": on_miss, **library.counters}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded OpenAI responses as an OpenAI-compatible server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.getenv("STANDIN_PORT", "8900")))
+    parser.add_argument("--recordings", type=Path, default=LLM_RECORDINGS_DIR)
+    parser.add_argument("--latency", default=os.getenv("STANDIN_LATENCY", "recorded"))
+    parser.add_argument("--speed", type=float, default=float(os.getenv("STANDIN_SPEED", "1.0")))
+    parser.add_argument("--on-miss", choices=("model", "synthetic", "error"), default=os.getenv("STANDIN_ON_MISS", "model"))
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args.recordings, args.latency, args.speed, args.on_miss), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
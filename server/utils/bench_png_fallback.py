@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Benchmark: pypng fallback in /analyze, pure-Python loop vs NumPy.
+
+Builds a synthetic RGBA chart screenshot (semi-transparent candles on a
+partly transparent background) and times both encoders on it.
+
+Usage (from server/):
+    python -m utils.bench_png_fallback [--width 2560] [--height 1440] [--runs 3]
+"""
+import argparse
+import io
+import time
+
+import numpy as np
+import png
+
+from utils.image_preprocess import MAX_IMAGE_SIZE, encode_png_numpy, encode_png_python
+
+
+def make_chart_png(width: int, height: int) -> bytes:
+    """Synthetic RGBA chart: gradient background, candle columns, varying alpha"""
+    rng = np.random.default_rng(42)
+    img = np.zeros((height, width, 4), dtype=np.uint8)
+    img[:, :, 0] = np.linspace(20, 60, width, dtype=np.uint8)[None, :]
+    img[:, :, 1] = np.linspace(20, 40, height, dtype=np.uint8)[:, None]
+    img[:, :, 2] = 50
+    img[:, :, 3] = 200
+    for x in range(0, width - 8, 12):
+        top, bottom = sorted(rng.integers(0, height, 2))
+        color = (30, 200, 90, 255) if rng.random() > 0.5 else (220, 50, 50, 160)
+        img[top:bottom + 1, x:x + 8] = color
+    buffer = io.BytesIO()
+    png.Writer(width=width, height=height, greyscale=False, alpha=True, bitdepth=8).write(
+        buffer, img.reshape(height, width * 4)
+    )
+    return buffer.getvalue()
+
+
+def _time(fn, data: bytes, runs: int):
+    best = float("inf")
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn(data, MAX_IMAGE_SIZE)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=2560)
+    parser.add_argument("--height", type=int, default=1440)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    data = make_chart_png(args.width, args.height)
+    print(f"Input: {args.width}x{args.height} RGBA PNG ({len(data) / 1024:.0f} KB), best of {args.runs}")
+
+    py_time, py_result = _time(encode_png_python, data, max(1, min(args.runs, 2)))
+    np_time, np_result = _time(encode_png_numpy, data, args.runs)
+
+    print(f"  python loop : {py_time * 1000:8.1f} ms -> {py_result['width']}x{py_result['height']}")
+    print(f"  numpy       : {np_time * 1000:8.1f} ms -> {np_result['width']}x{np_result['height']}")
+    print(f"  speedup     : {py_time / np_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,19 +7,14 @@ from typing import Any, Dict, Optional
 import base64
 import io
 import json
+import importlib.util
 import os
-import requests
 import time
 import threading
 
 # === 5F.2 FIX ===
-# Try to import PIL for image processing
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-    Image = None
+# PIL is optional; probe without importing it (loaded on first chart encode)
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
 
 # Constants
 CHARTS_DIR = Path(__file__).resolve().parent.parent / "data" / "charts"
@@ -121,6 +116,7 @@ def resolve_chart_filename(trade: Dict[str, Any]) -> Optional[str]:
             print(f"[CHART_SERVICE] chart_path field exists but file not found: {direct}")
     
     # Priority 2: Metadata API
+    import requests  # deferred: only needed when chart_path is missing
     try:
         response = requests.get(f"{METADATA_API_BASE}/chart/{trade_id}", timeout=TIMEOUT)
         if response.ok:
@@ -264,6 +260,7 @@ def load_chart_base64(trade: Dict[str, Any]) -> Optional[str]:
     
     try:
         if PIL_AVAILABLE:
+            from PIL import Image
             with Image.open(img_path) as im:
                 # Convert to RGB (handles PNG with transparency)
                 if im.mode != "RGB":
@@ -0,0 +1,224 @@
+"""
+Context Packer
+Fits the system-prompt blocks and conversation history of a chat request into
+a per-model token budget, keeping the highest-priority content and recording
+what was dropped.
+
+Blocks marked dynamic (per-request data such as the latest price or the last
+command result) are kept out of the static system prompt so it stays a stable
+prefix for the provider's prompt cache; see OpenAIClient._build_messages.
+
+Token counts come from a fast local estimator (no tokenizer dependency); it is
+deliberately a little pessimistic so packed prompts stay under the real limit.
+"""
+
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+# Priorities: lower number = kept first
+PRIORITY_REQUIRED = 0
+PRIORITY_COMMAND_RESULT = 10
+PRIORITY_SESSION_CONTEXT = 20
+PRIORITY_RECENT_HISTORY = 30
+PRIORITY_TRADE_SUMMARY = 40
+PRIORITY_AWARENESS = 50
+PRIORITY_LEARNING_PROFILE = 60
+PRIORITY_OLDER_HISTORY = 70
+PRIORITY_SYSTEM_SESSIONS = 80
+
+# Most recent history messages packed at PRIORITY_RECENT_HISTORY; older ones at PRIORITY_OLDER_HISTORY
+RECENT_HISTORY_MESSAGES = int(os.getenv("CONTEXT_RECENT_HISTORY_MESSAGES", "6"))
+
+MESSAGE_OVERHEAD_TOKENS = 4  # role/separator tokens per chat message
+IMAGE_TOKENS = 1105  # high-detail 2048px image, rough upper bound
+
+# Prompt budgets (input tokens) by model prefix; longest matching prefix wins.
+# Override everything with CONTEXT_TOKEN_BUDGET, or per model with
+# CONTEXT_TOKEN_BUDGETS='{"gpt-4o-mini": 8000}'.
+DEFAULT_TOKEN_BUDGET = 12000
+MODEL_TOKEN_BUDGETS: Dict[str, int] = {
+    "gpt-5": 24000,
+    "gpt-4o": 16000,
+    "gpt-4o-mini": 12000,
+    "o1": 16000,
+    "o3": 16000,
+}
+try:
+    MODEL_TOKEN_BUDGETS.update({k.lower(): int(v) for k, v in json.loads(os.getenv("CONTEXT_TOKEN_BUDGETS", "{}")).items()})
+except (ValueError, AttributeError):
+    print("[CONTEXT] Ignoring invalid CONTEXT_TOKEN_BUDGETS")
+
+
+def estimate_tokens(text: Any) -> int:
+    """
+    Fast token estimate for prompt text.
+
+    ASCII text is counted at ~4 characters per token; non-ASCII characters
+    (emoji, accented text) are counted as one token each, which is closer to
+    how BPE tokenizers split them.
+    """
+    if text is None:
+        return 0
+    if not isinstance(text, str):
+        if isinstance(text, list):
+            # Multi-part content: count text parts, images at a flat rate
+            total = 0
+            for part in text:
+                if isinstance(part, dict) and part.get("type") == "image_url":
+                    total += IMAGE_TOKENS
+                elif isinstance(part, dict):
+                    total += estimate_tokens(part.get("text", ""))
+                else:
+                    total += estimate_tokens(str(part))
+            return total
+        text = str(text)
+    n = len(text)
+    if n == 0:
+        return 0
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return (ascii_chars + 3) // 4 + (n - ascii_chars)
+
+
+def token_budget_for(model: Optional[str]) -> int:
+    """Prompt token budget for a model (env overrides applied)"""
+    override = os.getenv("CONTEXT_TOKEN_BUDGET")
+    if override:
+        try:
+            return int(override)
+        except ValueError:
+            pass
+    name = (model or "").lower()
+    best = None
+    for prefix in MODEL_TOKEN_BUDGETS:
+        if name.startswith(prefix) and (best is None or len(prefix) > len(best)):
+            best = prefix
+    return MODEL_TOKEN_BUDGETS[best] if best else DEFAULT_TOKEN_BUDGET
+
+
+@dataclass
+class ContextBlock:
+    name: str
+    text: str
+    priority: int
+    tokens: int = -1
+    dynamic: bool = False  # changes from request to request (sent after the history)
+
+    def __post_init__(self):
+        if self.tokens < 0:
+            self.tokens = estimate_tokens(self.text)
+
+
+@dataclass
+class PackedContext:
+    blocks: List[ContextBlock]
+    history: List[Dict[str, Any]]
+    budget: int
+    used_tokens: int
+    dropped: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def system_prompt(self) -> str:
+        return "".join(b.text for b in self.blocks)
+
+    @property
+    def static_prompt(self) -> str:
+        """Kept blocks that are stable across requests (cacheable prefix)"""
+        return "".join(b.text for b in self.blocks if not b.dynamic)
+
+    @property
+    def dynamic_prompt(self) -> str:
+        """Kept per-request blocks"""
+        return "".join(b.text for b in self.blocks if b.dynamic)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "budget": self.budget,
+            "used_tokens": self.used_tokens,
+            "history_messages": len(self.history),
+            "dropped": self.dropped,
+        }
+
+
+def pack_context(blocks: List[ContextBlock],
+                 history: Optional[List[Dict[str, Any]]],
+                 question: Any,
+                 model: Optional[str] = None,
+                 budget: Optional[int] = None) -> PackedContext:
+    """
+    Pack system-prompt blocks and history into a token budget.
+
+    Required blocks and the question are always kept. Remaining items are added
+    in priority order; history is considered newest-first and stays a contiguous
+    suffix of the conversation (once an older message is dropped, everything
+    before it is dropped too).
+
+    Args:
+        blocks: System-prompt blocks in prompt order
+        history: Prior user/assistant messages, oldest first
+        question: Current user message content (str or multi-part list)
+        model: Model name used to pick the budget
+        budget: Explicit budget (overrides the model budget)
+
+    Returns:
+        PackedContext with kept blocks (prompt order), kept history (chronological)
+        and a list of dropped items
+    """
+    history = list(history or [])
+    budget = budget if budget is not None else token_budget_for(model)
+
+    used = estimate_tokens(question) + MESSAGE_OVERHEAD_TOKENS * 2  # system + question messages
+    candidates = []
+    for index, block in enumerate(blocks):
+        if block.priority <= PRIORITY_REQUIRED:
+            used += block.tokens
+        else:
+            candidates.append((block.priority, 0, index, "block", block))
+
+    n = len(history)
+    history_tokens = [estimate_tokens(m.get("content")) + MESSAGE_OVERHEAD_TOKENS for m in history]
+    for age, pos in enumerate(range(n - 1, -1, -1)):
+        priority = PRIORITY_RECENT_HISTORY if age < RECENT_HISTORY_MESSAGES else PRIORITY_OLDER_HISTORY
+        candidates.append((priority, age, pos, "history", history[pos]))
+    candidates.sort(key=lambda c: (c[0], c[1]))
+
+    kept_blocks = {i for i, b in enumerate(blocks) if b.priority <= PRIORITY_REQUIRED}
+    oldest_kept = n  # history[oldest_kept:] is kept
+    history_closed = False
+    dropped: List[Dict[str, Any]] = []
+
+    for priority, _, index, kind, item in candidates:
+        if kind == "block":
+            if used + item.tokens <= budget:
+                kept_blocks.add(index)
+                used += item.tokens
+            else:
+                dropped.append({"kind": "block", "name": item.name, "tokens": item.tokens})
+            continue
+        cost = history_tokens[index]
+        if not history_closed and index == oldest_kept - 1 and used + cost <= budget:
+            oldest_kept = index
+            used += cost
+        else:
+            history_closed = True
+            dropped.append({"kind": "history", "index": index, "role": item.get("role"), "tokens": cost})
+
+    # Collapse per-message history drops into one entry
+    history_drops = [d for d in dropped if d["kind"] == "history"]
+    dropped = [d for d in dropped if d["kind"] != "history"]
+    if history_drops:
+        dropped.append({
+            "kind": "history",
+            "name": "conversation_history",
+            "messages": len(history_drops),
+            "tokens": sum(d["tokens"] for d in history_drops),
+        })
+
+    return PackedContext(
+        blocks=[b for i, b in enumerate(blocks) if i in kept_blocks],
+        history=history[oldest_kept:],
+        budget=budget,
+        used_tokens=used,
+        dropped=dropped,
+    )
@@ -0,0 +1,45 @@
+"""
+Data Version Counters
+Monotonic per-source counters that writers bump and readers use to decide
+whether a derived value (prompt segment, snapshot, ...) is still current.
+
+Sources:
+- "trades":  trade rows (DB writes, performance log writes)
+- "profile": learning profile (user_profile.json)
+- "memory":  other persistent memory files (sessions, conversation log, contexts)
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict, Tuple
+
+_versions: Dict[str, int] = {}
+_lock = threading.Lock()
+
+# JSON files whose writes map to a specific source (anything else is "memory")
+_PATH_SOURCES = {
+    "user_profile.json": "profile",
+    "performance_logs.json": "trades",
+}
+
+
+def bump(*sources: str) -> None:
+    """Advance the version of one or more sources"""
+    with _lock:
+        for source in sources:
+            _versions[source] = _versions.get(source, 0) + 1
+
+
+def bump_for_path(path) -> None:
+    """Advance the source that a JSON file write belongs to"""
+    bump(_PATH_SOURCES.get(Path(path).name, "memory"))
+
+
+def get_version(source: str) -> int:
+    """Current version of a source (0 until first write)"""
+    return _versions.get(source, 0)
+
+
+def snapshot(*sources: str) -> Tuple[int, ...]:
+    """Versions of several sources, usable as a cache key"""
+    return tuple(_versions.get(source, 0) for source in sources)
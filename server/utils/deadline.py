@@ -0,0 +1,74 @@
+"""
+Request Deadlines
+A per-request time budget carried in a context variable, so code deep in the
+call chain (upstream model calls, retries, hedges) can size its timeouts to
+what the HTTP caller is still willing to wait for.
+
+The deadline is set by the deadline middleware in app.py from the
+X-Request-Timeout header (seconds) or REQUEST_DEADLINE_S, and is inherited by
+tasks spawned while serving the request. Outside a request there is no
+deadline and remaining() returns None.
+"""
+
+import os
+import time
+from contextvars import ContextVar, Token
+from typing import Optional
+
+REQUEST_DEADLINE_S = float(os.getenv("REQUEST_DEADLINE_S", "150"))  # 0 = no default deadline
+DEADLINE_HEADER = "x-request-timeout"
+
+# Absolute time.monotonic() deadline; None = unbounded
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before the work finished"""
+
+
+def parse_timeout(value: Optional[str]) -> Optional[float]:
+    """Seconds from a header value, falling back to REQUEST_DEADLINE_S"""
+    try:
+        seconds = float(value) if value else REQUEST_DEADLINE_S
+    except ValueError:
+        seconds = REQUEST_DEADLINE_S
+    return seconds if seconds > 0 else None
+
+
+def set_deadline(seconds: Optional[float]) -> Token:
+    """
+    Start a deadline `seconds` from now; a tighter enclosing deadline wins.
+
+    Returns:
+        Token for reset_deadline()
+    """
+    current = _deadline.get()
+    deadline = time.monotonic() + seconds if seconds is not None else None
+    if current is not None and (deadline is None or current < deadline):
+        deadline = current
+    return _deadline.set(deadline)
+
+
+def reset_deadline(token: Token) -> None:
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the deadline (may be negative), or None without one"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def bound_timeout(timeout: float) -> float:
+    """
+    Clamp a per-call timeout to the time left on the deadline.
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(timeout, left)
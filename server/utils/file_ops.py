@@ -8,6 +8,8 @@ import os
 from pathlib import Path
 from typing import Any, Dict, List
 
+from utils.data_versions import bump_for_path
+
 
 # Unified data directory path
 DATA_DIR = Path(__file__).parent.parent / "data"
@@ -40,6 +42,7 @@ def save_json(path: str, data: Any):
     
     with open(path_obj, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=2, ensure_ascii=False)
+    bump_for_path(path_obj)
 
 
 def append_json(path: str, obj: Dict[str, Any]):
@@ -0,0 +1,288 @@
+"""
+Image Preprocessing Service
+Shared decode → RGB → downscale → JPEG → base64 pipeline for chart uploads
+(/analyze, /ask, hybrid pipeline).
+
+Work runs in a small thread pool so large screenshots never block the event
+loop (Pillow releases the GIL while decoding, resizing and encoding). JPEG
+uploads use Pillow's draft mode so the decoder downscales in the DCT domain
+before the LANCZOS pass. Encoded results are cached by the SHA-256 of the raw
+upload bytes, and concurrent uploads of the same bytes share one encode.
+
+Without Pillow (slim images), PNG uploads fall back to pypng + NumPy: alpha
+blending onto white and an area-averaging downscale are done as array
+operations. The original per-pixel loop is kept only for environments without
+NumPy and for utils/bench_png_fallback.py.
+
+Pillow, pypng and NumPy are imported on first use, keeping them off the
+server's startup path.
+"""
+
+import asyncio
+import base64
+import hashlib
+import importlib.util
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from cache import SingleFlight
+from utils import metrics
+
+# Availability is probed without importing: Pillow and NumPy are loaded on the
+# first upload instead of at server startup
+PIL_AVAILABLE = importlib.util.find_spec("PIL") is not None
+PYPNG_AVAILABLE = importlib.util.find_spec("png") is not None
+NUMPY_AVAILABLE = importlib.util.find_spec("numpy") is not None
+
+MAX_IMAGE_SIZE = 2048  # OpenAI vision input limit (longest side)
+JPEG_QUALITY = 85
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+IMAGE_CACHE_MAX_MB = float(os.getenv("IMAGE_CACHE_MAX_MB", "64"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+_flight = SingleFlight()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(1, IMAGE_WORKERS), thread_name_prefix="image-preprocess")
+        return _executor
+
+
+class EncodedImageCache:
+    """LRU of encoded results keyed by raw-bytes hash, capped by base64 payload bytes"""
+
+    def __init__(self, max_bytes: int = int(IMAGE_CACHE_MAX_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.counters["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self.counters["hits"] += 1
+            return item
+
+    def set(self, key: str, item: Dict[str, Any]) -> None:
+        size = len(item["base64"])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old["base64"])
+            self._items[key] = item
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._items:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted["base64"])
+                self.counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.counters, "entries": len(self._items), "bytes": self._bytes, "max_bytes": self.max_bytes}
+
+
+_encoded_cache = EncodedImageCache()
+
+
+def get_image_cache() -> EncodedImageCache:
+    """Get the global encoded-image cache"""
+    return _encoded_cache
+
+
+def encode_image(image_data: bytes, max_size: int = MAX_IMAGE_SIZE, quality: int = JPEG_QUALITY) -> Dict[str, Any]:
+    """
+    Decode, convert to RGB, downscale and JPEG-encode an image (blocking).
+
+    Args:
+        image_data: Raw uploaded bytes
+        max_size: Longest side after downscaling
+        quality: JPEG quality
+
+    Returns:
+        Dict with base64 (JPEG), width, height, format and processor
+    """
+    if not PIL_AVAILABLE:
+        if PYPNG_AVAILABLE:
+            try:
+                if NUMPY_AVAILABLE:
+                    return encode_png_numpy(image_data, max_size)
+                return encode_png_python(image_data, max_size)
+            except Exception as e:
+                print(f"[IMAGE] pypng processing failed: {e}, falling back to raw data")
+        # No usable image library: pass the upload through unchanged
+        return {
+            "base64": base64.b64encode(image_data).decode("utf-8"),
+            "width": None,
+            "height": None,
+            "format": "raw",
+            "processor": "none",
+        }
+
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_data)) as image:
+        if image.format == "JPEG" and (image.width > max_size or image.height > max_size):
+            # Let libjpeg decode at 1/2, 1/4 or 1/8 scale (never below max_size)
+            image.draft("RGB", (max_size, max_size))
+
+        # Convert to RGB if necessary (for PNG with transparency)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+
+        # Resize if too large (OpenAI has size limits)
+        if image.width > max_size or image.height > max_size:
+            image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality)
+        return {
+            "base64": base64.b64encode(buffer.getvalue()).decode("utf-8"),
+            "width": image.width,
+            "height": image.height,
+            "format": "JPEG",
+            "processor": "PIL/Pillow",
+        }
+
+
+def _png_result(width: int, height: int, rows) -> Dict[str, Any]:
+    """Write 8-bit RGB rows as PNG and wrap them in the preprocess result shape"""
+    import png
+
+    buffer = io.BytesIO()
+    png.Writer(width=width, height=height, greyscale=False, alpha=False, bitdepth=8).write(buffer, rows)
+    return {
+        "base64": base64.b64encode(buffer.getvalue()).decode("utf-8"),
+        "width": width,
+        "height": height,
+        "format": "PNG",
+        "processor": "pypng",
+    }
+
+
+def _target_size(width: int, height: int, max_size: int):
+    scale = min(max_size / width, max_size / height, 1.0)
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def encode_png_numpy(image_data: bytes, max_size: int = MAX_IMAGE_SIZE) -> Dict[str, Any]:
+    """
+    PNG fallback without Pillow: blend alpha onto white and area-average down
+    to max_size using NumPy.
+
+    Args:
+        image_data: Raw PNG bytes
+        max_size: Longest side after downscaling
+
+    Returns:
+        Dict with base64 (PNG), width, height, format and processor
+    """
+    import numpy as np
+    import png
+
+    width, height, rows, _ = png.Reader(bytes=image_data).asRGBA8()
+    rgba = np.vstack([np.frombuffer(row, dtype=np.uint8) for row in rows]).reshape(height, width, 4)
+
+    # out = c * a + 255 * (1 - a)  ==  255 + (c - 255) * a
+    alpha = rgba[:, :, 3:4] * np.float32(1 / 255)
+    rgb = rgba[:, :, :3] - np.float32(255)
+    rgb *= alpha
+    rgb += 255
+
+    new_width, new_height = _target_size(width, height, max_size)
+    if (new_width, new_height) != (width, height):
+        # Box filter: each output pixel is the mean of the source pixels whose
+        # index falls in its span (sums via reduceat, then scale by 1/span)
+        ys = (np.arange(new_height + 1) * height) // new_height
+        xs = (np.arange(new_width + 1) * width) // new_width
+        rgb = np.add.reduceat(np.add.reduceat(rgb, ys[:-1], axis=0), xs[:-1], axis=1)
+        rgb *= (1 / np.diff(ys)).astype(np.float32)[:, None, None]
+        rgb *= (1 / np.diff(xs)).astype(np.float32)[None, :, None]
+
+    rgb += 0.5
+    return _png_result(new_width, new_height, rgb.astype(np.uint8).reshape(new_height, new_width * 3))
+
+
+def encode_png_python(image_data: bytes, max_size: int = MAX_IMAGE_SIZE) -> Dict[str, Any]:
+    """
+    Pure-Python PNG fallback (original /analyze implementation): per-pixel
+    alpha blend and nearest-row/column downsampling. Used when NumPy is
+    missing and as the benchmark baseline.
+    """
+    import png
+
+    width, height, pixels, _ = png.Reader(bytes=image_data).asRGBA8()
+
+    # Handle RGBA -> RGB conversion
+    rgb_pixels = []
+    for row in pixels:
+        rgb_row = []
+        for i in range(0, len(row), 4):
+            r, g, b, a = row[i:i+4]
+            # Simple alpha blending with white background
+            alpha = a / 255.0
+            rgb_row.extend([
+                int(r * alpha + 255 * (1 - alpha)),
+                int(g * alpha + 255 * (1 - alpha)),
+                int(b * alpha + 255 * (1 - alpha))
+            ])
+        rgb_pixels.append(rgb_row)
+    pixels = rgb_pixels
+
+    # Basic resize if too large (simple downsampling)
+    new_width, new_height = _target_size(width, height, max_size)
+    if (new_width, new_height) != (width, height):
+        new_pixels = []
+        for y in range(new_height):
+            src = pixels[y * height // new_height]
+            row = []
+            for x in range(new_width):
+                pixel_idx = (x * width // new_width) * 3
+                row.extend(src[pixel_idx:pixel_idx+3])
+            new_pixels.append(row)
+        pixels = new_pixels
+
+    return _png_result(new_width, new_height, pixels)
+
+
+async def preprocess_image(image_data: bytes) -> Dict[str, Any]:
+    """
+    Preprocess an upload off the event loop, reusing cached results.
+
+    Args:
+        image_data: Raw uploaded bytes
+
+    Returns:
+        Dict with base64, width, height, format, processor and hash (SHA-256 of
+        the raw bytes)
+    """
+    key = hashlib.sha256(image_data).hexdigest()
+    with metrics.timed("cache_lookup"):
+        cached = _encoded_cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def _encode() -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        with metrics.timed("image_decode"):
+            result = await loop.run_in_executor(_get_executor(), encode_image, image_data)
+        result["hash"] = key
+        _encoded_cache.set(key, result)
+        return result
+
+    result, _ = await _flight.do(key, _encode)
+    return result
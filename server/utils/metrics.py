@@ -0,0 +1,159 @@
+"""
+Stage Latency Metrics
+In-process latency histograms for the hot path, exposed in Prometheus text
+format at /metrics.
+
+Stages recorded:
+- image_decode:    upload decode/resize/encode (utils.image_preprocess)
+- cache_lookup:    response / vision-summary / encoded-image cache reads
+- prompt_assembly: system prompt + history packing (OpenAIClient._build_messages)
+- llm_call:        upstream model call (whole stream for streaming routes)
+- llm_first_token: time to the first streamed token (falls as prompt-cache reuse rises)
+- db_query:        SQL statement execution (engine cursor events, db.events)
+- request:         whole request, recorded by the metrics middleware
+
+Observations made while serving a request are buffered per request and
+labelled with the matched route template (e.g. /analytics/entry-methods/{entry_method_id})
+when the response is ready, so label cardinality stays bounded. Work outside a
+request (startup, background tasks) is labelled route="none".
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRIC_NAME = "trading_ai_stage_duration_seconds"
+
+# Seconds; covers sub-ms cache/DB reads through multi-minute model calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+NO_ROUTE = "none"
+
+
+class _RequestMetrics:
+    """Observations for one request; buffered until its route label is known"""
+
+    __slots__ = ("route", "pending")
+
+    def __init__(self):
+        self.route: Optional[str] = None
+        self.pending: List[Tuple[str, float]] = []
+
+
+# None outside a request
+_request_metrics: ContextVar[Optional[_RequestMetrics]] = ContextVar("request_metrics", default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram keyed by (route, stage) labels"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, str], List] = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, stage: str, seconds: float) -> None:
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get((route, stage))
+            if series is None:
+                series = self._series[(route, stage)] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def render(self, name: str) -> str:
+        """Prometheus text exposition (cumulative buckets, +Inf, _sum, _count)"""
+        lines = [
+            f"# HELP {name} Latency of hot-path stages by route.",
+            f"# TYPE {name} histogram",
+        ]
+        with self._lock:
+            snapshot = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._series.items())
+        for (route, stage), (counts, total, count) in snapshot:
+            labels = f'route="{_escape(route)}",stage="{_escape(stage)}"'
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f'{name}_bucket{{{labels},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{name}_sum{{{labels}}} {total:.6f}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_histogram = Histogram()
+
+
+def get_histogram() -> Histogram:
+    """Get the global stage histogram"""
+    return _histogram
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record one stage duration (buffered to the current request if any)"""
+    if not METRICS_ENABLED:
+        return
+    current = _request_metrics.get()
+    if current is None:
+        _histogram.observe(NO_ROUTE, stage, seconds)
+    elif current.route is None:
+        current.pending.append((stage, seconds))
+    else:
+        # Streaming bodies keep running after the response headers went out
+        _histogram.observe(current.route, stage, seconds)
+
+
+@contextmanager
+def timed(stage: str):
+    """Time a block as one stage observation (works in sync and async code)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start)
+
+
+def begin_request():
+    """Start buffering observations for a request; returns a token for end_request"""
+    return _request_metrics.set(_RequestMetrics())
+
+
+def end_request(token, route: Optional[str], total_seconds: float) -> None:
+    """
+    Flush the request's observations under its route label.
+
+    For streaming responses this runs when the headers are sent; stages that
+    finish later (e.g. llm_call) are recorded directly under the same route.
+    """
+    current = _request_metrics.get()
+    _request_metrics.reset(token)
+    if current is None:
+        return
+    current.route = route or NO_ROUTE
+    pending, current.pending = current.pending, []
+    if not METRICS_ENABLED:
+        return
+    for stage, seconds in pending:
+        _histogram.observe(current.route, stage, seconds)
+    _histogram.observe(current.route, "request", total_seconds)
+
+
+def render_metrics() -> str:
+    """All metrics in Prometheus text format"""
+    return _histogram.render(METRIC_NAME)
@@ -0,0 +1,138 @@
+"""
+Startup Profile
+Records how long each module takes to import and how long each startup phase
+takes, so slow boots can be traced to a specific dependency or step.
+
+install() must run before the imports it should see (top of app.py) and
+finish() runs once startup is done: it logs the report and takes the import
+hook out of sys.meta_path, so later imports pay nothing. Module timings are
+cumulative (including the module's own imports); self time excludes them.
+Set STARTUP_PROFILE_LAZY=true to keep the hook installed and also record lazy
+imports (first image upload, first chart render) in /startup/profile.
+"""
+
+import importlib.machinery
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+STARTUP_PROFILE_ENABLED = os.getenv("STARTUP_PROFILE", "true").lower() == "true"
+STARTUP_PROFILE_TOP = int(os.getenv("STARTUP_PROFILE_TOP", "15"))
+STARTUP_PROFILE_LAZY = os.getenv("STARTUP_PROFILE_LAZY", "false").lower() == "true"
+
+_started = time.perf_counter()
+_imports: Dict[str, Dict[str, float]] = {}  # module -> {"cumulative": s, "self": s, "at": s since start}
+_phases: List[Dict[str, Any]] = []
+_local = threading.local()
+_lock = threading.Lock()
+
+
+def _timed_exec(name: str, exec_module):
+    def exec_and_time(module):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(0.0)  # child time accumulator
+        start = time.perf_counter()
+        try:
+            exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            with _lock:
+                _imports[name] = {
+                    "cumulative": elapsed,
+                    "self": elapsed - children,
+                    "at": start - _started,
+                }
+    return exec_and_time
+
+
+class _ImportTimer:
+    """Meta-path finder that times module execution for path-based imports"""
+
+    @staticmethod
+    def find_spec(name, path=None, target=None):
+        spec = importlib.machinery.PathFinder.find_spec(name, path, target)
+        loader = getattr(spec, "loader", None) if spec else None
+        # Per-module loader instances only (never patch a shared loader class)
+        if loader is None or isinstance(loader, type) or not hasattr(loader, "exec_module"):
+            return spec
+        loader.exec_module = _timed_exec(name, loader.exec_module)
+        return spec
+
+    @staticmethod
+    def invalidate_caches():
+        pass
+
+
+_finder = _ImportTimer()
+
+
+def install() -> None:
+    """Start timing imports (idempotent; no-op when STARTUP_PROFILE=false)"""
+    if not STARTUP_PROFILE_ENABLED or _finder in sys.meta_path:
+        return
+    # Sit just in front of PathFinder so custom finders keep their precedence
+    index = next((i for i, f in enumerate(sys.meta_path) if f is importlib.machinery.PathFinder), len(sys.meta_path))
+    sys.meta_path.insert(index, _finder)
+
+
+def uninstall() -> None:
+    """Stop timing imports; recorded timings are kept for report()"""
+    if _finder in sys.meta_path:
+        sys.meta_path.remove(_finder)
+
+
+def finish() -> None:
+    """End of startup: log the report and, unless STARTUP_PROFILE_LAZY, remove the import hook"""
+    print_report()
+    if not STARTUP_PROFILE_LAZY:
+        uninstall()
+
+
+@contextmanager
+def phase(name: str):
+    """Time one startup phase (DB init, memory load, ...)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _phases.append({"phase": name, "seconds": round(time.perf_counter() - start, 4)})
+
+
+def report(top: int = STARTUP_PROFILE_TOP) -> Dict[str, Any]:
+    """Slowest imports and startup phase timings"""
+    with _lock:
+        items = list(_imports.items())
+    slowest = sorted(items, key=lambda kv: kv[1]["cumulative"], reverse=True)[:top]
+    by_self = sorted(items, key=lambda kv: kv[1]["self"], reverse=True)[:top]
+    fmt = lambda kv: {"module": kv[0], **{k: round(v, 4) for k, v in kv[1].items()}}
+    return {
+        "enabled": STARTUP_PROFILE_ENABLED,
+        "recording_imports": _finder in sys.meta_path,
+        "since_profiler_start_s": round(time.perf_counter() - _started, 3),
+        "modules_timed": len(items),
+        "slowest_cumulative": [fmt(kv) for kv in slowest],
+        "slowest_self": [fmt(kv) for kv in by_self],
+        "phases": list(_phases),
+    }
+
+
+def print_report(top: int = 10) -> None:
+    """Log the startup report in the [BOOT] style"""
+    if not STARTUP_PROFILE_ENABLED:
+        return
+    data = report(top)
+    print(f"[BOOT] Startup profile ({data['since_profiler_start_s']:.2f}s since profiler start, "
+          f"{data['modules_timed']} modules timed)")
+    for item in data["slowest_cumulative"]:
+        print(f"[BOOT]   import {item['module']:<40} {item['cumulative'] * 1000:8.1f} ms "
+              f"(self {item['self'] * 1000:.1f} ms)")
+    for item in data["phases"]:
+        print(f"[BOOT]   phase  {item['phase']:<40} {item['seconds'] * 1000:8.1f} ms")
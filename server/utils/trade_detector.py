@@ -6,6 +6,50 @@ import json
 from pathlib import Path
 from typing import Optional, Dict, Any, List
 
+_snapshot_api = None  # performance.utils module once resolved; False when unavailable
+
+
+def _performance_utils():
+    global _snapshot_api
+    if _snapshot_api is None:
+        try:
+            from performance import utils as perf_utils
+            _snapshot_api = perf_utils
+        except Exception:
+            _snapshot_api = False
+    return _snapshot_api or None
+
+
+def sort_trades_chronologically(all_trades: List[Dict[str, Any]], reverse: bool = False) -> List[Dict[str, Any]]:
+    """
+    Trades oldest first by timestamp/entry_time (newest first with reverse).
+
+    When all_trades is the list read_logs() returned, this is the trade
+    snapshot's precomputed ordering (no sort). Treat the result as read-only.
+    """
+    perf_utils = _performance_utils()
+    if perf_utils:
+        return perf_utils.sort_chronological(all_trades, reverse=reverse)
+    return sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=reverse)
+
+
+def find_chronological_index(all_trades: List[Dict[str, Any]], trade_id: Any) -> Optional[int]:
+    """
+    0-based position of a trade (matched on id/trade_id, as string too) in
+    chronological order, via the snapshot's id->index map when possible.
+    """
+    perf_utils = _performance_utils()
+    if perf_utils:
+        snapshot = perf_utils.get_trade_snapshot()
+        if all_trades is snapshot.trades:
+            return snapshot.index_by_id.get(str(trade_id))
+    for idx, t in enumerate(sort_trades_chronologically(all_trades)):
+        if (t.get('id') == trade_id or t.get('trade_id') == trade_id or
+                str(t.get('id')) == str(trade_id) or str(t.get('trade_id')) == str(trade_id)):
+            return idx
+    return None
+
+
 def extract_trade_index_from_text(text: str) -> Optional[int]:
     """
     Extract trade index/number from text (e.g., "trade #7", "trade 7").
@@ -58,7 +102,7 @@ def get_trade_by_index(trade_index: int, all_trades: List[Dict[str, Any]],
         sorted_trades = sorted_order
     else:
         # Sort chronologically (oldest first) - same as list_trades
-        sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+        sorted_trades = sort_trades_chronologically(all_trades)
     
     # Convert 1-based index to 0-based
     if trade_index < 1:
@@ -127,7 +171,7 @@ def detect_trade_reference(message: str, all_trades: List[Dict[str, Any]] = None
     # Priority: Check for "trade #7" format first - matches displayed order
     trade_index = extract_trade_index_from_text(message)
     if trade_index and all_trades:
-        sorted_trades = sorted(all_trades, key=lambda t: t.get('timestamp') or t.get('entry_time') or '', reverse=False)
+        sorted_trades = sort_trades_chronologically(all_trades)
         trade = get_trade_by_index(trade_index, all_trades, sorted_trades)
         if trade:
             print(f"[TRADE_DETECTOR] Found trade by index #{trade_index}: {trade.get('symbol')} (ID: {trade.get('id')})")
@@ -390,9 +434,7 @@ def detect_trade_reference(message: str, all_trades: List[Dict[str, Any]] = None
     # Method 5: Recent trade context (most recent trade if message is vague)
     if all_trades and any(kw in message_lower for kw in ['that trade', 'this trade', 'the trade', 'last trade']):
         # Return most recent trade
-        sorted_trades = sorted(all_trades, 
-                              key=lambda t: t.get('timestamp') or t.get('entry_time') or '', 
-                              reverse=True)
+        sorted_trades = sort_trades_chronologically(all_trades, reverse=True)
         if sorted_trades:
             return sorted_trades[0]
     
@@ -7,9 +7,12 @@ your detector/OCR when ready.
 """
 
 import base64
+import hashlib
 import json
+import os
+from contextvars import ContextVar, Token
 from pathlib import Path
-from typing import Dict, Any, Optional, List, Iterable
+from typing import Callable, Dict, Any, Optional, List, Iterable, Tuple
 
 # Load environment variables (OPENAI_API_KEY, etc.) early
 try:
@@ -19,6 +22,30 @@ try:
 except Exception:
     pass
 
+from .extraction_cache import get_extraction_cache, prompt_hash
+
+# "combined" = one structured request per image; "separate" = OCR call + shapes call
+VISION_EXTRACT_MODE = os.getenv("VISION_EXTRACT_MODE", "combined").lower()
+
+# Called right before each upstream vision request, i.e. only on extraction-cache
+# misses; the batch runner installs its rate limiter here (see set_call_gate)
+_call_gate: ContextVar[Optional[Callable[[], None]]] = ContextVar("vision_call_gate", default=None)
+
+
+def set_call_gate(gate: Optional[Callable[[], None]]) -> Token:
+    """
+    Install a blocking callable run before every upstream vision request in
+    this context (contexts are copied into asyncio.to_thread workers).
+    
+    Returns:
+        Token for reset_call_gate()
+    """
+    return _call_gate.set(gate)
+
+
+def reset_call_gate(token: Token) -> None:
+    _call_gate.reset(token)
+
 
 def ocr_y_axis(image_path: Path) -> Optional[Dict[str, float]]:
     """
@@ -71,18 +98,26 @@ def pixel_to_price(mapping: Dict[str, float], y_px: float) -> Optional[float]:
     return mapping["slope"] * y_px + mapping["intercept"]
 
 
-def extract_prices(image_path: Path, use_vision: bool = True) -> Dict[str, Any]:
+def extract_prices(image_path: Path, use_vision: bool = True, mode: Optional[str] = None) -> Dict[str, Any]:
     """
     High-level extractor: OCR y-axis, fit mapping, detect shapes,
     convert spans to prices. Returns a dict ready to merge into advisor payload.
+
+    mode selects the vision path (default VISION_EXTRACT_MODE):
+      - "combined": one structured request returns y-axis labels and features
+      - "separate": original two calls (vision_ocr_y_axis + vision_detect_shapes)
     """
+    mode = (mode or VISION_EXTRACT_MODE).lower()
     if use_vision:
         # Vision-based OCR and detection
-        ocr_data = vision_ocr_y_axis(image_path)
+        if mode == "combined":
+            ocr_data, detections = vision_extract_combined(image_path)
+        else:
+            ocr_data = vision_ocr_y_axis(image_path)
+            detections = vision_detect_shapes(image_path)
         raw_ocr_text = ocr_data.get("raw_text") if ocr_data else None
         ocr_items = ocr_data.get("items") if ocr_data else None
         ocr_pts = {str(item["y_px"]): float(item["price"]) for item in ocr_items} if ocr_items else {}
-        detections = vision_detect_shapes(image_path)
         raw_shapes_text = detections.get("raw_text")
     else:
         ocr_pts = ocr_y_axis(image_path)
@@ -274,15 +309,16 @@ def extract_prices(image_path: Path, use_vision: bool = True) -> Dict[str, Any]:
         "raw": detections,
         "raw_ocr_text": raw_ocr_text,
         "raw_shapes_text": raw_shapes_text,
+        "extract_mode": mode if use_vision else "stub",
     }
 
 
-def extract_trade_row(image_path: Path, use_vision: bool = True) -> Dict[str, Any]:
+def extract_trade_row(image_path: Path, use_vision: bool = True, mode: Optional[str] = None) -> Dict[str, Any]:
     """
     Produce a minimal advisor-ready row with extracted fields.
     Fields left None when not detected.
     """
-    out = extract_prices(image_path, use_vision=use_vision)
+    out = extract_prices(image_path, use_vision=use_vision, mode=mode)
     # Pick first spans if available
     poi_span = next((p for p in out.get("poi_spans", []) if p and all(v is not None for v in p)), (None, None))
     ifvg_span = next((p for p in out.get("ifvg_spans", []) if p and all(v is not None for v in p)), (None, None))
@@ -314,21 +350,60 @@ if __name__ == "__main__":
 
 
 # --- Optional: OpenAI Vision helpers (uses OPENAI_API_KEY from .env) ---
-def _read_b64(image_path: Path) -> str:
-    return base64.b64encode(image_path.read_bytes()).decode("utf-8")
+_client = None
 
 
-def vision_complete(prompt: str, image_path: Path, model: str = "gpt-5.1") -> Optional[str]:
+def _vision_client(openai_cls):
+    """Shared sync client; honours OPENAI_BASE_URL and LLM_RECORD=1 (see standin/)"""
+    global _client
+    if _client is None:
+        http_client = None
+        if os.getenv("LLM_RECORD", "0").lower() in ("1", "true", "yes"):
+            try:
+                from standin.recording import recording_http_client
+            except ImportError:  # imported as server.vision.extract
+                from server.standin.recording import recording_http_client
+            http_client = recording_http_client(timeout=120)
+        _client = openai_cls(base_url=os.getenv("OPENAI_BASE_URL") or None, http_client=http_client)
+    return _client
+
+
+def vision_complete(prompt: str,
+                    image_path: Path,
+                    model: str = "gpt-5.1",
+                    response_format: Optional[Dict[str, Any]] = None,
+                    max_completion_tokens: int = 500,
+                    use_cache: bool = True) -> Optional[str]:
     """
     Call OpenAI Vision with an image and prompt. Returns text content or None on failure.
+    Pass response_format (e.g. a json_schema format) for structured output.
+    Non-empty results are cached by (image SHA-256, model, prompt hash); see
+    vision.extraction_cache.
     """
+    try:
+        image_bytes = image_path.read_bytes()
+    except OSError as e:
+        print(f"[VISION] Cannot read {image_path}: {e}")
+        return None
+    cache = get_extraction_cache() if use_cache else None
+    if cache is not None:
+        image_sha = hashlib.sha256(image_bytes).hexdigest()
+        prompt_key = prompt_hash(prompt, response_format, max_completion_tokens)
+        cached = cache.get(image_sha, model, prompt_key)
+        if cached is not None:
+            print(f"[VISION] Extraction cache hit for {image_path.name} ({image_sha[:8]}...)")
+            return cached["raw"]
     try:
       from openai import OpenAI
     except ImportError:
         print("[VISION] openai SDK not installed; run `pip install openai`.")
         return None
+    gate = _call_gate.get()
+    if gate is not None:
+        gate()
     try:
-        client = OpenAI()
+        client = _vision_client(OpenAI)
+        extra = {"response_format": response_format} if response_format else {}
         resp = client.chat.completions.create(
             model=model,
             messages=[
@@ -337,34 +412,52 @@ def vision_complete(prompt: str, image_path: Path, model: str = "gpt-5.1") -> Op
                     "role": "user",
                     "content": [
                         {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{_read_b64(image_path)}"}},
+                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{base64.b64encode(image_bytes).decode('utf-8')}"}},
                     ],
                 },
             ],
-            max_completion_tokens=500,
+            max_completion_tokens=max_completion_tokens,
             temperature=0.1,
+            **extra,
         )
         content = (resp.choices[0].message.content or "").strip()
         if not content:
             print(f"[VISION] Empty response for {image_path.name} (prompt='{prompt[:60]}...').")
+        elif cache is not None:
+            cache.set(image_sha, model, prompt_key, content)
         return content
     except Exception as e:
         print(f"[VISION] vision_complete error for {image_path.name}: {e}")
         return None
 
 
+OCR_PROMPT = (
+    "Read the y-axis price labels on this chart. Return JSON array of objects with keys "
+    "'y_px' (pixel row) and 'price' (numeric). Use pixel coordinates relative to the image top-left. "
+    "Only include clearly legible labels; ignore faint/partial text. Provide at least 10 labels if visible, "
+    "covering top, middle, and bottom of the axis, and include any labels near drawn boxes/lines."
+)
+
+SHAPES_PROMPT = (
+    "Detect the drawn features on this trading chart and return JSON with keys poi, ifvg, bos, fractal_candidates, "
+    "symbol, timeframe, session. "
+    "Always prefer on-chart price labels. You must detect POI boxes if they exist: include price_low and price_high (numeric) "
+    "and y_min_px and y_max_px (pixel rows, top-left origin). If price text is missing for a POI, estimate using the y-axis grid. "
+    "IFVG boxes are separate from POI; include them only if drawn. "
+    "For BOS: include BOTH price and y_px for the BOS line; if price not printed, estimate price from the y-axis and still include y_px. "
+    "Fractal_candidates: array of objects for any drawn circles (fractal low/high/next/target). For each, include fields: type "
+    "(one of low, high, target), price if visible, and y_px. Provide the projected/next target circle as type=target. "
+    "Also extract symbol/ticker, chart timeframe (e.g., 5m/15m/H1), and session label if shown on the chart; use empty string if not visible. "
+    "Do not return null values; provide the best estimate instead. Respond with strictly valid JSON."
+)
+
+
 def vision_ocr_y_axis(image_path: Path) -> Optional[Dict[str, Any]]:
     """
     Use OpenAI Vision to read y-axis labels (pixel y + price).
     Expected response: JSON array of {\"y_px\": <number>, \"price\": <number>}.
     """
-    prompt = (
-        "Read the y-axis price labels on this chart. Return JSON array of objects with keys "
-        "'y_px' (pixel row) and 'price' (numeric). Use pixel coordinates relative to the image top-left. "
-        "Only include clearly legible labels; ignore faint/partial text. Provide at least 10 labels if visible, "
-        "covering top, middle, and bottom of the axis, and include any labels near drawn boxes/lines."
-    )
-    txt = vision_complete(prompt, image_path)
+    txt = vision_complete(OCR_PROMPT, image_path)
     if not txt:
         return None
     try:
@@ -386,45 +479,115 @@ def vision_detect_shapes(image_path: Path) -> Dict[str, Any]:
       bos: array of {\"y_px\":...} (or {\"price\":...} if legible)
       fractal_target: object with {\"y_px\":...} or {\"price\":...} for the target circle.
     """
-    prompt = (
-        "Detect the drawn features on this trading chart and return JSON with keys poi, ifvg, bos, fractal_candidates, "
-        "symbol, timeframe, session. "
-        "Always prefer on-chart price labels. You must detect POI boxes if they exist: include price_low and price_high (numeric) "
-        "and y_min_px and y_max_px (pixel rows, top-left origin). If price text is missing for a POI, estimate using the y-axis grid. "
-        "IFVG boxes are separate from POI; include them only if drawn. "
-        "For BOS: include BOTH price and y_px for the BOS line; if price not printed, estimate price from the y-axis and still include y_px. "
-        "Fractal_candidates: array of objects for any drawn circles (fractal low/high/next/target). For each, include fields: type "
-        "(one of low, high, target), price if visible, and y_px. Provide the projected/next target circle as type=target. "
-        "Also extract symbol/ticker, chart timeframe (e.g., 5m/15m/H1), and session label if shown on the chart; use empty string if not visible. "
-        "Do not return null values; provide the best estimate instead. Respond with strictly valid JSON."
-    )
-    txt = vision_complete(prompt, image_path)
+    txt = vision_complete(SHAPES_PROMPT, image_path)
     if not txt:
         return {"poi": [], "ifvg": [], "bos": [], "fractal_target": None, "raw_text": None}
     try:
         print(f"[VISION][DEBUG] SHAPES raw ({image_path.name}): {txt}")
         data = json.loads(txt)
-        return {
-            "poi": data.get("poi", []) if isinstance(data, dict) else [],
-            "ifvg": data.get("ifvg", []) if isinstance(data, dict) else [],
-            "bos": data.get("bos", []) if isinstance(data, dict) else [],
-            "fractal_target": data.get("fractal_target") if isinstance(data, dict) else None,
-            "fractal_candidates": data.get("fractal_candidates") if isinstance(data, dict) else None,
-            "symbol": data.get("symbol") if isinstance(data, dict) else None,
-            "timeframe": data.get("timeframe") if isinstance(data, dict) else None,
-            "session": data.get("session") if isinstance(data, dict) else None,
-            "raw_text": txt,
-        }
+        return _shapes_from_json(data, txt)
     except Exception:
         print(f"[VISION] Shape JSON parse failed for {image_path.name}: {txt}")
-        return {
-            "poi": [],
-            "ifvg": [],
-            "bos": [],
-            "fractal_target": None,
-            "fractal_candidates": None,
-            "symbol": None,
-            "timeframe": None,
-            "session": None,
-            "raw_text": txt,
-        }
+        return _shapes_from_json(None, txt)
+
+
+def _shapes_from_json(data: Any, txt: Optional[str]) -> Dict[str, Any]:
+    """Normalize a parsed shapes response (or None on parse failure) to the detections dict"""
+    if not isinstance(data, dict):
+        data = {}
+    return {
+        "poi": data.get("poi", []),
+        "ifvg": data.get("ifvg", []),
+        "bos": data.get("bos", []),
+        "fractal_target": data.get("fractal_target"),
+        "fractal_candidates": data.get("fractal_candidates"),
+        "symbol": data.get("symbol"),
+        "timeframe": data.get("timeframe"),
+        "session": data.get("session"),
+        "raw_text": txt,
+    }
+
+
+# --- Combined extraction: y-axis OCR + features in one structured request ---
+_NUM = {"type": "number"}
+_NUM_OR_NULL = {"type": ["number", "null"]}
+
+
+def _obj(properties: Dict[str, Any]) -> Dict[str, Any]:
+    # Strict structured outputs: every key required, no extras
+    return {"type": "object", "properties": properties, "required": list(properties), "additionalProperties": False}
+
+
+_ZONE = _obj({"y_min_px": _NUM, "y_max_px": _NUM, "price_low": _NUM_OR_NULL, "price_high": _NUM_OR_NULL})
+
+COMBINED_EXTRACTION_SCHEMA = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "chart_extraction",
+        "strict": True,
+        "schema": _obj({
+            "y_axis": {"type": "array", "items": _obj({"y_px": _NUM, "price": _NUM})},
+            "poi": {"type": "array", "items": _ZONE},
+            "ifvg": {"type": "array", "items": _ZONE},
+            "bos": {"type": "array", "items": _obj({"y_px": _NUM, "price": _NUM_OR_NULL})},
+            "fractal_candidates": {
+                "type": "array",
+                "items": _obj({
+                    "type": {"type": "string", "enum": ["low", "high", "target"]},
+                    "price": _NUM_OR_NULL,
+                    "y_px": _NUM_OR_NULL,
+                }),
+            },
+            "symbol": {"type": "string"},
+            "timeframe": {"type": "string"},
+            "session": {"type": "string"},
+        }),
+    },
+}
+
+COMBINED_PROMPT = (
+    "Extract two things from this trading chart in one JSON object.\n"
+    "1) y_axis: the y-axis price labels as objects with 'y_px' (pixel row) and 'price' (numeric). Use pixel "
+    "coordinates relative to the image top-left. Only include clearly legible labels; ignore faint/partial text. "
+    "Provide at least 10 labels if visible, covering top, middle, and bottom of the axis, and include any labels "
+    "near drawn boxes/lines.\n"
+    "2) The drawn features: poi, ifvg, bos, fractal_candidates, symbol, timeframe, session. "
+    "Always prefer on-chart price labels. You must detect POI boxes if they exist: include price_low and price_high "
+    "and y_min_px and y_max_px (pixel rows, top-left origin). If price text is missing for a POI, estimate using the "
+    "y-axis labels. IFVG boxes are separate from POI; include them only if drawn. "
+    "For BOS: include BOTH price and y_px for the BOS line; if price not printed, estimate price from the y-axis. "
+    "fractal_candidates: one entry per drawn circle (fractal low/high/next/target) with type (low, high or target), "
+    "price if visible, and y_px; the projected/next target circle is type=target. "
+    "symbol/timeframe/session: as shown on the chart, or empty string if not visible. "
+    "Use null only for a price that cannot be read or estimated."
+)
+
+
+def vision_extract_combined(image_path: Path) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Use OpenAI Vision once per image for both y-axis OCR and feature detection
+    (JSON-schema response format).
+
+    Returns:
+        (ocr_data, detections) in the same shapes as vision_ocr_y_axis and
+        vision_detect_shapes, so extract_prices can use either mode.
+    """
+    txt = vision_complete(
+        COMBINED_PROMPT,
+        image_path,
+        response_format=COMBINED_EXTRACTION_SCHEMA,
+        max_completion_tokens=1500,
+    )
+    if not txt:
+        return None, _shapes_from_json(None, None)
+    try:
+        print(f"[VISION][DEBUG] COMBINED raw ({image_path.name}): {txt}")
+        data = json.loads(txt)
+    except Exception:
+        print(f"[VISION] Combined JSON parse failed for {image_path.name}: {txt}")
+        return None, _shapes_from_json(None, txt)
+    if not isinstance(data, dict):
+        return None, _shapes_from_json(None, txt)
+    items = [i for i in data.get("y_axis") or [] if isinstance(i, dict) and i.get("price") is not None]
+    ocr_data = {"items": items, "raw_text": txt} if items else None
+    return ocr_data, _shapes_from_json(data, txt)
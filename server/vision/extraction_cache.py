@@ -0,0 +1,129 @@
+"""
+Vision Extraction Cache
+-----------------------
+Persistent (SQLite) cache of vision_complete results, keyed by the SHA-256 of
+the image bytes, the model name and a hash of the prompt (plus response
+format and token limit). Stores the raw model text and, when it parses, the
+JSON. Re-running extraction or micro classification over the same charts
+(e.g. after an advisor scoring-rule change) makes no vision calls.
+
+Changing a prompt changes its hash, so stale entries are never reused; they
+are simply left behind until VISION_EXTRACT_CACHE_TTL expires them.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+VISION_EXTRACT_CACHE_ENABLED = os.getenv("VISION_EXTRACT_CACHE", "1").lower() in ("1", "true", "yes")
+VISION_EXTRACT_CACHE_TTL = float(os.getenv("VISION_EXTRACT_CACHE_TTL", "0"))  # seconds; 0 = never expire
+VISION_EXTRACT_CACHE_DB = Path(os.getenv(
+    "VISION_EXTRACT_CACHE_DB",
+    str(Path(__file__).resolve().parent.parent / "data" / "vision_extract_cache.sqlite3"),
+))
+
+
+def prompt_hash(prompt: str, response_format: Optional[Dict[str, Any]] = None, max_completion_tokens: Optional[int] = None) -> str:
+    """Hash of everything in the request that shapes the answer besides image and model"""
+    material = json.dumps([prompt, response_format, max_completion_tokens], sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ExtractionCache:
+    """SQLite-backed store of raw + parsed vision outputs"""
+
+    def __init__(self, db_path: Path = VISION_EXTRACT_CACHE_DB, ttl: float = VISION_EXTRACT_CACHE_TTL):
+        self.db_path = Path(db_path)
+        self.ttl = ttl
+        self._db = None
+        self._lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0}
+
+    def _connect(self):
+        if self._db is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS vision_extractions ("
+                "image_sha256 TEXT NOT NULL, model TEXT NOT NULL, prompt_hash TEXT NOT NULL, "
+                "raw TEXT NOT NULL, parsed TEXT, stored_at REAL NOT NULL, "
+                "PRIMARY KEY (image_sha256, model, prompt_hash))"
+            )
+            self._db.commit()
+        return self._db
+
+    def get(self, image_sha256: str, model: str, prompt_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result.
+
+        Returns:
+            {"raw": str, "parsed": Any | None} or None on miss / expiry
+        """
+        with self._lock:
+            try:
+                row = self._connect().execute(
+                    "SELECT raw, parsed, stored_at FROM vision_extractions "
+                    "WHERE image_sha256 = ? AND model = ? AND prompt_hash = ?",
+                    (image_sha256, model, prompt_key),
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"[VISION] Extraction cache read failed: {e}")
+                return None
+            if row is None or (self.ttl > 0 and time.time() - row[2] > self.ttl):
+                self.counters["misses"] += 1
+                return None
+            self.counters["hits"] += 1
+            return {"raw": row[0], "parsed": json.loads(row[1]) if row[1] is not None else None}
+
+    def set(self, image_sha256: str, model: str, prompt_key: str, raw: str) -> None:
+        """Store a raw model response (parsed JSON is stored alongside when it parses)"""
+        try:
+            parsed = json.dumps(json.loads(raw))
+        except (ValueError, TypeError):
+            parsed = None
+        with self._lock:
+            try:
+                db = self._connect()
+                db.execute(
+                    "INSERT OR REPLACE INTO vision_extractions "
+                    "(image_sha256, model, prompt_hash, raw, parsed, stored_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (image_sha256, model, prompt_key, raw, parsed, time.time()),
+                )
+                db.commit()
+                self.counters["stores"] += 1
+            except sqlite3.Error as e:
+                print(f"[VISION] Extraction cache write failed: {e}")
+
+    def clear(self) -> int:
+        """Delete all entries; returns the number removed"""
+        with self._lock:
+            db = self._connect()
+            removed = db.execute("DELETE FROM vision_extractions").rowcount
+            db.commit()
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            try:
+                entries = self._connect().execute("SELECT COUNT(*) FROM vision_extractions").fetchone()[0]
+            except sqlite3.Error:
+                entries = None
+            return {**self.counters, "entries": entries, "db_path": str(self.db_path)}
+
+
+_extraction_cache: Optional[ExtractionCache] = None
+
+
+def get_extraction_cache() -> Optional[ExtractionCache]:
+    """Get the global extraction cache (None when VISION_EXTRACT_CACHE is off)"""
+    global _extraction_cache
+    if not VISION_EXTRACT_CACHE_ENABLED:
+        return None
+    if _extraction_cache is None:
+        _extraction_cache = ExtractionCache()
+    return _extraction_cache
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 from tempfile import NamedTemporaryFile
 from pathlib import Path
+from typing import Optional
 import shutil
 
 from analytics.advisor import evaluate_setup
@@ -13,10 +14,13 @@ router = APIRouter(prefix="/vision", tags=["vision"])
 @router.post("/extract")
 async def vision_extract(
     image: UploadFile = File(...),
+    mode: Optional[str] = Query(None, pattern="^(combined|separate)$"),
 ):
     """
     Extract POI/IFVG/BOS + micro_shift from an uploaded chart image.
     Does NOT call the advisor. Requires OpenAI Vision access.
+    mode: "combined" (one structured call) or "separate" (OCR + shapes calls);
+    defaults to VISION_EXTRACT_MODE.
     """
     try:
         with NamedTemporaryFile(delete=False, suffix=Path(image.filename).suffix or ".png") as tmp:
@@ -26,7 +30,7 @@ async def vision_extract(
         raise HTTPException(status_code=500, detail=f"Failed to save upload: {e}")
 
     try:
-        details = extract_prices(tmp_path, use_vision=True)
+        details = extract_prices(tmp_path, use_vision=True, mode=mode)
         # Build a minimal row from details to avoid double vision calls
         poi_span = next((p for p in details.get("poi_spans", []) if p and all(v is not None for v in p)), (None, None))
         ifvg_span = next((p for p in details.get("ifvg_spans", []) if p and all(v is not None for v in p)), (None, None))
@@ -48,6 +52,7 @@ async def vision_extract(
             "raw_shapes_text": details.get("raw_shapes_text"),
             "pixel_map": details.get("pixel_map"),
             "raw_detections": details.get("raw"),
+            "extract_mode": details.get("extract_mode"),
         }
         micro_flag = classify_micro(tmp_path)
         return {
@@ -76,6 +81,7 @@ async def vision_advisor(
     require_grade: str = "A+",
     risk_cap_pct: float = 0.10,
     session: str = "London",
+    mode: Optional[str] = Query(None, pattern="^(combined|separate)$"),
 ):
     """
     Vision-driven advisor: upload an image (5m chart), auto-extract POI/BOS/IFVG + micro, call advisor, and return both.
@@ -93,7 +99,7 @@ async def vision_advisor(
         raise HTTPException(status_code=500, detail=f"Failed to save upload: {e}")
 
     try:
-        extracted = extract_trade_row(tmp_path, use_vision=True)
+        extracted = extract_trade_row(tmp_path, use_vision=True, mode=mode)
         micro_flag = classify_micro(tmp_path)
         payload = {
             "trade_id": f"vision-{tmp_path.name}",
@@ -2,21 +2,34 @@
 """
 Batch pipeline: image(s) -> vision extraction -> advisor payload.
 This is a scaffold; extraction is stubbed and micro uses filename labels.
+
+Use --batch for concurrent processing: a concurrency limit, a token-bucket
+rate limit on vision requests, jittered retries, and a JSONL checkpoint so an
+interrupted run resumes where it stopped.
 """
+import argparse
+import asyncio
 import csv
 import json
+import os
+import random
 import sys
+import time
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 # Ensure repo root on sys.path for 'server' imports
 ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from server.vision.extract import extract_trade_row
+from server.vision.extract import extract_trade_row, set_call_gate, reset_call_gate
 from server.vision.micro_classifier import classify_micro
 
+DATASET_DIR = Path("server/data/Vision_image_dataset")
+RETRY_BASE_DELAY = 2.0  # seconds
+RETRY_MAX_DELAY = 60.0
+
 
 def load_manifest(manifest_path: Path):
     rows = []
@@ -27,9 +40,8 @@ def load_manifest(manifest_path: Path):
     return rows
 
 
-def build_payloads(manifest_rows):
-    payloads = []
-    # group by trade_id
+def group_manifest(manifest_rows):
+    """Group manifest rows by trade_id -> {"files": {timeframe: filename}, "micro_shift": ...}"""
     by_id: Dict[str, Dict[str, Any]] = {}
     for r in manifest_rows:
         tid = r.get("trade_id")
@@ -41,36 +53,190 @@ def build_payloads(manifest_rows):
         entry.setdefault("files", {})[tf] = fn
         if tf == "1m":
             entry["micro_shift"] = (r.get("micro_shift") or "").lower()
-    for tid, data in by_id.items():
-        payload: Dict[str, Any] = {
-            "trade_id": tid,
-            "entry_method": "poi50",  # default, adjust if needed
-            "micro_shift": None,
-        }
-        files = data.get("files", {})
-        # 5m extraction
-        five_m = files.get("5m")
-        if five_m:
-            path5 = Path("server/data/Vision_image_dataset") / five_m
-            payload.update(extract_trade_row(path5))
-        # 1m micro
-        one_m = files.get("1m")
-        if one_m:
-            path1 = Path("server/data/Vision_image_dataset") / one_m
-            mc = classify_micro(path1)
-            if mc is not None:
-                payload["micro_shift"] = mc
-        payloads.append(payload)
+    return by_id
+
+
+def build_payload(tid: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Run extraction (5m) and micro classification (1m) for one trade"""
+    payload: Dict[str, Any] = {
+        "trade_id": tid,
+        "entry_method": "poi50",  # default, adjust if needed
+        "micro_shift": None,
+    }
+    files = data.get("files", {})
+    # 5m extraction
+    five_m = files.get("5m")
+    if five_m:
+        path5 = DATASET_DIR / five_m
+        payload.update(extract_trade_row(path5))
+    # 1m micro
+    one_m = files.get("1m")
+    if one_m:
+        path1 = DATASET_DIR / one_m
+        mc = classify_micro(path1)
+        if mc is not None:
+            payload["micro_shift"] = mc
+    return payload
+
+
+def build_payloads(manifest_rows):
+    payloads = []
+    for tid, data in group_manifest(manifest_rows).items():
+        payloads.append(build_payload(tid, data))
     return payloads
 
 
+# --- Batch mode: concurrent, rate-limited, retried, resumable ---
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens/second refill, up to `capacity` banked"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, n: float = 1.0) -> None:
+        n = min(n, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+
+def _extraction_failed(data: Dict[str, Any], payload: Dict[str, Any]) -> bool:
+    # vision_complete swallows API errors and returns None; with a 5m image
+    # that shows up as no raw model text at all
+    return bool(data.get("files", {}).get("5m")) and not (payload.get("raw_ocr_text") or payload.get("raw_shapes_text"))
+
+
+def load_checkpoint(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Completed payloads by trade_id from a JSONL checkpoint (tolerates a torn last line)"""
+    done: Dict[str, Dict[str, Any]] = {}
+    if not path.exists():
+        return done
+    with path.open() as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            done[record["trade_id"]] = record["payload"]
+    return done
+
+
+async def build_payloads_async(manifest_rows,
+                               concurrency: int = 4,
+                               rpm: float = 60.0,
+                               burst: Optional[float] = None,
+                               retries: int = 3,
+                               checkpoint: Optional[Path] = None):
+    """
+    Concurrent build_payloads.
+
+    Args:
+        manifest_rows: Rows from load_manifest
+        concurrency: Trades processed at once (each runs in a worker thread)
+        rpm: Upstream vision requests per minute (extraction-cache hits are free)
+        burst: Bucket capacity (defaults to concurrency * 3 requests)
+        retries: Extra attempts per trade on error/empty extraction (jittered exponential backoff)
+        checkpoint: JSONL file of completed trades; existing entries are skipped and new ones appended
+
+    Returns:
+        Payloads in manifest order (checkpointed + newly built)
+    """
+    grouped = group_manifest(manifest_rows)
+    done = load_checkpoint(checkpoint) if checkpoint else {}
+    pending = [(tid, data) for tid, data in grouped.items() if tid not in done]
+    if done:
+        print(f"[BATCH] Resuming: {len(done)} trades in checkpoint, {len(pending)} to go", file=sys.stderr)
+
+    limiter = TokenBucket(rate=rpm / 60.0, capacity=burst if burst is not None else concurrency * 3)
+    loop = asyncio.get_running_loop()
+
+    def charge_vision_call() -> None:
+        # Runs in the build_payload worker thread before each upstream request,
+        # so extraction-cache hits cost no tokens
+        asyncio.run_coroutine_threadsafe(limiter.acquire(), loop).result()
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    out_file = checkpoint.open("a") if checkpoint else None
+    failed = []
+
+    async def run_one(tid: str, data: Dict[str, Any]) -> None:
+        async with semaphore:
+            for attempt in range(retries + 1):
+                try:
+                    payload = await asyncio.to_thread(build_payload, tid, data)
+                    if not _extraction_failed(data, payload):
+                        break
+                    error = "empty extraction"
+                except Exception as e:
+                    payload, error = None, str(e)
+                if attempt < retries:
+                    delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+                    print(f"[BATCH] {tid}: {error}; retry {attempt + 1}/{retries} in {delay:.1f}s", file=sys.stderr)
+                    await asyncio.sleep(delay)
+            else:
+                # Not checkpointed, so a resumed run tries this trade again
+                print(f"[BATCH] {tid}: giving up after {retries + 1} attempts", file=sys.stderr)
+                failed.append(tid)
+                if payload is not None:
+                    done[tid] = payload
+                return
+        done[tid] = payload
+        if out_file:
+            out_file.write(json.dumps({"trade_id": tid, "payload": payload}) + "\n")
+            out_file.flush()
+
+    gate_token = set_call_gate(charge_vision_call)
+    try:
+        await asyncio.gather(*(run_one(tid, data) for tid, data in pending))
+    finally:
+        reset_call_gate(gate_token)
+        if out_file:
+            out_file.close()
+    if failed:
+        print(f"[BATCH] {len(failed)} trades failed: {', '.join(failed)}", file=sys.stderr)
+    return [done[tid] for tid in grouped if tid in done]
+
+
 def main():
+    parser = argparse.ArgumentParser(description="Build advisor payloads from the vision image manifest")
+    parser.add_argument("--batch", action="store_true", help="Process trades concurrently (rate-limited, resumable)")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("VISION_BATCH_CONCURRENCY", "4")))
+    parser.add_argument("--rpm", type=float, default=float(os.getenv("VISION_BATCH_RPM", "60")),
+                        help="Vision requests per minute")
+    parser.add_argument("--burst", type=float, default=None, help="Token bucket capacity (default: concurrency * 3)")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--checkpoint", type=Path, default=DATASET_DIR / "advisor_checkpoint.jsonl")
+    parser.add_argument("--fresh", action="store_true", help="Ignore and overwrite an existing checkpoint")
+    args = parser.parse_args()
+
     manifest = ROOT / "server" / "data" / "Vision_image_dataset" / "manifest.csv"
     if not manifest.exists():
         print("Manifest not found:", manifest)
         return
     manifest_rows = load_manifest(manifest)
-    payloads = build_payloads(manifest_rows)
+    if args.batch:
+        if args.fresh and args.checkpoint.exists():
+            args.checkpoint.unlink()
+        payloads = asyncio.run(build_payloads_async(
+            manifest_rows,
+            concurrency=args.concurrency,
+            rpm=args.rpm,
+            burst=args.burst,
+            retries=args.retries,
+            checkpoint=args.checkpoint,
+        ))
+    else:
+        payloads = build_payloads(manifest_rows)
     print(json.dumps(payloads, indent=2))
 
     # Optional: call advisor endpoint for each payload (requires running API)